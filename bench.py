@@ -0,0 +1,553 @@
+"""starscript 마이크로벤치마크.
+
+    python bench.py                      # 모든 그룹, 현재 main.py
+    python bench.py control_flow         # 한 그룹만
+    python bench.py --against HEAD~1     # 다른 리비전의 main.py 와 나란히 비교
+    python bench.py --memory             # 토큰/트리 메모리 보고 (BIG_SOURCE 기준)
+
+각 시나리오는 `python main.py --engine <엔진> <파일>` 로 실행하며,
+--repeat 번 중 가장 빠른 벽시계 시간(ms)을 보고한다.
+시나리오 파일은 실행 사이에 그대로 두므로 .sstc 캐시가 있는 리비전은 두 번째
+실행부터 캐시를 읽는다. 캐시 없는 시간은 *_cold 시나리오(STARSCRIPT_CACHE=0)로 본다.
+"""
+import argparse, importlib.util, os, subprocess, sys, tempfile, time, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 재귀 호출과 if/while 안쪽에서의 return 이 대부분인 스크립트
+CALL_HEAVY = """
+func fib(num n):
+    if (n < 2):
+        return n;
+    end;
+    return fib(n - 1) + fib(n - 2);
+end;
+func find(num target):
+    num i = 0;
+    while (true):
+        if (i == target):
+            return i;
+        end;
+        i = i + 1;
+    end;
+end;
+num k = 0;
+num acc = 0;
+while (k < 3000):
+    acc = acc + find(k % 7);
+    k = k + 1;
+end;
+output(fib(20), acc);
+"""
+
+# 함수 안의 중첩 반복문과 break/continue 가 대부분인 스크립트 (fisPrime 모양)
+LOOP_HEAVY = """
+func count(num n):
+    num total = 0;
+    num i = 0;
+    while (i < n):
+        i = i + 1;
+        if (i % 3 == 0):
+            continue;
+        end;
+        num j = 0;
+        while (true):
+            j = j + 1;
+            if (j > 20):
+                break;
+            end;
+            if (j % 2 == 0):
+                continue;
+            end;
+            total = total + j;
+        end;
+    end;
+    return total;
+end;
+output(count(20000));
+"""
+
+# 실행보다 토큰화/파싱이 대부분인 큰 생성 스크립트 (함수 선언 3000개)
+BIG_SOURCE = "".join(f"""
+/* 생성된 함수 {i} */
+func gen{i}(num a, num b):
+    num t = a * {i} + b; // 주석
+    if (t >= 10 and a != b):
+        return "값: " + t;
+    end;
+    return t / 2.5;
+end;
+""" for i in range(3000))+"output(gen7(1, 2));\n"
+
+# 함수 안과 반복문 안에서 같은 모듈을 계속 use 하는 스크립트
+USE_IN_LOOP = """
+func f(num x):
+    use {math};
+    return math.abs(x);
+end;
+num i = 0;
+num s = 0;
+while (i < 200):
+    use {math};
+    s = s + f(0 - i) + math.gcd(i, 12);
+    i = i + 1;
+end;
+output(s);
+"""
+
+# newtype 값을 많이 만들고 메서드를 부르는 스크립트
+RECORDS = """
+newtype Person:
+    str name;
+    num age;
+    func birthday():
+        age = age + 1;
+        return age;
+    end;
+end;
+num i = 0;
+num total = 0;
+while (i < 30000):
+    Person p = {"P", i};
+    total = total + p.birthday() + p.age;
+    i = i + 1;
+end;
+output(total);
+"""
+
+# math.fibonacciSeries(n): push 로 리스트를 키운다. n 을 두 배로 하면 시간도 두 배 남짓
+# (큰 정수 덧셈 자체가 자릿수에 비례하므로 정확히 두 배는 아니다)
+# 네이티브 math 가 대신 돌지 않도록 STARSCRIPT_NATIVE=0 으로 math.sst 를 재고, *_native 는 비교용
+def fib_series(n):
+    return f"""
+use {{math}};
+li s = math.fibonacciSeries({n});
+output(s.size());
+"""
+
+# 예전 방식: 매번 fibs + [next] 로 리스트 전체를 복사한다 (O(n^2))
+def fib_series_concat(n):
+    return f"""
+li fibs = [0, 1];
+num i = 2;
+while (i <= {n}):
+    fibs = fibs + [fibs[i - 1] + fibs[i - 2]];
+    i = i + 1;
+end;
+output(fibs.size());
+"""
+
+# 같은 계산(a*2+b 의 합, a·b)을 원소마다 while 로 도는 리스트 버전과 arr 버전으로
+ARRAY_LOOP = """
+li a = [];
+li b = [];
+num i = 0;
+while (i < 200000):
+    a.push(i % 100);
+    b.push(i % 7);
+    i = i + 1;
+end;
+num s = 0;
+num d = 0;
+i = 0;
+while (i < 200000):
+    s = s + a[i] * 2 + b[i];
+    d = d + a[i] * b[i];
+    i = i + 1;
+end;
+output(s, d);
+"""
+
+ARRAY_VECTOR = """
+li la = [];
+li lb = [];
+num i = 0;
+while (i < 200000):
+    la.push(i % 100);
+    lb.push(i % 7);
+    i = i + 1;
+end;
+arr a = la;
+arr b = lb;
+output((a * 2 + b).sum(), a.dot(b));
+"""
+
+# math.sst 의 factorial/nCr 모양. 앞에 PREFIX 를 붙여 보통 func 과 pure func 을 비교한다
+def ncr_loop(prefix):
+    return f"""
+{prefix}func factorial(num n):
+    if (n <= 1):
+        return 1;
+    end;
+    return n * factorial(n - 1);
+end;
+{prefix}func nCr(num n, num r):
+    return factorial(n) / (factorial(r) * factorial(n - r));
+end;
+num i = 0;
+num s = 0;
+while (i < 3000):
+    s = s + nCr(60, i % 60);
+    i = i + 1;
+end;
+output(s);
+"""
+
+# system.sst 의 new_code 모양: 같은 code 레코드를 반복문에서 계속 exec 한다
+EXEC_LOOP = """
+newtype code:
+    str source;
+end;
+num total = 0;
+code step = {"num t = total * 3 % 1000; if (t > 500) : total = total + t; else : total = total + 1; end;"};
+num i = 0;
+while (i < 20000):
+    exec(step);
+    i = i + 1;
+end;
+output(total);
+"""
+
+# 재귀 깊이 확인: 꼬리 호출 1,000,000 단계와 꼬리가 아닌 재귀 200,000 단계.
+# 값이 틀리면 error() 로 끝나므로 "실패" 로 보인다
+TAIL_CALL_1M = """
+func count(num n, num acc):
+    if (n == 0):
+        return acc;
+    end;
+    return count(n - 1, acc + 1);
+end;
+func even(num n):
+    if (n == 0):
+        return true;
+    end;
+    return odd(n - 1);
+end;
+func odd(num n):
+    if (n == 0):
+        return false;
+    end;
+    return even(n - 1);
+end;
+if (count(1000000, 0) != 1000000 or not even(1000000)):
+    error("꼬리 호출 결과가 틀림");
+end;
+"""
+
+DEEP_200K = """
+func sum(num n):
+    if (n == 0):
+        return 0;
+    end;
+    return n + sum(n - 1);
+end;
+if (sum(200000) != 20000100000):
+    error("재귀 결과가 틀림");
+end;
+"""
+
+# math 모듈 함수를 고르게 부르는 스크립트. *_sst 는 STARSCRIPT_NATIVE=0 으로 math.sst 를 쓴다
+# (sqrt 는 math.sst 에서 끝나지 않는 입력이 있어 완전제곱수만 넣는다)
+MATH_MIX = """
+use {math};
+num i = 2;
+num s = 0;
+while (i < 400):
+    s = s + math.gcd(i * 7919, 104729 + i) + math.modExp(i, 65537, 1000000007);
+    if (math.fisPrime(i * 1000003)):
+        s = s + 1;
+    end;
+    s = s + math.primeFactors(i * 997).size() + math.sqrt(i * i) + math.pow(3, i % 40);
+    i = i + 1;
+end;
+output(s, math.pollardRho(600851475143));
+"""
+
+# 한 줄씩 많이 출력하는 스크립트. *_unbuffered 는 output 마다 내보낸다
+MANY_LINES = """
+num i = 0;
+while (i < 200000):
+    output(i, i * 2);
+    i = i + 1;
+end;
+"""
+
+# stdin 으로 200,000개의 수(한 줄에 하나, 약 1.3MB)를 받아 더하는 스크립트.
+# 항목의 네 번째 값이 stdin 으로 들어간다
+NUMBERS_IN = "".join(f"{i * 7 % 100003}\n" for i in range(200000)).encode()
+
+INPUT_LOOP = """
+num x = 0;
+num s = 0;
+num i = 0;
+while (i < 200000):
+    input(x);
+    s = s + x;
+    i = i + 1;
+end;
+output(s);
+"""
+
+READ_NUMBERS = """
+arr xs = readNumbers();
+output(xs.sum());
+"""
+
+# 파일 입출력. {tmp} 는 벤치마크 임시 디렉터리로 바뀌고, 그 안의 lines.txt 는 main() 이 만든다
+LINES_TXT = "".join(f"{i},{i * 3},padding text\n" for i in range(200000))
+
+FILE_READ_LINES = """
+file f = open("{tmp}/lines.txt", "r");
+num n = 0;
+while (not f.eof()):
+    str line = f.readLine();
+    n = n + 1;
+end;
+if (n != 200000):
+    error("줄 수", n);
+end;
+"""
+
+FILE_READ_CHUNKS = """
+file f = open("{tmp}/lines.txt", "rb");
+num total = 0;
+while (not f.eof()):
+    arr chunk = f.read(65536);
+    total = total + chunk.sum();
+end;
+output(total);
+"""
+
+FILE_WRITE_LINES = """
+li xs = [];
+num i = 0;
+while (i < 100000):
+    xs.push(i);
+    i = i + 1;
+end;
+file w = open("{tmp}/out.txt", "w");
+w.writeLines(xs);
+w.close();
+"""
+
+FILE_WRITE_EACH = """
+file w = open("{tmp}/out.txt", "w");
+num i = 0;
+while (i < 100000):
+    w.write(i);
+    w.write("\\n");
+    i = i + 1;
+end;
+w.close();
+"""
+
+# always 블록 100개가 0.01초마다 도는 동안 메인 프로그램이 반복문을 돈다
+ALWAYS_100 = """
+num ticks = 0;
+num k = 0;
+while (k < 100):
+    always (0.01) :
+        ticks = ticks + 1;
+    end;
+    k = k + 1;
+end;
+num i = 0;
+while (i < 300000):
+    i = i + 1;
+end;
+"""
+
+# async func 2000개가 동시에 0.1초씩 기다린다 (스레드가 아니라 코루틴)
+ASYNC_WAITS = """
+async func waitOne(num i) :
+    await sleep(0.1);
+    return i;
+end;
+async func run() :
+    li ts = [];
+    num i = 0;
+    while (i < 2000):
+        ts.push(waitOne(i));
+        i = i + 1;
+    end;
+    li rs = await gather(ts);
+    if (rs.size() != 2000):
+        error("결과 수", rs.size());
+    end;
+end;
+run();
+"""
+
+# 계산이 무거운 함수를 64개 원소에 적용: 한 프로세스에서 차례로 vs parallelMap (워커 시작 시간 포함)
+HEAVY_FUNC = """
+func heavy(num n) :
+    num i = 0;
+    num acc = 0;
+    while (i < 20000):
+        acc = (acc + i * n) % 1000003;
+        i = i + 1;
+    end;
+    return acc;
+end;
+li xs = [];
+num k = 0;
+while (k < 64):
+    xs.push(k);
+    k = k + 1;
+end;
+"""
+
+SERIAL_MAP = HEAVY_FUNC+"""
+li rs = [];
+num j = 0;
+while (j < 64):
+    rs.push(heavy(xs[j]));
+    j = j + 1;
+end;
+output(rs[63]);
+"""
+
+PARALLEL_MAP = HEAVY_FUNC+"""
+li rs = parallelMap(heavy, xs);
+output(rs[63]);
+"""
+
+GROUPS = {
+    "control_flow": [("call_heavy", CALL_HEAVY), ("loop_heavy", LOOP_HEAVY)],
+    "load": [("big_source", BIG_SOURCE),
+             ("big_source_cold", BIG_SOURCE, {"STARSCRIPT_CACHE": "0"})],
+    "modules": [("use_in_loop", USE_IN_LOOP)],
+    "records": [("records", RECORDS)],
+    "lists": [("fib_series_25k", fib_series(25000), {"STARSCRIPT_NATIVE": "0"}),
+              ("fib_series_50k", fib_series(50000), {"STARSCRIPT_NATIVE": "0"}),
+              ("fib_series_100k", fib_series(100000), {"STARSCRIPT_NATIVE": "0"}),
+              ("fib_series_100k_native", fib_series(100000)),
+              ("fib_concat_25k", fib_series_concat(25000))],
+    "recursion": [("tail_call_1m", TAIL_CALL_1M), ("deep_200k", DEEP_200K)],
+    "native_math": [("math_native", MATH_MIX), ("math_sst", MATH_MIX, {"STARSCRIPT_NATIVE": "0"})],
+    "output": [("many_lines", MANY_LINES),
+               ("many_lines_unbuffered", MANY_LINES, {"STARSCRIPT_OUTPUT_BUFFER": "0"})],
+    "input": [("input_loop", INPUT_LOOP, {}, NUMBERS_IN),
+              ("read_numbers", READ_NUMBERS, {}, NUMBERS_IN)],
+    "files": [("file_read_lines", FILE_READ_LINES),
+              ("file_read_chunks", FILE_READ_CHUNKS),
+              ("file_write_lines", FILE_WRITE_LINES),
+              ("file_write_each", FILE_WRITE_EACH)],
+    "always": [("always_100_timers", ALWAYS_100)],
+    "async": [("async_2000_waits", ASYNC_WAITS)],
+    "parallel": [("serial_map", SERIAL_MAP), ("parallel_map", PARALLEL_MAP)],
+    "memo": [("ncr_plain", ncr_loop("")), ("ncr_pure", ncr_loop("pure "))],
+    "arrays": [("array_loop", ARRAY_LOOP), ("array_vector", ARRAY_VECTOR)],
+    "exec": [("exec_loop", EXEC_LOOP), ("exec_loop_uncached", EXEC_LOOP, {"STARSCRIPT_EXEC_CACHE": "0"})],
+}
+
+# time_script 가 시간 대신 돌려주는 표시
+FAILED = "실패"          # 0 이 아닌 종료 코드: 예전 리비전에는 없는 기능(push 등)을 쓰는 시나리오
+WRONG_OUTPUT = "출력 다름"  # 현재 리비전과 출력이 다름: 그 리비전은 이 시나리오를 제대로 돌리지 못한다
+
+def time_script(main_py, engine, path, repeat, env=None, stdin=None, expected=None):
+    # (가장 빠른 시간 ms 또는 표시, 첫 실행의 stdout). expected 가 있으면 stdout 이 같아야 한다
+    # (예전 리비전 중에는 인자를 무시하고 main.sst 를 돌리는 것도 있어서 종료 코드만으로는 모른다)
+    best = None
+    out = None
+    penv = dict(os.environ, **(env or {}))
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        r = subprocess.run([sys.executable, main_py, "--engine", engine, path], input=stdin,
+                           cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=penv)
+        dt = time.perf_counter()-t0
+        if r.returncode!=0:
+            return FAILED, None
+        if out is None:
+            out = r.stdout
+            if expected is not None and out!=expected:
+                return WRONG_OUTPUT, out
+        best = dt if best is None else min(best, dt)
+    return best*1000, out
+
+def checkout_main(rev, tmpdir):
+    src = subprocess.run(["git", "show", rev+":main.py"], cwd=HERE, check=True,
+                         capture_output=True).stdout
+    path = os.path.join(tmpdir, "main_"+rev.replace("/", "_").replace("~", "_")+".py")
+    with open(path, "wb") as f:
+        f.write(src)
+    return path
+
+def load_main(main_py, label):
+    spec = importlib.util.spec_from_file_location("bench_main_"+str(abs(hash(label))), main_py)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def count_nodes(x):
+    # 트리 안의 튜플 수 (노드, 매개변수 쌍, elif 쌍 포함). 리비전끼리 같은 규칙으로 센다
+    if isinstance(x, tuple):
+        return 1+sum(count_nodes(y) for y in x)
+    if isinstance(x, list):
+        return sum(count_nodes(y) for y in x)
+    return 0
+
+def traced(build):
+    # build() 가 만든 객체가 붙잡고 있는 바이트 수
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]-before
+    tracemalloc.stop()
+    return obj, size
+
+def memory_report(main_py, label, src):
+    mod = load_main(main_py, label)
+    toks, tok_bytes = traced(lambda: mod.tokenize(src))
+    del toks
+    stmts, ast_bytes = traced(lambda: mod.parse_source(src))
+    ntok = len(mod.tokenize(src))
+    nnode = count_nodes(stmts)
+    return (f"  {label:<10} 토큰 {ntok:6d}개 x {tok_bytes/ntok:6.1f}B   "
+            f"트리 {nnode:6d}노드 x {ast_bytes/nnode:6.1f}B   "
+            f"(합계 {(tok_bytes+ast_bytes)/1024:8.1f}KiB)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="starscript 마이크로벤치마크")
+    ap.add_argument("groups", nargs="*", help="실행할 그룹 (기본: 전부)")
+    ap.add_argument("--against", help="비교할 git 리비전")
+    ap.add_argument("--engines", default="tree,vm")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--memory", action="store_true", help="토큰/트리 메모리만 보고")
+    args = ap.parse_args(argv)
+
+    groups = args.groups or list(GROUPS)
+    engines = args.engines.split(",")
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = [("현재", os.path.join(HERE, "main.py"))]
+        if args.against:
+            targets.insert(0, (args.against, checkout_main(args.against, tmp)))
+        if args.memory:
+            print("[memory] BIG_SOURCE")
+            for label, main_py in targets:
+                print(memory_report(main_py, label, BIG_SOURCE))
+            return
+        with open(os.path.join(tmp, "lines.txt"), "w", encoding="utf-8") as f:
+            f.write(LINES_TXT)
+        for g in groups:
+            print("["+g+"]")
+            for name, src, *extra in GROUPS[g]:
+                path = os.path.join(tmp, name+".sst")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(src.replace("{tmp}", tmp))
+                env, stdin = (list(extra)+[None, None])[:2]
+                # 현재 리비전의 첫 엔진 출력이 기준: 다른 엔진과 비교 리비전은 같은 출력을 내야 한다
+                expected = None
+                for engine in engines:
+                    times = {}
+                    for label, main_py in reversed(targets):
+                        ms, out = time_script(main_py, engine, path, args.repeat, env, stdin, expected)
+                        if expected is None and main_py==targets[-1][1] and ms not in (FAILED, WRONG_OUTPUT):
+                            expected = out
+                        times[label] = ms
+                    cols = [f"{label}: {ms:8.1f}ms" if not isinstance(ms, str) else f"{label}: {ms:>8}  "
+                            for label, ms in ((label, times[label]) for label, _ in targets)]
+                    print(f"  {name:<22} {engine:<5} "+"   ".join(cols))
+
+if __name__=="__main__":
+    main()
@@ -1,120 +1,183 @@
-import sys, threading, time
+import sys, threading, time, operator, argparse, os, re, hashlib, marshal, array, itertools, weakref
+import math as pymath
+import mmap
+import atexit, heapq, io
+from contextlib import contextmanager
+from collections import OrderedDict
 
-environment = {}
-user_types = {}
-user_functions = {}
+class Scope:
+    # 모듈(전역) 이름공간. 전역 이름은 문자열 키로 찾는다
+    __slots__ = ("vars",)
 
-class ReturnException(Exception):
-    def __init__(self, value):
-        super().__init__("ReturnException")
-        self.value = value
+    def __init__(self):
+        self.vars = {}
+
+# 아직 값이 대입되지 않은 지역 슬롯
+UNSET = object()
+
+class Frame:
+    # 함수 호출 하나의 프레임. 지역 변수는 Resolver 가 정한 슬롯 번호로 읽고 쓴다.
+    # parent 는 함수가 선언된 프레임(클로저), globals 는 모듈 전역 dict
+    __slots__ = ("slots", "parent", "globals", "retval")
+
+    def __init__(self, nslots, parent, globals):
+        self.slots = [UNSET]*nslots
+        self.parent = parent
+        self.globals = globals
+        self.retval = None
+
+class Function:
+    # 사용자 함수 값. closure 는 선언된 프레임을 참조한다.
+    # method_of 는 newtype 메서드일 때 그 타입. 메서드 프레임의 0번 슬롯은 받는 객체다
+    # memo 는 pure func 일 때 결과 캐시(MemoCache), 아니면 None
+    # is_async 면 호출할 때 본문을 바로 실행하지 않고 이벤트 루프의 작업으로 만든다
+    # code 는 VM 이 처음 부를 때 채우는 본문의 CodeObject (function_code 참고)
+    __slots__ = ("name", "params", "body", "nslots", "closure", "method_of", "memo", "is_async", "code")
+
+    def __init__(self, name, params, body, nslots, closure, method_of=None, memo=None, is_async=False):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.nslots = nslots
+        self.closure = closure
+        self.method_of = method_of
+        self.memo = memo
+        self.is_async = is_async
+        self.code = None
+
+    def __repr__(self):
+        return "<func "+self.name+">"
+
+class StarType:
+    # newtype 으로 선언된 타입. 메서드 Function 은 여기에 한 번만 만들어 두고
+    # 모든 인스턴스가 함께 쓴다 (클로저는 타입이 선언된 프레임)
+    __slots__ = ("name", "fields", "field_index", "methods")
+
+    def __init__(self, name, fields, methods, scope):
+        self.name = name
+        self.fields = fields
+        self.field_index = {fnm: i for i, (ft, fnm) in enumerate(fields)}
+        self.methods = {}
+        for (_, mname, mparams, mbody, nslots) in methods:
+            self.methods[mname] = Function(mname, mparams, mbody, nslots, scope, self)
+
+    def __repr__(self):
+        return "<type "+self.name+">"
+
+class Record:
+    # newtype 값. values[i] 가 type.fields[i] 의 값이다.
+    # compiled 는 exec 한 code 레코드만 채운다 (ExecProgram)
+    __slots__ = ("type", "values", "compiled")
+
+    def __init__(self, stype, values):
+        self.type = stype
+        self.values = values
+
+    def __repr__(self):
+        return self.type.name+"{"+", ".join(repr(fnm)+": "+repr(v)
+                                            for (ft, fnm), v in zip(self.type.fields, self.values))+"}"
 
-class BreakException(Exception):
-    pass
+    def __eq__(self, o):
+        # 예전 dict 레코드처럼 같은 타입에 필드 값이 모두 같으면 같다 (compiled 는 보지 않는다)
+        if o.__class__ is not Record:
+            return NotImplemented
+        return self.type is o.type and self.values==o.values
 
-class ContinueException(Exception):
-    pass
+    __hash__ = None
+
+# 실행 엔진: "tree"(트리 워커) 또는 "vm"(바이트코드 VM)
+ENGINE = "tree"
+
+# exec_stmt 가 돌려주는 완료 상태. 정상 완료는 None
+# (RETURN 의 값은 프레임의 retval 에 담긴다)
+BREAK = 1
+CONTINUE = 2
+RETURN = 3
 
 class Token:
+    # 토큰은 큰 스크립트에서 수만 개가 생기므로 인스턴스 dict 없이 둔다
+    __slots__ = ("type", "value")
+
     def __init__(self, ttype, value):
         self.type = ttype
         self.value = value
     def __repr__(self):
         return f"Token({self.type}, {self.value})"
 
-def tokenize(code):
-    tokens = []
-    i = 0
-    while i < len(code):
-        c = code[i]
-        # 다중행 주석 /* ... */
-        if c == '/' and i+1 < len(code) and code[i+1] == '*':
-            i += 2
-            while i < len(code)-1:
-                if code[i] == '*' and code[i+1] == '/':
-                    i += 2
-                    break
-                i += 1
-            continue
-        # 한줄 주석 // or #
-        if (c == '/' and i+1 < len(code) and code[i+1] == '/') or c == '#':
-            while i < len(code) and code[i] != '\n':
-                i += 1
-            continue
-        if c.isspace():
-            i += 1
-            continue
-        # 식별자(알파벳/언더스코어 시작)
-        if c.isalpha() or c=='_':
-            start = i
-            while i < len(code) and (code[i].isalnum() or code[i]=='_'):
-                i += 1
-            word = code[start:i]
-            tokens.append(Token("IDENT", word))
-            continue
-        # 숫자
-        if c.isdigit():
-            start = i
-            dot_count = 0
-            while i < len(code) and (code[i].isdigit() or code[i]=='.'):
-                if code[i]=='.':
-                    dot_count += 1
-                i += 1
-            num_str = code[start:i]
-            if dot_count>0:
-                tokens.append(Token("NUMBER_FL", float(num_str)))
-            else:
-                tokens.append(Token("NUMBER_NUM", int(num_str)))
-            continue
-        # 문자열
-        if c=='"':
-            i += 1
-            start = i
-            while i < len(code) and code[i]!='"':
-                if code[i]=='\\' and i+1<len(code):
-                    i += 1
-                i += 1
-            string_val = code[start:i].encode().decode("unicode_escape")
-            i += 1
-            tokens.append(Token("STRING", string_val))
-            continue
-        # 세미콜론
-        if c==';':
-            tokens.append(Token("SEMICOLON", ';'))
-            i += 1
-            continue
-        # 2글자 연산자(>=, <= 등), 단일
-        if c in ['>', '<', '=', '!']:
-            if i+1<len(code) and code[i+1]=='=':
-                tokens.append(Token("SYMBOL", c+'='))
-                i += 2
+# 토큰 정규식. 매치 하나가 (앞쪽 공백/주석) + 토큰 하나다.
+# 분기 순서가 곧 우선순위다 (식별자 > 숫자 > 문자열 > 세미콜론 > 기호).
+# 닫히지 않은 /* 는 마지막 한 글자를 남기고 끝까지 주석으로 본다 (예전 동작 그대로)
+TOKEN_RE = re.compile(r"""
+    (?: \s+ | (?://|\#)[^\n]* | /\*[\s\S]*?(?:\*/|(?=[\s\S]\Z)|\Z) )*
+    (?: (?P<IDENT>  [^\W\d]\w* )
+      | (?P<NUMBER> \d[\d.]* )
+      | (?P<STRING> "(?P<BODY>(?:[^"\\]|\\[\s\S]?)*)"? )
+      | (?P<SEMICOLON> ; )
+      | (?P<SYMBOL> [<>=!]=? | [\s\S] ) )?
+""", re.VERBOSE)
+
+def iter_tokens(code):
+    # 토큰을 하나씩 만들어 내는 제너레이터. Parser 는 이것을 바로 소비한다
+    intern = sys.intern
+    for m in TOKEN_RE.finditer(code):
+        kind = m.lastgroup
+        if kind=="IDENT":
+            # 같은 이름은 문자열 하나를 같이 쓴다 (메모리 + 이름표 dict 비교가 빨라짐)
+            yield Token(kind, intern(m[kind]))
+        elif kind=="SYMBOL" or kind=="SEMICOLON":
+            yield Token(kind, m[kind])
+        elif kind=="NUMBER":
+            num_str = m[kind]
+            if '.' in num_str:
+                yield Token("NUMBER_FL", float(num_str))
             else:
-                tokens.append(Token("SYMBOL", c))
-                i += 1
-            continue
-        # 기타 기호
-        tokens.append(Token("SYMBOL", c))
-        i += 1
-    return tokens
+                yield Token("NUMBER_NUM", int(num_str))
+        elif kind=="STRING":
+            yield Token("STRING", m["BODY"].encode().decode("unicode_escape"))
+        # kind 가 None 이면 끝에 남은 공백/주석뿐인 매치
+
+def tokenize(code):
+    # 전체 토큰 리스트가 필요할 때 쓰는 일괄 버전
+    return list(iter_tokens(code))
+
+# 입력 끝. 매번 새로 만들지 않고 하나를 같이 쓴다
+EOF_TOKEN = Token("EOF", None)
+
+# 연산자 결합력 (클수록 먼저 묶인다). 같은 값끼리는 왼쪽 결합
+ASSIGN_BP = 1
+BINARY_BP = {"or": 2, "and": 3,
+             ">": 4, "<": 4, ">=": 4, "<=": 4, "==": 4, "!=": 4,
+             "+": 5, "-": 5,
+             "*": 6, "/": 6, "%": 6}
+UNARY_BP = 7     # 단항 + - not 의 피연산자는 후위 연산까지만 묶는다
+POSTFIX_BP = 8   # 호출 f(), 멤버 a.b, 인덱스 a[i]
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
+        # tokens 는 리스트든 iter_tokens() 제너레이터든 된다.
+        # 내다볼(peek) 만큼만 buf 에 꺼내 둔다
+        self.tokens = iter(tokens)
+        self.buf = []
+
+    def fill(self, n):
+        buf = self.buf
+        while len(buf) < n:
+            buf.append(next(self.tokens, EOF_TOKEN))
 
     def current_token(self):
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        return Token("EOF", None)
+        if not self.buf:
+            self.fill(1)
+        return self.buf[0]
 
     def advance(self):
-        self.pos += 1
+        if self.buf:
+            del self.buf[0]
+        else:
+            next(self.tokens, None)
 
     def peek_token(self, offset=1):
-        idx = self.pos+offset
-        if idx < len(self.tokens):
-            return self.tokens[idx]
-        return Token("EOF", None)
+        self.fill(offset+1)
+        return self.buf[offset]
 
     def parse_program(self):
         statements = []
@@ -133,6 +196,14 @@ class Parser:
                 return self.parse_newtype_stmt()
             if t.value=="func":
                 return self.parse_func_decl()
+            if t.value=="pure" and self.peek_token(1).type=="IDENT" and self.peek_token(1).value=="func":
+                # pure func: 같은 인자에는 같은 결과 -> 호출 결과를 캐시한다
+                self.advance()
+                return self.parse_func_decl(pure=True)
+            if t.value=="async" and self.peek_token(1).type=="IDENT" and self.peek_token(1).value=="func":
+                # async func: 호출하면 작업(task)이 되고, 본문에서 await 를 쓸 수 있다
+                self.advance()
+                return self.parse_func_decl(is_async=True)
             if t.value=="always":
                 return self.parse_always_stmt()
             if t.value=="if":
@@ -283,8 +354,8 @@ class Parser:
 
         return ("func_decl", fname, params, body)
 
-    def parse_func_decl(self):
-        # func <함수이름>(...) : ... end;
+    def parse_func_decl(self, pure=False, is_async=False):
+        # [pure|async] func <함수이름>(...) : ... end;
         self.advance()
         if self.current_token().type!="IDENT":
             raise Exception("함수 선언 오류: 이름 필요")
@@ -333,7 +404,7 @@ class Parser:
             s2 = self.parse_statement()
             body.append(s2)
 
-        return ("func_decl", fname, params, body)
+        return ("func_decl", fname, params, body, pure, is_async)
 
     def parse_always_stmt(self):
         self.advance()
@@ -341,9 +412,21 @@ class Parser:
             raise Exception("always 오류: '(' 필요")
         self.advance()
         interval_expr = self.parse_expression()
+        # always (간격, "rate"|"delay") as 이름 : 모드와 핸들 이름은 없어도 된다
+        mode_expr = None
+        if self.current_token().type=="SYMBOL" and self.current_token().value==',':
+            self.advance()
+            mode_expr = self.parse_expression()
         if self.current_token().type!="SYMBOL" or self.current_token().value!=')':
             raise Exception("always 오류: ')' 필요")
         self.advance()
+        handle = None
+        if self.current_token().type=="IDENT" and self.current_token().value=="as":
+            self.advance()
+            if self.current_token().type!="IDENT":
+                raise Exception("always 오류: as 뒤에 이름 필요")
+            handle = self.current_token().value
+            self.advance()
 
         if self.current_token().type!="SYMBOL" or self.current_token().value!=':':
             raise Exception("always 오류: ':' 필요")
@@ -364,7 +447,7 @@ class Parser:
             st3 = self.parse_statement()
             bstmts.append(st3)
 
-        return ("always_block", interval_expr, bstmts)
+        return ("always_block", interval_expr, bstmts, mode_expr, handle)
 
     def parse_if_stmt(self):
         self.advance() # if
@@ -501,659 +584,3540 @@ class Parser:
             raise Exception("expr_stmt 오류: 세미콜론 ';' 필요")
         return ("expr_stmt", e)
 
-    def parse_expression(self):
-        return self.parse_assignment()
-
-    def parse_assignment(self):
-        expr = self.parse_logical_or()
-        if self.current_token().type=="SYMBOL" and self.current_token().value=='=':
-            self.advance()
-            rhs = self.parse_assignment()
-            expr = ("assign", expr, rhs)
-        return expr
-
-    def parse_logical_or(self):
-        expr = self.parse_logical_and()
-        while self.current_token().type=="IDENT" and self.current_token().value=="or":
-            self.advance()
-            right = self.parse_logical_and()
-            expr = ("binary","or",expr,right)
-        return expr
-
-    def parse_logical_and(self):
-        expr = self.parse_comparison()
-        while self.current_token().type=="IDENT" and self.current_token().value=="and":
-            self.advance()
-            right = self.parse_comparison()
-            expr = ("binary","and",expr,right)
-        return expr
-
-    def parse_comparison(self):
-        expr = self.parse_additive()
-        while self.current_token().type=="SYMBOL" and self.current_token().value in ['>','<','>=','<=','==','!=']:
-            op = self.current_token().value
-            self.advance()
-            r = self.parse_additive()
-            expr = ("binary",op,expr,r)
-        return expr
-
-    def parse_additive(self):
-        expr = self.parse_multiplicative()
-        while self.current_token().type=="SYMBOL" and self.current_token().value in ['+','-']:
-            op = self.current_token().value
-            self.advance()
-            r = self.parse_multiplicative()
-            expr = ("binary", op, expr, r)
-        return expr
-
-    def parse_multiplicative(self):
-        expr = self.parse_unary()
-        while self.current_token().type=="SYMBOL" and self.current_token().value in ['*','/','%']:
-            op = self.current_token().value
-            self.advance()
-            r = self.parse_unary()
-            expr = ("binary", op, expr, r)
-        return expr
-
-    def parse_unary(self):
-        if ((self.current_token().type=="SYMBOL" and self.current_token().value in ['+','-']) or
-            (self.current_token().type=="IDENT" and self.current_token().value=="not")):
-            op = self.current_token().value
-            self.advance()
-            operand = self.parse_unary()
-            return ("unary", op, operand)
-        else:
-            return self.parse_postfix()
+    # --- 표현식: 연산자 표 기반 Pratt 파서 ---
+    # 피연산자 하나는 NUD 표 한 번, 뒤따르는 연산자 하나는 LED 표 한 번으로 처리한다.
+    # 새 연산자는 BINARY_BP 에 우선순위를 넣으면 된다 (평가 쪽 BINOPS 도 함께).
 
-    def parse_postfix(self):
-        expr = self.parse_primary()
+    def parse_expression(self, min_bp=0):
+        tk = self.current_token()
+        nud = self.NUD.get(tk.value if tk.type=="SYMBOL" else tk.type)
+        if nud is None:
+            raise Exception(("표현식 파싱 오류", tk))
+        self.advance()
+        left = nud(self, tk)
         while True:
             t0 = self.current_token()
-            if t0.type=="SYMBOL" and t0.value=='(':
-                # 함수 호출
-                self.advance()
-                args=[]
-                if not(self.current_token().type=="SYMBOL" and self.current_token().value==')'):
-                    while True:
-                        arg = self.parse_expression()
-                        args.append(arg)
-                        if self.current_token().type=="SYMBOL" and self.current_token().value==',':
-                            self.advance()
-                        else:
-                            break
-                if self.current_token().type!="SYMBOL" or self.current_token().value!=')':
-                    raise Exception("함수 호출 오류: ')' 필요")
-                self.advance()
-                expr = ("func_call", expr, args)
-            elif t0.type=="SYMBOL" and t0.value=='.':
-                # 멤버 접근 or 호출
-                self.advance()
-                if self.current_token().type!="IDENT":
-                    raise Exception("멤버 접근 오류: 식별자 필요")
-                memb = self.current_token().value
-                self.advance()
-                t1 = self.current_token()
-                if t1.type=="SYMBOL" and t1.value=='(':
-                    # 멤버 함수 호출
-                    self.advance()
-                    margs=[]
-                    if not(self.current_token().type=="SYMBOL" and self.current_token().value==')'):
-                        while True:
-                            aa = self.parse_expression()
-                            margs.append(aa)
-                            if self.current_token().type=="SYMBOL" and self.current_token().value==',':
-                                self.advance()
-                            else:
-                                break
-                    if self.current_token().type!="SYMBOL" or self.current_token().value!=')':
-                        raise Exception("멤버 호출 오류: ')' 필요")
-                    self.advance()
-                    expr = ("member_call", expr, memb, margs)
-                else:
-                    expr = ("member_access", expr, memb)
-            elif t0.type=="SYMBOL" and t0.value=='[':
-                # 인덱스
-                self.advance()
-                idx_expr = self.parse_expression()
-                if self.current_token().type!="SYMBOL" or self.current_token().value!=']':
-                    raise Exception("인덱스 오류: ']' 필요")
-                self.advance()
-                expr = ("index", expr, idx_expr)
-            else:
-                break
-        return expr
-
-    def parse_primary(self):
-        tk = self.current_token()
-        if tk.type=="IDENT" and tk.value in ["true","false"]:
-            self.advance()
-            return ("literal","BOOL",True if tk.value=="true" else False)
-        if tk.type=="SYMBOL" and tk.value=='[':
+            if t0.type!="SYMBOL" and t0.type!="IDENT":
+                return left
+            led = self.LED.get(t0.value)
+            if led is None or led[0] <= min_bp:
+                return left
             self.advance()
-            arr=[]
-            if self.current_token().type=="SYMBOL" and self.current_token().value==']':
-                self.advance()
-                return ("li", arr)
+            left = led[1](self, left, t0)
+
+    def parse_args(self, closer, errmsg):
+        # '(' 다음부터 닫는 기호까지의 쉼표 목록
+        args=[]
+        if not(self.current_token().type=="SYMBOL" and self.current_token().value==closer):
             while True:
-                e2 = self.parse_expression()
-                arr.append(e2)
+                args.append(self.parse_expression())
                 if self.current_token().type=="SYMBOL" and self.current_token().value==',':
                     self.advance()
-                elif self.current_token().type=="SYMBOL" and self.current_token().value==']':
-                    self.advance()
-                    break
                 else:
-                    raise Exception("배열 리터럴 오류: ',' 또는 ']' 필요")
-            return ("li", arr)
-        if tk.type=="SYMBOL" and tk.value=='{':
-            # 레코드
-            self.advance()
-            rec=[]
-            if self.current_token().type=="SYMBOL" and self.current_token().value=='}':
-                self.advance()
-                return ("record", rec)
-            while True:
-                e3 = self.parse_expression()
-                rec.append(e3)
-                if self.current_token().type=="SYMBOL" and self.current_token().value==',':
-                    self.advance()
-                elif self.current_token().type=="SYMBOL" and self.current_token().value=='}':
-                    self.advance()
                     break
-                else:
-                    raise Exception("레코드 리터럴 오류: ',' 또는 '}' 필요")
-            return ("record", rec)
-        if tk.type in ["NUMBER_NUM","NUMBER_FL","STRING"]:
-            self.advance()
-            return ("literal", tk.type, tk.value)
-        if tk.type=="IDENT":
-            self.advance()
-            return ("ident", tk.value)
-        if tk.type=="SYMBOL" and tk.value=='(':
+        if self.current_token().type!="SYMBOL" or self.current_token().value!=closer:
+            raise Exception(errmsg)
+        self.advance()
+        return args
+
+    def parse_items(self, closer, kind, errmsg):
+        # 배열/레코드 리터럴의 원소 목록
+        items=[]
+        if self.current_token().type=="SYMBOL" and self.current_token().value==closer:
             self.advance()
-            e4 = self.parse_expression()
-            if self.current_token().type!="SYMBOL" or self.current_token().value!=')':
-                raise Exception("괄호 오류: ')' 필요")
+            return (kind, items)
+        while True:
+            items.append(self.parse_expression())
+            if self.current_token().type=="SYMBOL" and self.current_token().value==',':
+                self.advance()
+            elif self.current_token().type=="SYMBOL" and self.current_token().value==closer:
+                self.advance()
+                break
+            else:
+                raise Exception(errmsg)
+        return (kind, items)
+
+    # NUD: 피연산자 자리에 온 토큰 (tk 는 이미 소비됨)
+
+    def nud_literal(self, tk):
+        return ("literal", tk.type, tk.value)
+
+    def nud_ident(self, tk):
+        v = tk.value
+        if v=="true" or v=="false":
+            return ("literal","BOOL",v=="true")
+        if v=="not":
+            return ("unary", v, self.parse_expression(UNARY_BP))
+        if v=="await":
+            return ("await", self.parse_expression(UNARY_BP))
+        return ("ident", v)
+
+    def nud_unary(self, tk):
+        return ("unary", tk.value, self.parse_expression(UNARY_BP))
+
+    def nud_list(self, tk):
+        return self.parse_items(']', "li", "배열 리터럴 오류: ',' 또는 ']' 필요")
+
+    def nud_record(self, tk):
+        return self.parse_items('}', "record", "레코드 리터럴 오류: ',' 또는 '}' 필요")
+
+    def nud_paren(self, tk):
+        e4 = self.parse_expression()
+        if self.current_token().type!="SYMBOL" or self.current_token().value!=')':
+            raise Exception("괄호 오류: ')' 필요")
+        self.advance()
+        return e4
+
+    # LED: 왼쪽 피연산자 뒤에 온 연산자 (t0 는 이미 소비됨)
+
+    def led_binary(self, left, t0):
+        return ("binary", t0.value, left, self.parse_expression(BINARY_BP[t0.value]))
+
+    def led_assign(self, left, t0):
+        # 오른쪽 결합: a = b = c
+        return ("assign", left, self.parse_expression())
+
+    def led_call(self, left, t0):
+        return ("func_call", left, self.parse_args(')', "함수 호출 오류: ')' 필요"))
+
+    def led_member(self, left, t0):
+        # 멤버 접근 or 호출
+        if self.current_token().type!="IDENT":
+            raise Exception("멤버 접근 오류: 식별자 필요")
+        memb = self.current_token().value
+        self.advance()
+        t1 = self.current_token()
+        if t1.type=="SYMBOL" and t1.value=='(':
             self.advance()
-            return e4
-        raise Exception(("표현식 파싱 오류", tk))
+            return ("member_call", left, memb, self.parse_args(')', "멤버 호출 오류: ')' 필요"))
+        return ("member_access", left, memb)
 
-def interpret(statements):
-    for st in statements:
-        exec_stmt(st)
-
-def exec_stmt(stmt):
-    global environment
-    stype = stmt[0]
-
-    if stype=="newtype":
-        # ("newtype", tname, fields, methods)
-        _, tname, fields, methods = stmt
-        user_types[tname] = {"fields":fields, "methods":methods}
-        # 환경에도 등록
-        environment[tname] = {"newtype":tname, "fields":fields, "methods":methods}
-        return
+    def led_index(self, left, t0):
+        idx_expr = self.parse_expression()
+        if self.current_token().type!="SYMBOL" or self.current_token().value!=']':
+            raise Exception("인덱스 오류: ']' 필요")
+        self.advance()
+        return ("index", left, idx_expr)
 
-    elif stype=="func_decl":
-        # ("func_decl", fn, params, body)
-        _, fn, ps, bd = stmt
-        func_obj = ("function", ps, bd, environment.copy())
-        user_functions[fn] = func_obj
-        environment[fn] = func_obj
-        return
+    NUD = {"NUMBER_NUM": nud_literal, "NUMBER_FL": nud_literal, "STRING": nud_literal,
+           "IDENT": nud_ident, "+": nud_unary, "-": nud_unary,
+           "[": nud_list, "{": nud_record, "(": nud_paren}
+    LED = {"=": (ASSIGN_BP, led_assign), "(": (POSTFIX_BP, led_call),
+           ".": (POSTFIX_BP, led_member), "[": (POSTFIX_BP, led_index)}
 
-    elif stype=="var_decl":
-        # ("var_decl", vtype, vname, init)
-        _, vt, vn, init = stmt
-        val = eval_expr(init)
-
-        # 기본 타입 변환
-        if vt=="num":
-            val = int(val)
-        elif vt=="fl":
-            val = float(val)
-        elif vt=="str":
-            val = str(val)
-        elif vt=="bool":
-            val = bool(val)
-        elif vt in user_types:
-            # 사용자 정의 타입
-            type_info = user_types[vt]
-            fields = type_info["fields"]
-            methods = type_info["methods"]
-            if isinstance(val, list):
-                # record(...)의 결과
-                if len(val)!=len(fields):
-                    raise Exception(vt+" 타입 필드 수 불일치")
-                rec={}
-                for ((ft,fnm), fv) in zip(fields,val):
-                    rec[fnm] = fv
-                # 메서드 삽입
-                for m in methods:
-                    (_, mname, mparams, mbody) = m
-                    func_obj = ("function", mparams, mbody, environment.copy())
-                    rec[mname] = func_obj
-                val = rec
-            elif isinstance(val, dict):
-                pass
-            else:
-                raise Exception("레코드 초기값은 { ... } 형태여야 합니다.")
-        else:
-            pass
+# 이항 연산자는 모두 led_binary 로 처리한다
+Parser.LED.update({op: (bp, Parser.led_binary) for op, bp in BINARY_BP.items()})
 
-        environment[vn] = val
-        return
+# ---------------------------------------------------------------
+# 리졸버: parse_program() 결과의 식별자를 실행 전에 확정하고,
+# 문자열 태그 트리를 정수 종류 코드(K_*)를 쓰는 실행용 트리로 바꾼다
+#   ("ident", name) →  (K_LOCAL, name, slot)         현재 함수 프레임
+#                      (K_UPVAL, name, depth, slot)  바깥 함수 프레임 (캡처)
+#                      (K_GLOBAL, name)              모듈 전역 dict
+#                      (K_FIELD, name, depth, index) 메서드가 받은 객체의 필드
+#   스코프는 함수 단위다 (if/while 블록은 새 스코프를 만들지 않는다).
+#   어디에도 선언되지 않은 이름은 실행을 시작하기 전에 한꺼번에 보고한다.
+# ---------------------------------------------------------------
 
-    elif stype=="use":
-        _, mname = stmt
-        fname = mname+".sst"
-        try:
-            with open(fname,"r",encoding="utf-8") as f:
-                mc = f.read()
-        except Exception as e:
-            raise Exception("파일 읽기 실패: "+str(e))
+# 실행용 트리의 노드 종류. 트리 워커는 이 번호로 처리 함수 표를 색인한다
+(K_LOCAL, K_UPVAL, K_GLOBAL, K_FIELD, K_CONST, K_ASSIGN, K_UNARY, K_BINARY, K_CALL,
+ K_BUILTIN_CALL, K_MEMBER_CALL, K_MEMBER_ACCESS, K_INDEX, K_LIST, K_RECORD,
+ K_EXPR_STMT, K_VAR_DECL, K_FUNC_DECL, K_NEWTYPE, K_USE, K_RETURN, K_IF,
+ K_WHILE, K_ALWAYS, K_BREAK, K_CONTINUE, K_TAIL_CALL, K_AWAIT) = range(28)
 
-        tks = tokenize(mc)
-        p2 = Parser(tks)
-        sms = p2.parse_program()
-        backup = environment.copy()
-        environment.clear()
-        interpret(sms)
-        mod_defs = environment.copy()
-        environment.clear()
-        environment.update(backup)
-        environment[mname] = mod_defs
-        return
+KINDNAMES = ["local", "upval", "global", "field", "const", "assign", "unary", "binary", "call",
+             "builtin_call", "member_call", "member_access", "index", "li", "record",
+             "expr_stmt", "var_decl", "func_decl", "newtype", "use", "return_stmt",
+             "if_stmt", "while_stmt", "always_block", "break_stmt", "continue_stmt", "tail_call",
+             "await"]
 
-    elif stype=="expr_stmt":
-        eval_expr(stmt[1])
-        return
+BUILTIN_NAMES = ("output", "input", "error", "exec", "flush")
+REF_KINDS = (K_LOCAL, K_UPVAL, K_GLOBAL, K_FIELD)
 
-    elif stype=="return_stmt":
-        _, exr = stmt
-        rv = eval_expr(exr)
-        raise ReturnException(rv)
-
-    elif stype=="if_stmt":
-        _, ifc, ifb, elifs, elseb = stmt
-        cval = eval_expr(ifc)
-        if cval:
-            for s1 in ifb:
-                exec_stmt(s1)
-        else:
-            done=False
-            for ccond,cblk in elifs:
-                cc = eval_expr(ccond)
-                if cc:
-                    for s2 in cblk:
-                        exec_stmt(s2)
-                    done=True
-                    break
-            if not done and elseb is not None:
-                for s3 in elseb:
-                    exec_stmt(s3)
-        return
+class Resolver:
+    def __init__(self, known_globals=(), for_exec=False, layout=None):
+        self.globals = set(known_globals)
+        # exec 코드는 리졸브 결과를 다음 exec 에서도 쓰므로, 바깥 전역에 기대는 판단을 기록해 둔다
+        self.for_exec = for_exec
+        self.own = ()       # 프로그램이 스스로 만드는 전역 이름
+        self.free = []      # (이름, 오류 메시지용 위치): 프로그램 밖에 있어야 하는 전역 이름
+        self.probes = {}    # 이름 -> 그 이름이 전역에 있었는가 (함수 안 대입이 전역인지 지역인지 가른 이름)
+        self.scopes = []    # 함수 스코프 스택. 각 항목은 {이름: 슬롯}
+        self.fieldmaps = [] # scopes 와 나란한 스택. 메서드면 {필드이름: 필드번호}
+        self.fnames = []    # 오류 메시지용 함수 이름 스택
+        self.errors = []
+        self.loop_depth = 0   # break/continue 가 허용되는지 확인용
+        self.tail_ok = False  # return f(...) 를 꼬리 호출로 바꿔도 되는지 (보통 함수 본문 안)
+        self.in_async = False # await 를 쓸 수 있는지 (async func 본문 안)
+        if layout is not None:
+            # 함수 안의 exec: 부른 함수들의 스코프를 그대로 깔고 시작한다 (frame_layout 참고)
+            for fname, slots, fmap in layout:
+                self.fnames.append(fname)
+                self.scopes.append(dict(slots))
+                self.fieldmaps.append(dict(fmap))
 
-    elif stype=="while_stmt":
-        _, cexpr, wblk = stmt
-        while True:
-            condv = eval_expr(cexpr)
-            if not condv:
-                break
-            try:
-                for s4 in wblk:
-                    exec_stmt(s4)
-            except BreakException:
-                break
-            except ContinueException:
-                continue
-        return
+    def frame_layout(self):
+        # 지금 보이는 함수 스코프들 (바깥부터). exec 코드를 부른 프레임에 맞춰 리졸브하는 데 쓴다
+        if not self.scopes:
+            return None
+        return tuple((fname, tuple(slots.items()), tuple(fmap.items()))
+                     for fname, slots, fmap in zip(self.fnames, self.scopes, self.fieldmaps))
 
-    elif stype=="always_block":
-        _, intex, b1 = stmt
-        ival = eval_expr(intex)
-        def loopf():
-            while True:
-                for s5 in b1:
-                    exec_stmt(s5)
-                time.sleep(ival)
-        t = threading.Thread(target=loopf)
-        t.daemon=True
-        t.start()
-        return
+    def resolve_program(self, stmts):
+        declared, assigned = self.collect(stmts)
+        self.globals.update(declared)
+        self.globals.update(assigned)
+        if self.for_exec:
+            self.own = set(declared)|set(assigned)
+        out = self.block(stmts)
+        if self.errors:
+            raise Exception("정의되지 않은 식별자: "+", ".join(self.errors))
+        return out
 
-    elif stype=="break_stmt":
-        raise BreakException()
+    # --- 선언 수집: 블록 안까지 보되 함수 본문 안으로는 들어가지 않는다 ---
 
-    elif stype=="continue_stmt":
-        raise ContinueException()
+    def collect(self, stmts):
+        declared = {}
+        assigned = {}
+        for st in stmts:
+            self.collect_stmt(st, declared, assigned)
+        return declared, assigned
 
-    else:
+    def collect_stmt(self, st, declared, assigned):
+        stype = st[0]
+        if stype=="var_decl":
+            declared[st[2]] = True
+            self.collect_expr(st[3], assigned)
+        elif stype in ("func_decl", "newtype", "use"):
+            declared[st[1]] = True
+        elif stype in ("expr_stmt", "return_stmt"):
+            self.collect_expr(st[1], assigned)
+        elif stype=="if_stmt":
+            _, ifc, ifb, elifs, elseb = st
+            self.collect_expr(ifc, assigned)
+            for cond, blk in [(None, ifb)]+list(elifs)+[(None, elseb or [])]:
+                if cond is not None:
+                    self.collect_expr(cond, assigned)
+                for s2 in blk:
+                    self.collect_stmt(s2, declared, assigned)
+        elif stype in ("while_stmt", "always_block"):
+            self.collect_expr(st[1], assigned)
+            for s2 in st[2]:
+                self.collect_stmt(s2, declared, assigned)
+            if stype=="always_block" and st[4] is not None:
+                declared[st[4]] = True
+
+    def collect_expr(self, e, assigned):
+        # 할당 대상(그리고 input 인자)이 되는 이름을 모은다
+        et = e[0]
+        if et=="assign" and e[1][0]=="ident":
+            assigned[e[1][1]] = True
+        elif et=="func_call" and e[1][0]=="ident" and e[1][1]=="input":
+            for a in e[2]:
+                if a[0]=="ident":
+                    assigned[a[1]] = True
+        for part in e[1:]:
+            if isinstance(part, tuple):
+                self.collect_expr(part, assigned)
+            elif isinstance(part, list):
+                for x in part:
+                    if isinstance(x, tuple):
+                        self.collect_expr(x, assigned)
+
+    # --- 이름 확정 ---
+
+    def enclosing(self, name):
+        for slots, fmap in zip(self.scopes, self.fieldmaps):
+            if name in slots or name in fmap:
+                return True
+        return False
+
+    def ref(self, name):
+        depth = 0
+        for slots, fmap in zip(reversed(self.scopes), reversed(self.fieldmaps)):
+            if name in slots:
+                if depth==0:
+                    return (K_LOCAL, name, slots[name])
+                return (K_UPVAL, name, depth, slots[name])
+            if name in fmap:
+                return (K_FIELD, name, depth, fmap[name])
+            depth += 1
+        if self.for_exec and name not in self.own:
+            ent = (name, name+" (함수 "+self.fnames[-1]+")" if self.fnames else name)
+            if ent not in self.free:
+                self.free.append(ent)
+        if name not in self.globals and host_function(name) is UNSET:
+            where = name+" (함수 "+self.fnames[-1]+")" if self.fnames else name
+            if where not in self.errors:
+                self.errors.append(where)
+        return (K_GLOBAL, name)
+
+    def is_global(self, name):
+        known = name in self.globals
+        if self.for_exec and name not in self.own:
+            self.probes[name] = known
+        return known
+
+    def function(self, fname, params, body, fields=None, is_async=False):
+        # 슬롯 배치: [받는 객체(메서드일 때만)][매개변수...][지역 변수...]
+        # 메서드의 필드 이름은 슬롯이 아니라 받는 객체의 필드 번호로 확정한다.
+        # 매개변수는 같은 이름의 필드를 가리고, 필드와 같은 이름의 선언은 필드에 쓴다
+        fmap = {} if fields is None else {fnm: i for i, fnm in enumerate(fields)}
+        base = 0 if fields is None else 1
+        slots = {}
+        for i, (pt, pn) in enumerate(params):
+            slots[pn] = base+i
+        nslots = base+len(params)
+        declared, assigned = self.collect(body)
+        for n in declared:
+            if n not in slots and n not in fmap:
+                slots[n] = nslots
+                nslots += 1
+        for n in assigned:
+            # 어디에도 없는 이름에 대입하면 지역 변수가 된다
+            if n not in slots and n not in fmap and not self.enclosing(n) and not self.is_global(n):
+                slots[n] = nslots
+                nslots += 1
+        self.scopes.append(slots)
+        self.fieldmaps.append(fmap)
+        self.fnames.append(fname)
+        saved_depth, self.loop_depth = self.loop_depth, 0
+        # 메서드 본문은 call_member 가 직접 실행하므로 꼬리 호출을 만들지 않는다.
+        # async func 본문은 작업 안에서 따로 실행되므로 마찬가지
+        saved_tail, self.tail_ok = self.tail_ok, fields is None and not is_async
+        saved_async, self.in_async = self.in_async, is_async
+        rbody = self.block(body)
+        self.loop_depth = saved_depth
+        self.tail_ok = saved_tail
+        self.in_async = saved_async
+        self.scopes.pop()
+        self.fieldmaps.pop()
+        self.fnames.pop()
+        return rbody, nslots
+
+    def block(self, stmts):
+        return [self.stmt(st) for st in stmts]
+
+    def stmt(self, st):
+        stype = st[0]
+        if stype=="expr_stmt":
+            return (K_EXPR_STMT, self.expr(st[1]))
+        elif stype=="var_decl":
+            _, vt, vn, init = st
+            return (K_VAR_DECL, vt, self.ref(vn), self.expr(init))
+        elif stype=="func_decl":
+            _, fn, ps, bd, pure, is_async = st
+            rbody, nslots = self.function(fn, ps, bd, is_async=is_async)
+            return (K_FUNC_DECL, fn, ps, rbody, nslots, self.ref(fn), pure, is_async)
+        elif stype=="newtype":
+            _, tname, fields, methods = st
+            fnames = [fnm for (ft, fnm) in fields]
+            rmethods = []
+            for (_, mname, mparams, mbody) in methods:
+                rbody, nslots = self.function(tname+"."+mname, mparams, mbody, fnames)
+                rmethods.append((K_FUNC_DECL, mname, mparams, rbody, nslots))
+            return (K_NEWTYPE, tname, fields, rmethods, self.ref(tname))
+        elif stype=="use":
+            return (K_USE, st[1], self.ref(st[1]))
+        elif stype=="return_stmt":
+            rv = self.expr(st[1])
+            if rv[0]==K_CALL and self.tail_ok:
+                # return f(...): 호출한 쪽 프레임을 쌓지 않고 f 로 넘어간다
+                rv = (K_TAIL_CALL,)+rv[1:]
+            return (K_RETURN, rv)
+        elif stype=="if_stmt":
+            _, ifc, ifb, elifs, elseb = st
+            return (K_IF, self.expr(ifc), self.block(ifb),
+                    [(self.expr(c), self.block(b)) for c, b in elifs],
+                    None if elseb is None else self.block(elseb))
+        elif stype=="while_stmt":
+            self.loop_depth += 1
+            rbody = self.block(st[2])
+            self.loop_depth -= 1
+            return (K_WHILE, self.expr(st[1]), rbody)
+        elif stype=="always_block":
+            saved_depth, self.loop_depth = self.loop_depth, 0
+            saved_tail, self.tail_ok = self.tail_ok, False
+            saved_async, self.in_async = self.in_async, False
+            rbody = self.block(st[2])
+            self.loop_depth = saved_depth
+            self.tail_ok = saved_tail
+            self.in_async = saved_async
+            _, intex, _, modex, handle = st
+            return (K_ALWAYS, self.expr(intex), rbody,
+                    None if modex is None else self.expr(modex),
+                    None if handle is None else self.ref(handle))
+        elif stype in ("break_stmt", "continue_stmt"):
+            if self.loop_depth==0:
+                raise Exception(stype[:-5]+"는 반복문 안에서만 사용할 수 있습니다")
+            return (K_BREAK,) if stype=="break_stmt" else (K_CONTINUE,)
+        raise Exception("알수없는 문장 타입: "+str(stype))
+
+    def expr(self, e):
+        et = e[0]
+        if et=="ident":
+            return self.ref(e[1])
+        elif et=="literal":
+            # 리터럴의 토큰 종류는 실행에 필요 없다
+            return (K_CONST, e[2])
+        elif et=="assign":
+            lhs = e[1]
+            lhs = self.ref(lhs[1]) if lhs[0]=="ident" else self.expr(lhs)
+            return (K_ASSIGN, lhs, self.expr(e[2]))
+        elif et=="func_call":
+            _, fx, argl = e
+            if fx[0]=="ident" and fx[1] in BUILTIN_NAMES:
+                # 내장함수는 이름 그대로 둔다. input 인자는 할당 대상
+                if fx[1]=="input":
+                    return (K_BUILTIN_CALL, fx[1], [self.ref(a[1]) if a[0]=="ident" else self.expr(a)
+                                                    for a in argl])
+                if fx[1]=="exec":
+                    # 함수 안의 exec 코드는 부른 함수의 지역 변수도 본다
+                    return (K_BUILTIN_CALL, fx[1], [self.expr(a) for a in argl], self.frame_layout())
+                return (K_BUILTIN_CALL, fx[1], [self.expr(a) for a in argl])
+            return (K_CALL, self.expr(fx), [self.expr(a) for a in argl])
+        elif et=="unary":
+            return (K_UNARY, e[1], self.expr(e[2]))
+        elif et=="binary":
+            return (K_BINARY, e[1], self.expr(e[2]), self.expr(e[3]))
+        elif et=="member_call":
+            return (K_MEMBER_CALL, self.expr(e[1]), e[2], [self.expr(a) for a in e[3]])
+        elif et=="member_access":
+            return (K_MEMBER_ACCESS, self.expr(e[1]), e[2])
+        elif et=="index":
+            return (K_INDEX, self.expr(e[1]), self.expr(e[2]))
+        elif et=="li":
+            return (K_LIST, [self.expr(x) for x in e[1]])
+        elif et=="record":
+            return (K_RECORD, [self.expr(x) for x in e[1]])
+        elif et=="await":
+            if not self.in_async:
+                raise Exception("await는 async func 안에서만 사용할 수 있습니다")
+            return (K_AWAIT, self.expr(e[1]))
+        raise Exception("알수없는 expr 타입: "+str(et))
+
+def parse_source(code, known_globals=()):
+    # 소스 문자열 → 이름이 확정된 문장 목록
+    statements = Parser(iter_tokens(code)).parse_program()
+    return Resolver(known_globals).resolve_program(statements)
+
+# ---------------------------------------------------------------
+# 컴파일 캐시: 소스 옆의 <이름>.sstc 에 리졸브된 문장 목록을 marshal 로 저장한다.
+#   (CACHE_MAGIC, 인터프리터 버전, 소스 해시) 가 모두 맞을 때만 쓰고
+#   낡았거나 깨진 캐시는 다시 만든다. 쓸 수 없는 곳이면 캐시 없이 실행한다.
+# ---------------------------------------------------------------
+
+CACHE_MAGIC = "SSTC1"
+# STARSCRIPT_CACHE=0 이나 --no-cache 로 끈다
+USE_CACHE = os.environ.get("STARSCRIPT_CACHE", "1")!="0"
+INTERP_VERSION = None
+
+def interp_version():
+    # main.py 자체의 해시 + 파이썬 버전 (marshal 형식이 파이썬 버전마다 다를 수 있음).
+    # 인터프리터가 바뀌면 예전 캐시는 모두 낡은 것이 된다
+    global INTERP_VERSION
+    if INTERP_VERSION is None:
+        with open(os.path.abspath(__file__), "rb") as f:
+            h = hashlib.sha256(f.read()).hexdigest()[:16]
+        INTERP_VERSION = h+"-py%d.%d" % sys.version_info[:2]
+    return INTERP_VERSION
+
+def cache_path(path):
+    return os.path.splitext(path)[0]+".sstc"
+
+def load_program(path, code):
+    # path 에서 읽은 소스 code → 리졸브된 문장 목록.
+    # 캐시가 맞으면 토큰화/파싱/리졸브를 모두 건너뛴다
+    if not USE_CACHE:
+        return parse_source(code)
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    cpath = cache_path(path)
+    try:
+        with open(cpath, "rb") as f:
+            magic, ver, ckey, statements = marshal.load(f)
+        if magic==CACHE_MAGIC and ver==interp_version() and ckey==key:
+            return statements
+    except Exception:
+        # 없거나 깨진 캐시
         pass
+    statements = parse_source(code)
+    tmp = cpath+"."+str(os.getpid())+".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            marshal.dump((CACHE_MAGIC, interp_version(), key, statements), f)
+        # 다른 프로세스가 반쯤 쓴 파일을 읽지 않도록 통째로 바꿔 끼운다
+        os.replace(tmp, cpath)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return statements
 
+# 모듈 파일의 리졸브된 문장 목록(과 VM 코드)은 모든 인터프리터가 같이 쓴다. 실행 중에 바뀌지 않는
+# 값이라 나눠 써도 되고, 인스턴스마다 모듈 실행(전역)만 따로 한다.
+# (경로, 소스 해시) -> [문장 목록, VM 코드 또는 None]
+shared_programs = {}
+shared_code = {}      # id(문장 목록) -> shared_programs 의 같은 항목
+shared_lock = threading.Lock()
 
-def eval_expr(expr):
-    global environment
-    etype = expr[0]
+def shared_program(path, code):
+    key = (path, hashlib.sha256(code.encode("utf-8")).hexdigest())
+    ent = shared_programs.get(key)
+    if ent is None:
+        # 파싱은 lock 밖에서. 두 스레드가 같이 파싱했으면 먼저 넣은 쪽을 쓴다
+        statements = load_program(path, code)
+        with shared_lock:
+            ent = shared_programs.get(key)
+            if ent is None:
+                ent = shared_programs[key] = [statements, None]
+                shared_code[id(statements)] = ent
+    return ent[0]
 
-    if etype=="literal":
-        _, tkt, val = expr
-        return val
+def module_frame(scope):
+    # 모듈 최상위 코드를 실행할 프레임 (지역 슬롯 없음)
+    return Frame(0, None, scope.vars)
 
-    elif etype=="ident":
-        _, nm = expr
-        if nm in environment:
-            return environment[nm]
-        else:
-            raise Exception("정의되지 않은 식별자: "+nm)
-
-    elif etype=="assign":
-        _, lhs, rhs = expr
-        if lhs[0]!="ident":
-            raise Exception("할당 왼쪽은 식별자여야 합니다.")
-        vn = lhs[1]
-        v2 = eval_expr(rhs)
-        environment[vn] = v2
-        return v2
-
-    elif etype=="unary":
-        _, op, inr = expr
-        rv = eval_expr(inr)
-        if op=='-':
-            return -rv
-        elif op=='+':
-            return +rv
-        elif op=="not":
-            return not rv
+def interpret(statements, env=None):
+    if env is None:
+        env = module_frame(current().environment)
+    for st in statements:
+        if exec_stmt(st, env)==RETURN:
+            # 최상위 return 은 실행을 끝낸다
+            return
+
+# 트리 워커는 스크립트 호출 하나에 파이썬 프레임 여러 개를 쓴다. 꼬리가 아닌 호출이 TREE_DEPTH 단계보다
+# 깊어지면 그 아래는 VM 으로 실행하므로(run_body_tree) 깊은 재귀는 VM 의 자체 호출 스택에 쌓인다.
+# 프로그램은 그 정도 파이썬 재귀(와 깊게 중첩된 식)를 견딜 만한 스택의 스레드에서 실행한다
+TREE_DEPTH = 200
+DEEP_STACK_SIZE = 256*1024*1024
+DEEP_RECURSION_LIMIT = 50_000
+
+# 스택 크기와 재귀 한도는 프로세스 전체 설정이다. 스택 크기는 스레드를 만드는 동안만 lock 안에서
+# 바꾸고, 재귀 한도는 실행 중인 run_deep 이 하나라도 있는 동안만 올려 두었다가 마지막이 끝나면 되돌린다
+deep_lock = threading.Lock()
+deep_runs = 0
+deep_old_limit = None
+
+def run_deep(fn):
+    # fn() 을 큰 스택 스레드에서 실행하고 결과나 예외를 그대로 돌려준다
+    global deep_runs, deep_old_limit
+    out = []
+    interp = current()
+    def target():
+        # 새 스레드도 부른 쪽과 같은 인터프리터로 실행한다
+        interp_state.interp = interp
+        try:
+            out.append((True, fn()))
+        except RecursionError:
+            out.append((False, Exception("재귀 깊이 초과")))
+        except BaseException as ee:
+            out.append((False, ee))
+    with deep_lock:
+        if deep_runs==0:
+            deep_old_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(deep_old_limit, DEEP_RECURSION_LIMIT))
+        deep_runs += 1
+        try:
+            old_size = threading.stack_size(DEEP_STACK_SIZE)
+            try:
+                t = threading.Thread(target=target, daemon=True)
+                t.start()
+            finally:
+                threading.stack_size(old_size)
+        except BaseException:
+            release_deep()
+            raise
+    try:
+        t.join()
+    finally:
+        with deep_lock:
+            release_deep()
+    ok, val = out[0]
+    if not ok:
+        raise val
+    return val
+
+def release_deep():
+    # deep_lock 을 잡은 채로 부른다
+    global deep_runs
+    deep_runs -= 1
+    if deep_runs==0:
+        sys.setrecursionlimit(deep_old_limit)
+
+def run_statements(statements, env=None, prog=None):
+    # 현재 인터프리터의 엔진(정하지 않았으면 ENGINE)으로 문장 목록을 실행.
+    # prog: statements 의 VM 코드를 한 번만 만들어 두는 ExecProgram (exec 용)
+    interp = current()
+    top = env is None
+    if top:
+        env = module_frame(interp.environment)
+    with interp.scheduler.hold():
+        if (interp.engine or ENGINE)=="vm":
+            run_code(program_code(statements) if prog is None else prog.vm_code(), env)
         else:
-            raise Exception("알수없는 단항연산자: "+op)
+            interpret(statements, env)
+        if top:
+            # 최상위 프로그램이 만든 async 작업을 끝까지 돌린다
+            run_async_tasks()
 
-    elif etype=="binary":
-        _, op, le, re = expr
-        lv = eval_expr(le)
-        rv = eval_expr(re)
-        if op=='+':
-            return lv+rv
-        elif op=='-':
-            return lv-rv
-        elif op=='*':
-            return lv*rv
-        elif op=='/':
-            if isinstance(lv,int) and isinstance(rv,int):
-                return lv//rv
-            else:
-                return lv/rv
-        elif op=='%':
-            return lv%rv
-        elif op=='>':
-            return lv>rv
-        elif op=='<':
-            return lv<rv
-        elif op=='>=':
-            return lv>=rv
-        elif op=='<=':
-            return lv<=rv
-        elif op=='==':
-            return lv==rv
-        elif op=='!=':
-            return lv!=rv
-        elif op=="or":
-            return lv or rv
-        elif op=="and":
-            return lv and rv
+# ---------------------------------------------------------------
+# 공용 런타임 헬퍼 (트리 워커와 VM이 함께 사용)
+# ---------------------------------------------------------------
+
+def peek_ref(ref, env):
+    # 리졸브된 이름의 현재 값 (없으면 UNSET)
+    kind = ref[0]
+    if kind==K_LOCAL:
+        return env.slots[ref[2]]
+    if kind==K_UPVAL:
+        f = env
+        for _ in range(ref[2]):
+            f = f.parent
+        return f.slots[ref[3]]
+    if kind==K_FIELD:
+        f = env
+        for _ in range(ref[2]):
+            f = f.parent
+        return f.slots[0].values[ref[3]]
+    g = env.globals
+    nm = ref[1]
+    if nm in g:
+        return g[nm]
+    return host_function(nm)
+
+def load_ref(ref, env):
+    v = peek_ref(ref, env)
+    if v is UNSET:
+        raise Exception("정의되지 않은 식별자: "+ref[1])
+    return v
+
+def store_ref(ref, env, val):
+    kind = ref[0]
+    if kind==K_LOCAL:
+        env.slots[ref[2]] = val
+    elif kind==K_UPVAL:
+        f = env
+        for _ in range(ref[2]):
+            f = f.parent
+        f.slots[ref[3]] = val
+    elif kind==K_FIELD:
+        f = env
+        for _ in range(ref[2]):
+            f = f.parent
+        f.slots[0].values[ref[3]] = val
+    else:
+        env.globals[ref[1]] = val
+
+# 타입 이름 -> 변환 함수 (NativeFunction 이 등록할 때 한 번 찾아 둔다). 없는 타입은 그대로 넘긴다
+TYPE_CONVERTERS = {"num": int, "fl": float, "str": str, "bool": bool,
+                   "arr": lambda v: to_array(v)}
+
+def coerce_value(vtype, val):
+    # 기본 타입 변환
+    if vtype=="num":
+        return int(val)
+    elif vtype=="fl":
+        return float(val)
+    elif vtype=="str":
+        return str(val)
+    elif vtype=="bool":
+        return bool(val)
+    elif vtype=="arr":
+        return to_array(val)
+    return val
+
+def declare_value(vt, val):
+    # var_decl 의 초기값을 선언 타입에 맞게 변환
+    if vt in ("num","fl","str","bool","arr"):
+        return coerce_value(vt, val)
+    types = interp_state.interp.user_types
+    if vt in types:
+        # 사용자 정의 타입
+        stype = types[vt]
+        if isinstance(val, list):
+            # { ... } 의 결과. 다른 곳에서 쓰는 리스트일 수 있으므로 복사해 둔다
+            if len(val)!=len(stype.fields):
+                raise Exception(vt+" 타입 필드 수 불일치")
+            return Record(stype, list(val))
+        elif isinstance(val, Record):
+            return val
         else:
-            raise Exception("미지원연산자: "+op)
+            raise Exception("레코드 초기값은 { ... } 형태여야 합니다.")
+    return val
 
-    elif etype=="func_call":
-        # ("func_call", fx, argl)
-        _, fx, argl = expr
-        if fx[0]!="ident":
-            raise Exception("함수이름은 식별자여야 함")
-        fn = fx[1]
-
-        # 내장함수
-        if fn=="output":
-            vals = [eval_expr(a) for a in argl]
-            print(" ".join(str(v) for v in vals))
-            return None
-        if fn=="input":
-            ac=len(argl)
-            if ac<1:
-                raise Exception("input에 식별자 최소 1개 필요")
-            var_names=[]
-            for texpr in argl:
-                if texpr[0]!="ident":
-                    raise Exception("input 인자는 식별자여야함")
-                var_names.append(texpr[1])
-            needed=ac
-            gathered=[]
-            while len(gathered)<needed:
-                ln = sys.stdin.readline()
-                if not ln:
-                    raise Exception("입력중단")
-                parts = ln.strip().split()
-                gathered.extend(parts)
-            for i in range(ac):
-                varn = var_names[i]
-                rawv = gathered[i]
-                if varn in environment:
-                    oldv = environment[varn]
-                    if isinstance(oldv,int):
-                        newv = int(rawv)
-                    elif isinstance(oldv,float):
-                        newv = float(rawv)
-                    elif isinstance(oldv,bool):
-                        newv = (rawv.lower() in ["true","1"])
-                    else:
-                        newv = rawv
-                else:
-                    newv = rawv
-                environment[varn] = newv
-            return None
-        if fn=="error":
-            vall = [eval_expr(a) for a in argl]
-            msg = " ".join(str(v) for v in vall)
-            raise Exception("Error: "+msg)
-        if fn=="exec":
-            if len(argl)!=1:
-                raise Exception("exec는 code 하나 필요")
-            code_val = eval_expr(argl[0])
-            if not(isinstance(code_val,dict) and "source" in code_val):
-                raise Exception("exec 인자는 {source:'...'} 형태여야 함")
-            code_str = code_val["source"]
-            if not isinstance(code_str,str):
-                raise Exception("code 자료형의 source 필드는 문자열이어야함")
-            tokens_ = tokenize(code_str)
-            parser_ = Parser(tokens_)
-            statements_ = parser_.parse_program()
-            interpret(statements_)
+def define_newtype(stmt, env):
+    # (K_NEWTYPE, tname, fields, methods, target)
+    _, tname, fields, methods, target = stmt
+    stype = StarType(tname, fields, methods, env)
+    current().user_types[tname] = stype
+    # 환경에도 등록
+    store_ref(target, env, stype)
+
+def make_function(stmt, env):
+    # (K_FUNC_DECL, fn, params, body, nslots, target, pure, is_async)
+    # 클로저는 선언된 프레임을 복사하지 않고 참조한다
+    _, fn, ps, bd, nslots, target, pure, is_async = stmt
+    return Function(fn, ps, bd, nslots, env, None, MemoCache(MEMO_SIZE) if pure else None, is_async)
+
+# --- pure func 결과 캐시 ---
+# 키는 인자 값(과 그 타입). 인자나 결과에 리스트/레코드처럼 바뀔 수 있는 값이 있으면
+# 캐시하지 않고 그냥 실행한다. 가득 차면 가장 오래 쓰지 않은 항목부터 버린다.
+MEMO_SIZE = int(os.environ.get("STARSCRIPT_MEMO_SIZE", "1024"))
+MEMO_KEY_TYPES = (int, float, str, bool, type(None))
+# 살아 있는 모든 캐시 (clear_memo_caches 용). 함수가 사라지면 같이 빠진다
+memo_caches = weakref.WeakSet()
+
+class MemoCache:
+    __slots__ = ("table", "maxsize", "hits", "misses", "__weakref__")
+
+    def __init__(self, maxsize, pure=True):
+        # pure=False 는 pure func 가 아닌 캐시 (exec 코드 캐시): clear_memo_caches 가 비우지 않는다
+        self.table = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        if pure:
+            memo_caches.add(self)
+
+    def clear(self):
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+
+CACHE_INFO_TYPE = StarType("CacheInfo", [("num", "hits"), ("num", "misses"), ("num", "size"), ("num", "maxsize")], [], None)
+
+def memo_info(func):
+    # 함수.cache_info() 의 값: CacheInfo{hits, misses, size, maxsize} 레코드
+    memo = func.memo
+    return Record(CACHE_INFO_TYPE, [memo.hits, memo.misses, len(memo.table), memo.maxsize])
+
+def clear_memo_caches():
+    # 호스트 코드에서 모든 pure func 캐시를 비운다
+    for memo in list(memo_caches):
+        memo.clear()
+
+MEMO_MISS = object()
+
+def memo_key(argvals):
+    # 캐시할 수 없는 인자가 있으면 None
+    for a in argvals:
+        if type(a) not in MEMO_KEY_TYPES:
             return None
+    # 1 과 1.0 과 true 는 같은 키가 되지 않도록 타입도 넣는다
+    return tuple(argvals)+tuple(map(type, argvals))
 
-        # 사용자함수
-        if fn not in user_functions:
-            raise Exception("함수정의안됨: "+fn)
-        finfo = user_functions[fn]
-        fkind, fparams, fbody, fdefenv = finfo
-        if fkind!="function":
-            raise Exception("함수 아님: "+fn)
-        if len(fparams)!=len(argl):
-            raise Exception("함수호출 오류: 매개변수 수 불일치")
-
-        localenv = fdefenv.copy()
-        for (pt,pn), ax in zip(fparams,argl):
-            av = eval_expr(ax)
-            if pt=="num":
-                av = int(av)
-            elif pt=="fl":
-                av = float(av)
-            elif pt=="str":
-                av = str(av)
-            elif pt=="bool":
-                av = bool(av)
-            localenv[pn] = av
-
-        bkup = environment.copy()
-        environment.update(localenv)
-        retv=None
-        try:
-            for stx in fbody:
-                exec_stmt(stx)
-        except ReturnException as rtx:
-            retv = rtx.value
-        environment = bkup
-        return retv
-
-    elif etype=="member_call":
-        # ("member_call", obj_expr, method_name, arg_exprs)
-        _, objexpr, mname, argexprs = expr
-        objval = eval_expr(objexpr)
-        argvals = [eval_expr(a) for a in argexprs]
-
-        if isinstance(objval, dict):
-            if mname not in objval:
-                raise Exception(f"멤버 '{mname}'가 존재하지 않습니다.")
-            func = objval[mname]
-            if not(isinstance(func, tuple) and func[0]=="function"):
-                raise Exception(f"멤버 '{mname}'는 함수가 아님")
+def memo_get(memo, key):
+    table = memo.table
+    if key in table:
+        memo.hits += 1
+        table.move_to_end(key)
+        return table[key]
+    memo.misses += 1
+    return MEMO_MISS
 
-            # 함수 정보
-            fparams = func[1]
-            fbody = func[2]
-            fdefenv = func[3]
-
-            if len(fparams)!=len(argvals):
-                raise Exception("멤버함수 호출: 매개변수 수 불일치")
-
-            # 여기서 **필드를 로컬 env에 복사** => name, age 등을 직접 쓸 수 있게
-            localenv = fdefenv.copy()
-            # 객체에 들어있는 (필드=값)을 로컬에 할당
-            #  - 단, 함수인 항목은 제외
-            for k, v in objval.items():
-                if isinstance(v, tuple) and v[0]=="function":
-                    # 메서드는 복사 안 함
-                    continue
-                localenv[k] = v
-
-            # 함수 파라미터들도 로컬 env에
-            for (ptype,pname), aval in zip(fparams, argvals):
-                castval = aval
-                if ptype=="num":
-                    castval=int(aval)
-                elif ptype=="fl":
-                    castval=float(aval)
-                elif ptype=="str":
-                    castval=str(aval)
-                elif ptype=="bool":
-                    castval=bool(aval)
-                localenv[pname] = castval
-
-            backup = environment.copy()
-            environment.update(localenv)
-            retv=None
-            try:
-                for stmnt in fbody:
-                    exec_stmt(stmnt)
-            except ReturnException as rexc:
-                retv = rexc.value
-
-            # 실행 끝났으면, 로컬 env 변경 사항 => objval에 다시 반영
-            # (필드를 덮어쓰되, 원래 메서드들은 그대로 유지)
-            updated = environment.copy()
-
-            environment.clear()
-            environment.update(backup)
-
-            for k, v in updated.items():
-                # 함수 키만 빼고, objval에 존재하는 필드라면 다시 씌운다
-                if k in objval and not(isinstance(objval[k], tuple) and objval[k][0]=="function"):
-                    objval[k] = v
-
-            return retv
-
-        # 문자열, 리스트 등 다른 타입 가능성 처리
-        if isinstance(objval, str):
-            if mname=="size":
-                if len(argvals)>0:
-                    raise Exception("문자열 size()는 인자 없어야 함")
-                return len(objval)
-            raise Exception("문자열에 없는 메서드: "+mname)
-
-        if isinstance(objval, list):
-            if mname=="size":
-                if len(argvals)>0:
-                    raise Exception("리스트 size()는 인자 없어야 함")
-                return len(objval)
-            raise Exception("리스트에 없는 메서드: "+mname)
-
-        if isinstance(objval, tuple) and objval[0]=="function":
-            # 함수객체 호출
-            fkind, fparams, fbody, fdefenv = objval
-            if len(fparams)!=len(argvals):
-                raise Exception("함수 호출 오류: 매개변수수 불일치")
-            localenv = fdefenv.copy()
-            for (ptype,pname), av in zip(fparams,argvals):
-                if ptype=="num":
-                    av=int(av)
-                elif ptype=="fl":
-                    av=float(av)
-                elif ptype=="str":
-                    av=str(av)
-                elif ptype=="bool":
-                    av=bool(av)
-                localenv[pname]=av
-            backup = environment.copy()
-            environment.update(localenv)
-            retv=None
-            try:
-                for st_ in fbody:
-                    exec_stmt(st_)
-            except ReturnException as rtx:
-                retv = rtx.value
-            environment.clear()
-            environment.update(backup)
-            return retv
-
-        raise Exception("멤버 호출 오류: 해당 객체 타입에서 메서드를 지원하지 않습니다.")
-
-    elif etype=="member_access":
-        # ("member_access", base_expr, memb)
-        _, base, memb = expr
-        baseval = eval_expr(base)
-        if isinstance(baseval, dict):
-            if memb in baseval:
-                return baseval[memb]
-            else:
-                raise Exception("필드 없음: "+memb)
+def memo_put(memo, key, result):
+    if type(result) in MEMO_KEY_TYPES and memo.maxsize>0:
+        table = memo.table
+        table[key] = result
+        if len(table)>memo.maxsize:
+            table.popitem(last=False)
+
+def call_memoized(func, argvals, run_body):
+    key = memo_key(argvals)
+    if key is None:
+        return call_function(func, argvals, run_body, False)
+    result = memo_get(func.memo, key)
+    if result is MEMO_MISS:
+        result = call_function(func, argvals, run_body, False)
+        memo_put(func.memo, key, result)
+    return result
+
+# --- 모듈 표: use 로 불러온 모듈은 프로세스에서 한 번만 실행하고 함께 쓴다 ---
+
+# use 가 현재 디렉터리 다음으로 찾아볼 디렉터리들 (--path, STARSCRIPT_PATH)
+MODULE_PATH = [d for d in os.environ.get("STARSCRIPT_PATH", "").split(os.pathsep) if d]
+# True 면 모듈을 불러올 때마다 걸린 시간을 stderr 로 출력 (--import-time)
+IMPORT_TIME = False
+
+class ModuleEntry:
+    # 모듈 표 항목. scope 가 None 이면 아직 불러오는 중이다.
+    # owner 는 불러오는 스레드, done 은 (성공이든 실패든) 다 불러왔을 때 켜진다
+    __slots__ = ("name", "path", "scope", "seconds", "self_seconds", "owner", "done")
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.scope = None
+        self.seconds = 0.0        # 안쪽 use 까지 포함한 시간
+        self.self_seconds = 0.0   # 안쪽 use 를 뺀 시간
+        self.owner = threading.get_ident()
+        self.done = threading.Event()
+
+# --- 내장 네이티브 모듈: use {이름} 이 .sst 파일보다 먼저 찾는다 ---
+# STARSCRIPT_NATIVE=0 이나 --no-native 면 쓰지 않고 .sst 파일을 불러온다
+USE_NATIVE = os.environ.get("STARSCRIPT_NATIVE", "1")!="0"
+
+class NativeFunction:
+    # 파이썬으로 구현한 함수 값. params 는 Function 과 같은 [(타입, 이름)] 이고
+    # 호출할 때 인자를 그 타입으로 한 번 변환해서 fn 에 넘긴다.
+    # convs 는 매개변수별 변환 함수 (변환할 것이 없으면 None)
+    __slots__ = ("name", "params", "fn", "convs")
+
+    def __init__(self, name, params, fn):
+        self.name = name
+        self.params = params
+        self.fn = fn
+        convs = [TYPE_CONVERTERS.get(pt) for (pt, pn) in params]
+        self.convs = None if not any(convs) else [c or same_value for c in convs]
+
+    def __repr__(self):
+        return "<native func "+self.name+">"
+
+def same_value(v):
+    return v
+
+def call_native(func, argvals):
+    if len(func.params)!=len(argvals):
+        raise Exception("함수호출 오류: 매개변수 수 불일치")
+    convs = func.convs
+    if convs is None:
+        return func.fn(*argvals)
+    return func.fn(*[c(av) for c, av in zip(convs, argvals)])
+
+# --- 호스트 함수 표: 파이썬에서 등록한 함수는 전역 이름처럼 보인다 ---
+# 이름 찾기 순서는 지역 -> 바깥 함수 -> 전역 -> 호스트 함수. 스크립트가 같은 이름을
+# 선언하면 그쪽이 이긴다. 출력/입력/error/exec 는 계속 내장함수(K_BUILTIN_CALL)로 남는다
+HOST_FUNCTIONS = {}
+
+def register_function(name, params, fn=None, table=None):
+    # params: 매개변수 타입 목록 ["num", "fl"] 이나 [(타입, 이름)]. 등록할 때 한 번
+    # 변환 함수를 정해 두고 호출마다 그대로 쓴다. fn 을 빼면 데코레이터로 쓸 수 있다
+    #   register_function("hypot", ["fl", "fl"], math.hypot)
+    #   @register_function("greet", ["str"])
+    #   def greet(name): ...
+    # table 을 주면(Interpreter.register_function) 그 인터프리터에만 보인다
+    if fn is None:
+        return lambda f: register_function(name, params, f, table)
+    if not isinstance(name, str) or not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        raise Exception("호스트 함수 이름 오류: "+repr(name))
+    if name in BUILTIN_NAMES:
+        raise Exception("내장함수 이름은 등록할 수 없음: "+name)
+    if not callable(fn):
+        raise Exception("호스트 함수는 호출할 수 있어야 함: "+name)
+    ps = [p if isinstance(p, tuple) else (p, "a"+str(i)) for i, p in enumerate(params)]
+    (HOST_FUNCTIONS if table is None else table)[name] = NativeFunction(name, ps, fn)
+    return fn
+
+def unregister_function(name):
+    HOST_FUNCTIONS.pop(name, None)
+
+def host_function(nm):
+    # 인터프리터에 등록한 함수가 모든 인터프리터가 같이 쓰는 함수보다 먼저 (없으면 UNSET)
+    v = current().host_functions.get(nm)
+    if v is None:
+        v = HOST_FUNCTIONS.get(nm, UNSET)
+    return v
+
+# math.sst 와 같은 이름, 같은 결과 (num 매개변수는 정수로 변환된다).
+# 다른 점: sqrt 는 모든 입력에서 끝나고(math.sst 는 8, 15 등에서 멈추지 않음),
+# fisPrime 은 3.3*10^24 미만에서 결정적이며, pollardRho 는 Brent 방식이라 소인수가 여럿인 수에서
+# math.sst 와 다른 소인수를 돌려줄 수 있다.
+
+# 3.3*10^24 미만의 모든 수에서 결정적인 밀러-라빈 밑
+MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+def math_pow(base, exp):
+    if exp<0:
+        return 1//base**-exp
+    return base**exp
+
+def math_gcd(a, b):
+    if a>=0 and b>=0:
+        return pymath.gcd(a, b)
+    # 음수가 섞이면 math.sst 의 유클리드 호제법과 같은 부호를 낸다
+    while b!=0:
+        a, b = b, a%b
+    return a
+
+def math_factorial(n):
+    return 1 if n<=1 else pymath.factorial(n)
+
+def math_fibonacci_series(n):
+    if n<0:
+        builtin_error(["n은 0 이상의 값이어야 합니다"])
+    fibs = [0]
+    if n==0:
+        return fibs
+    fibs.append(1)
+    for i in range(2, n+1):
+        fibs.append(fibs[i-1]+fibs[i-2])
+    return fibs
+
+def math_mod_exp(base, exp, mod):
+    base = base%mod
+    if exp<=0:
+        return 1
+    return pow(base, exp, mod)
+
+def math_ncr(n, r):
+    if 0<=r<=n:
+        return pymath.comb(n, r)
+    return math_factorial(n)//(math_factorial(r)*math_factorial(n-r))
+
+def math_npr(n, r):
+    if 0<=r<=n:
+        return pymath.perm(n, r)
+    return math_factorial(n)//math_factorial(n-r)
+
+def math_is_prime(n):
+    if n<2:
+        return False
+    if n==2 or n==3:
+        return True
+    if n%2==0:
+        return False
+    d, s = n-1, 0
+    while d%2==0:
+        d //= 2
+        s += 1
+    for a in MR_BASES:
+        if a>n-2:
+            break
+        x = pow(a, d, n)
+        if x==1 or x==n-1:
+            continue
+        for _ in range(s-1):
+            x = x*x%n
+            if x==n-1:
+                break
         else:
-            raise Exception("멤버 접근 오류: 객체가 dict 아님")
+            return False
+    return True
+
+def math_prime_factors(n):
+    factors = []
+    while n>1 and n%2==0:
+        factors.append(2)
+        n //= 2
+    i = 3
+    while i*i<=n:
+        while n%i==0:
+            factors.append(i)
+            n //= i
+        i += 2
+    if n>1:
+        factors.append(n)
+    return factors
+
+def math_sqrt(n):
+    if n<0:
+        builtin_error(["sqrt 함수: 음수 입력"])
+    return pymath.isqrt(n)
+
+def brent(n, y, c):
+    # Pollard-Rho (Brent). gcd 는 m 단계마다 한 번만 계산한다
+    m = 128
+    g = r = q = 1
+    x = ys = y
+    while g==1:
+        x = y
+        for _ in range(r):
+            y = (y*y+c)%n
+        k = 0
+        while k<r and g==1:
+            ys = y
+            for _ in range(min(m, r-k)):
+                y = (y*y+c)%n
+                q = q*abs(x-y)%n
+            g = pymath.gcd(q, n)
+            k += m
+        r *= 2
+    if g==n:
+        # 한꺼번에 곱하다 n 이 되어 버렸으면 한 단계씩 다시
+        while True:
+            ys = (ys*ys+c)%n
+            g = pymath.gcd(abs(x-ys), n)
+            if g>1:
+                return g
+    return g
+
+def native_math_module():
+    scope = Scope()
+    vs = scope.vars
+    vs["NEXT"] = 1234
+
+    def rand():
+        # math.sst 와 같은 선형 합동 생성기. 상태는 모듈 변수 NEXT 에 있다
+        vs["NEXT"] = vs["NEXT"]*1103515245+12345
+        return vs["NEXT"]//65536
 
-    elif etype=="index":
-        # ("index", base_expr, index_expr)
-        _, base_expr, idx_expr = expr
-        base_val = eval_expr(base_expr)
-        index_val = eval_expr(idx_expr)
+    def pollard_rho(n):
+        # 난수는 math.sst 와 같은 순서로 rand() 에서 받는다
+        if n<=1:
+            return n
+        while True:
+            if n%2==0:
+                return 2
+            if math_is_prime(n):
+                return n
+            x = rand()%(n-2)+2
+            c = rand()%10+1
+            g = brent(n, x, c)
+            if g!=n:
+                n = g
+
+    N = [("num", "n")]
+    NN = [("num", "a"), ("num", "b")]
+    for name, params, fn in [
+            ("abs", N, abs),
+            ("pow", [("num", "base"), ("num", "exp")], math_pow),
+            ("gcd", NN, math_gcd),
+            ("lcm", NN, lambda a, b: (a*b)//math_gcd(a, b)),
+            ("factorial", N, math_factorial),
+            ("fibonacciSeries", N, math_fibonacci_series),
+            ("modExp", [("num", "base"), ("num", "exp"), ("num", "mod")], math_mod_exp),
+            ("nCr", [("num", "n"), ("num", "r")], math_ncr),
+            ("nPr", [("num", "n"), ("num", "r")], math_npr),
+            ("fisPrime", N, math_is_prime),
+            ("primeFactors", N, math_prime_factors),
+            ("sqrt", N, math_sqrt),
+            ("rand", [], rand),
+            ("pollardRho", N, pollard_rho)]:
+        vs[name] = NativeFunction(name, params, fn)
+    return scope
+
+NATIVE_MODULES = {"math": native_math_module}
+
+def load_native_module(mname):
+    # 모듈 표에는 "<native 이름>" 키로 올린다
+    key = "<native "+mname+">"
+    modules = current().modules
+    ent = modules.get(key)
+    if ent is None:
+        ent = ModuleEntry(mname, key)
+        t0 = time.perf_counter()
+        ent.scope = NATIVE_MODULES[mname]()
+        ent.seconds = ent.self_seconds = time.perf_counter()-t0
+        modules[key] = ent
+    return ent
+
+def find_module(mname):
+    # 현재 디렉터리, MODULE_PATH 순으로 <mname>.sst 를 찾는다
+    fname = mname+".sst"
+    dirs = [os.getcwd()]+MODULE_PATH
+    for d in dirs:
+        path = os.path.join(d, fname)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    raise Exception("파일 읽기 실패: 모듈 "+fname+" 을 찾을 수 없음 (찾은 곳: "+", ".join(dirs)+")")
+
+def load_module(mname, target, env):
+    # module_lock 은 모듈 표를 보고 고치는 동안만 잡는다. 모듈 본문은 lock 밖에서 실행하고,
+    # 다른 스레드가 불러오는 중인 모듈은 그 스레드가 끝낼 때까지 기다렸다가 다시 본다
+    interp = current()
+    if USE_NATIVE and mname in NATIVE_MODULES:
+        with interp.module_lock:
+            scope = load_native_module(mname).scope
+        store_ref(target, env, scope)
+        return
+    path = find_module(mname)
+    me = threading.get_ident()
+    while True:
+        with interp.module_lock:
+            ent = interp.modules.get(path)
+            if ent is None:
+                ent = ModuleEntry(mname, path)
+                interp.modules[path] = ent
+                interp.loading_stack.append(ent)
+                break
+            if ent.scope is not None:
+                store_ref(target, env, ent.scope)
+                return
+            if ent.owner==me or module_deadlock(interp, ent, me):
+                chain = [e.name for e in interp.loading_stack if e.owner==me]+[mname]
+                raise Exception("순환 use 오류: "+" -> ".join(chain))
+            interp.module_waits[me] = ent
         try:
-            return base_val[index_val]
-        except Exception as ee:
-            raise Exception("인덱스 오류: "+str(ee))
+            # 기다리는 동안 다른 스레드(always 블록 등)가 스크립트를 실행할 수 있게 한다
+            with interp.scheduler.released():
+                ent.done.wait()
+        finally:
+            with interp.module_lock:
+                del interp.module_waits[me]
+    import_module(interp, ent)
+    store_ref(target, env, ent.scope)
 
-    elif etype=="li":
-        # ("li",[exprs...])
-        _, elms = expr
-        return [eval_expr(e) for e in elms]
+def module_deadlock(interp, ent, me):
+    # module_lock 을 잡은 채로 부른다. ent 를 불러오는 스레드가 (건너건너) 이 스레드가
+    # 불러오는 중인 모듈을 기다리고 있으면, 기다리면 둘 다 멈춘다 (스레드 사이의 순환 use)
+    seen = set()
+    while ent is not None and ent.owner not in seen:
+        if ent.owner==me:
+            return True
+        seen.add(ent.owner)
+        ent = interp.module_waits.get(ent.owner)
+    return False
 
-    elif etype=="record":
-        # ("record",[exprs...])
-        _, es = expr
-        return [eval_expr(e) for e in es]
+def import_module(interp, ent):
+    # load_module 이 표와 loading_stack 에 올린 ent 를 실제로 불러온다 (module_lock 밖에서)
+    mname, path = ent.name, ent.path
+    loading_stack = interp.loading_stack
+    t0 = time.perf_counter()
+    try:
+        try:
+            with open(path,"r",encoding="utf-8") as f:
+                mc = f.read()
+        except Exception as e:
+            raise Exception("파일 읽기 실패: "+str(e))
+        # 모듈은 자기만의 전역 이름공간에서 실행되고, 그 이름공간이 모듈 값이 된다
+        sms = shared_program(path, mc)
+        modscope = Scope()
+        run_statements(sms, module_frame(modscope))
+        ent.seconds = time.perf_counter()-t0
+        ent.self_seconds += ent.seconds
+        with interp.module_lock:
+            loading_stack.remove(ent)
+            # 시간은 같은 스레드에서 이 모듈을 use 한 바깥 모듈에서 뺀다
+            outer = [e for e in loading_stack if e.owner==ent.owner]
+            if outer:
+                outer[-1].self_seconds -= ent.seconds
+            ent.scope = modscope
+    except BaseException:
+        # 실패한 모듈은 표에 남기지 않는다 (다음 use 에서 다시 시도)
+        with interp.module_lock:
+            if ent in loading_stack:
+                loading_stack.remove(ent)
+            if interp.modules.get(path) is ent:
+                del interp.modules[path]
+        raise
+    finally:
+        ent.done.set()
+    if IMPORT_TIME:
+        sys.stderr.write(f"use 시간: 자기 {ent.self_seconds*1000:8.2f}ms | 누적 {ent.seconds*1000:8.2f}ms | "
+                         +"  "*len(outer)+mname+"\n")
+    return ent
 
-    else:
-        raise Exception("알수없는 expr 타입: "+str(etype))
+# --- 파일 입출력: use 가 모듈 파일을 여는 것과 같은 자리에서 스크립트가 파일을 연다 ---
+# 상대 경로는 현재 디렉터리 기준. 파일 전체를 메모리에 올리지 않고 한 줄/한 덩어리씩 읽는다.
+# 읽기 전용으로 여는 MMAP_MIN 바이트 이상의 파일은 mmap 으로 읽는다
+# (운영체제가 필요한 페이지만 올리므로 메모리보다 큰 파일도 된다. STARSCRIPT_MMAP_MIN, 0 이면 끔)
+MMAP_MIN = int(os.environ.get("STARSCRIPT_MMAP_MIN", str(1<<20)))
+FILE_MODES = {"r": "rb", "rb": "rb", "w": "wb", "wb": "wb", "a": "ab", "ab": "ab"}
 
-if __name__=="__main__":
-    with open("main.sst","r",encoding="utf-8") as f:
-        code = f.read()
-    tokens = tokenize(code)
-    parser = Parser(tokens)
-    statements = parser.parse_program()
-    interpret(statements)
+class StarFile:
+    # open() 이 돌려주는 파일 값. 밑바닥은 항상 바이너리 파일이고,
+    # 텍스트 모드("r", "w", "a")는 utf-8 문자열, 바이너리 모드("rb", "wb", "ab")는 바이트 값(0~255)의 arr 로 주고받는다
+    __slots__ = ("path", "mode", "binary", "f", "mm")
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.binary = mode.endswith("b")
+        self.mm = None
+        self.f = open(path, FILE_MODES[mode])
+        if FILE_MODES[mode]=="rb" and MMAP_MIN>0:
+            size = os.fstat(self.f.fileno()).st_size
+            if size>=MMAP_MIN:
+                self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(self.mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    self.mm.madvise(mmap.MADV_SEQUENTIAL)
+
+    def __repr__(self):
+        return "<file "+self.path+" "+self.mode+(" closed" if self.f is None else "")+">"
+
+    def stream(self, reading):
+        if self.f is None:
+            raise Exception("파일 오류: 닫힌 파일: "+self.path)
+        if reading!=(FILE_MODES[self.mode]=="rb"):
+            raise Exception("파일 오류: '"+self.mode+"' 모드로 연 파일에는 "+("읽기" if reading else "쓰기")+" 불가: "+self.path)
+        return self.mm if self.mm is not None else self.f
+
+def file_open(path, mode):
+    if mode not in FILE_MODES:
+        raise Exception("파일 열기 실패: 모드는 "+", ".join(FILE_MODES)+" 중 하나: "+repr(mode))
+    try:
+        return StarFile(path, mode)
+    except OSError as e:
+        raise Exception(("파일 읽기 실패: " if mode.startswith("r") else "파일 쓰기 실패: ")+str(e))
+
+def file_read_line(sf):
+    # 다음 줄(줄바꿈 제외). 파일 끝이면 "" (빈 줄과는 eof() 로 구별)
+    line = sf.stream(True).readline()
+    if line.endswith(b"\n"):
+        line = line[:-2] if line.endswith(b"\r\n") else line[:-1]
+    if sf.binary:
+        return bytes_to_array(line)
+    return line.decode("utf-8")
+
+def file_eof(sf):
+    src = sf.stream(True)
+    if src is sf.mm:
+        return src.tell()>=len(src)
+    return not src.peek(1)
+
+def file_read(sf, n=-1):
+    # 최대 n 바이트. n 을 빼면 남은 전부. 텍스트 모드에서는 끝에 걸친 글자를 다음 read 로 넘긴다
+    src = sf.stream(True)
+    data = src.read(int(n))
+    if sf.binary:
+        return bytes_to_array(data)
+    cut = utf8_cut(data)
+    while cut==0 and data:
+        # n 이 첫 글자보다 작다: 글자 하나는 다 읽어야 다음 read 가 앞으로 간다
+        more = src.read(1)
+        if not more:
+            break
+        data += more
+        cut = utf8_cut(data)
+    if 0<cut<len(data):
+        src.seek(cut-len(data), os.SEEK_CUR)
+        data = data[:cut]
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise Exception("파일 오류: 올바른 UTF-8 이 아님: "+sf.path)
+
+def utf8_cut(data):
+    # 마지막 글자가 잘리지 않은 가장 긴 앞부분의 길이
+    i = len(data)-1
+    while i>=0 and i>len(data)-4 and data[i]&0xC0==0x80:
+        i -= 1
+    if i<0 or data[i]<0xC0:
+        return len(data)
+    need = 2 if data[i]<0xE0 else 3 if data[i]<0xF0 else 4
+    return i if len(data)-i<need else len(data)
+
+def file_write(sf, val):
+    sf.stream(False).write(value_bytes(sf, val))
+
+def file_write_lines(sf, vals):
+    # 여러 줄을 한 번에 쓴다 (원소마다 줄바꿈)
+    out = sf.stream(False)
+    if sf.binary:
+        raise Exception("파일 오류: writeLines 는 텍스트 모드에서만: "+sf.path)
+    out.write("".join(str(v)+"\n" for v in vals).encode("utf-8"))
+
+def file_size(sf):
+    if sf.f is None:
+        raise Exception("파일 오류: 닫힌 파일: "+sf.path)
+    return len(sf.mm) if sf.mm is not None else os.fstat(sf.f.fileno()).st_size
+
+def file_close(sf):
+    if sf.mm is not None:
+        sf.mm.close()
+        sf.mm = None
+    if sf.f is not None:
+        sf.f.close()
+        sf.f = None
+
+def bytes_to_array(data):
+    np = numpy if numpy_checked else load_numpy()
+    if np is not None:
+        return NumArray(np.frombuffer(data, dtype=np.uint8).astype(np.int64), "num")
+    return NumArray(array.array("q", array.array("B", data)), "num")
+
+def value_bytes(sf, val):
+    # 텍스트 모드는 output() 처럼 str(값), 바이너리 모드는 0~255 의 수 목록
+    if not sf.binary:
+        return str(val).encode("utf-8")
+    if isinstance(val, NumArray):
+        val = val.tolist()
+    if not isinstance(val, list):
+        raise Exception("파일 오류: 바이너리 쓰기는 arr 나 리스트만: "+repr(val))
+    try:
+        return bytes(val)
+    except (ValueError, TypeError):
+        raise Exception("파일 오류: 바이트 값은 0~255 의 num 이어야 함")
+
+FILE_METHODS = {
+    # ...Async 는 같은 일을 입출력 스레드에서 하고 작업을 돌려준다 (async func 에서 await)
+    "readLineAsync": (0, 0, lambda sf: run_io("file", file_read_line, sf)),
+    "readAsync": (0, 1, lambda sf, n=-1: run_io("file", file_read, sf, n)),
+    "writeAsync": (1, 1, lambda sf, val: run_io("file", file_write, sf, val)),
+    "readLine": (0, 0, file_read_line),
+    "read": (0, 1, file_read),
+    "eof": (0, 0, file_eof),
+    "write": (1, 1, file_write),
+    "writeLines": (1, 1, file_write_lines),
+    "size": (0, 0, file_size),
+    "close": (0, 0, file_close),
+}
+
+register_function("open", ["str", "str"], file_open)
+
+# --- always 블록 스케줄러: 스레드 하나가 다음 실행 시각의 heap 을 보고 블록을 차례로 돌린다 ---
+# "rate"(기본): 시작 시각이 간격의 배수에 맞춰진다. 본문이 간격보다 오래 걸리면 놓친 실행은 건너뛴다
+# "delay": 본문이 끝난 뒤 간격만큼 쉬고 다시 실행한다
+ALWAYS_MODES = ("rate", "delay")
+ALWAYS_STATS_TYPE = StarType("AlwaysStats", [("num", "runs"), ("num", "overruns"), ("num", "missed"),
+                                             ("bool", "active")], [], None)
+
+class AlwaysTask:
+    # always 블록 하나. always (...) as t 로 받은 값이 이것이다.
+    # overruns: 본문이 간격보다 오래 걸린 횟수, missed: 그 때문에 건너뛴 실행 수
+    __slots__ = ("ival", "fixed_rate", "run_once", "deadline", "cancelled", "runs", "overruns", "missed")
+
+    def __init__(self, ival, fixed_rate, run_once):
+        self.ival = ival
+        self.fixed_rate = fixed_rate
+        self.run_once = run_once
+        self.deadline = time.monotonic()
+        self.cancelled = False
+        self.runs = 0
+        self.overruns = 0
+        self.missed = 0
+
+    def __lt__(self, other):
+        return self.deadline<other.deadline
+
+    def __repr__(self):
+        return f"<always {self.ival} {'rate' if self.fixed_rate else 'delay'}"+(" cancelled" if self.cancelled else "")+">"
+
+    def finish(self, start, end):
+        # 한 번 실행한 뒤 다음 실행 시각을 정한다
+        self.runs += 1
+        ival = self.ival
+        if not self.fixed_rate:
+            if end-start>ival:
+                self.overruns += 1
+            self.deadline = end+ival
+            return
+        nxt = self.deadline+ival
+        if end>nxt and ival>0:
+            skipped = int((end-nxt)//ival)+1
+            self.overruns += 1
+            self.missed += skipped
+            nxt += skipped*ival
+        self.deadline = nxt
+
+class Scheduler:
+    # 스크립트 코드는 lock 을 잡은 스레드 하나만 실행한다. 메인 프로그램은 반복문 한 바퀴마다,
+    # 입력을 기다리는 동안 waiting 을 보고 기다리는 always 블록에 차례를 넘긴다 (pause, released)
+    def __init__(self, interp=None):
+        self.interp = interp    # 블록을 실행할 인터프리터
+        self.heap = []
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = None     # 지금 실행 중인 AlwaysTask
+        self.lock = threading.Lock()
+        self.owner = None       # lock 을 잡은 스레드
+        self.waiting = False    # 스케줄러가 lock 을 기다리는 중
+        self.handoff = threading.Event()
+        self.stopping = False   # stop() 이 켜면 스케줄러 스레드가 끝난다
+
+    def add(self, task):
+        with self.cond:
+            heapq.heappush(self.heap, task)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, name="always", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def next_task(self):
+        # stop() 이 불렸으면 None
+        with self.cond:
+            while True:
+                if self.stopping:
+                    return None
+                heap = self.heap
+                while heap and heap[0].cancelled:
+                    heapq.heappop(heap)
+                if not heap:
+                    self.cond.wait()
+                    continue
+                delay = heap[0].deadline-time.monotonic()
+                if delay<=0:
+                    return heapq.heappop(heap)
+                self.cond.wait(delay)
+
+    def loop(self):
+        interp_state.interp = self.interp
+        output = self.interp.output
+        while True:
+            task = self.running = self.next_task()
+            if task is None:
+                close_async_loop()
+                return
+            start = time.monotonic()
+            try:
+                with self.hold(True):
+                    task.run_once()
+                    # 블록이 만든 async 작업은 이번 실행 안에서 끝낸다
+                    run_async_tasks()
+            except Exception as e:
+                # 오류가 난 블록만 멈춘다
+                task.cancelled = True
+                output.flush()
+                sys.stderr.write("always 블록 오류: "+str(e)+"\n")
+                continue
+            # 블록이 쓴 출력(과 그 전까지 메인 스레드가 쓴 출력)을 순서대로 내보낸다
+            output.flush()
+            task.finish(start, time.monotonic())
+            if not task.cancelled:
+                self.add(task)
+
+    @contextmanager
+    def hold(self, scheduler=False):
+        # 이 스레드가 스크립트를 실행하는 동안 lock 을 잡는다. 이미 잡고 있으면 그대로 (exec, use)
+        me = threading.get_ident()
+        if self.owner==me:
+            yield
+            return
+        if scheduler:
+            self.waiting = True
+        self.lock.acquire()
+        self.waiting = False
+        self.owner = me
+        if scheduler:
+            self.handoff.set()
+        try:
+            yield
+        finally:
+            self.owner = None
+            self.lock.release()
+
+    def pause(self):
+        # 안전한 지점에서 기다리는 always 블록을 먼저 실행시킨다
+        me = threading.get_ident()
+        if self.owner!=me:
+            return
+        self.handoff.clear()
+        self.owner = None
+        self.lock.release()
+        self.handoff.wait()
+        self.lock.acquire()
+        self.owner = me
+
+    @contextmanager
+    def released(self):
+        # 입력을 기다리는 동안에는 always 블록이 마음대로 돌게 한다
+        me = threading.get_ident()
+        if self.owner!=me:
+            yield
+            return
+        self.owner = None
+        self.lock.release()
+        try:
+            yield
+        finally:
+            self.lock.acquire()
+            self.owner = me
+
+    def cancel_all(self):
+        with self.cond:
+            for task in self.heap:
+                task.cancelled = True
+            if self.running is not None:
+                self.running.cancelled = True
+            self.cond.notify()
+
+    def stop(self):
+        # 블록을 모두 멈추고 스케줄러 스레드가 끝날 때까지 기다린다. 그 뒤 add 하면 스레드를 새로 만든다
+        self.cancel_all()
+        with self.cond:
+            thread = self.thread
+            self.stopping = True
+            self.cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self.cond:
+            self.heap.clear()
+            self.thread = None
+            self.running = None
+            self.stopping = False
+
+def start_always(ival, mode, run_once):
+    # run_once: 블록 본문을 한 번 실행하는 함수. 첫 실행은 바로 한다
+    if isinstance(ival, bool) or not isinstance(ival, (int, float)) or ival<0:
+        raise Exception("always 간격은 0 이상의 수여야 함: "+repr(ival))
+    if mode not in ALWAYS_MODES:
+        raise Exception("always 모드는 "+", ".join(ALWAYS_MODES)+" 중 하나: "+repr(mode))
+    task = AlwaysTask(ival, mode=="rate", run_once)
+    current().scheduler.add(task)
+    return task
+
+def always_cancel(task):
+    # 실행 중이면 이번 실행은 끝까지 가고, 다음 실행부터 멈춘다
+    task.cancelled = True
+
+def always_stats(task):
+    return Record(ALWAYS_STATS_TYPE, [task.runs, task.overruns, task.missed, not task.cancelled])
+
+ALWAYS_METHODS = {
+    "cancel": (0, 0, always_cancel),
+    "stats": (0, 0, always_stats),
+}
+
+# --- async func: asyncio 이벤트 루프 위의 작업 ---
+# async func 를 부르면 본문을 실행할 asyncio 작업(Task)을 만들어 바로 돌려준다. 작업은 호출한 쪽이
+# await 하거나 최상위 프로그램이 끝난 뒤 run_async_tasks 가 이벤트 루프를 돌릴 때 실행된다.
+# 본문은 엔진과 상관없이 VM 으로 실행한다: await 에서 run_code 가 멈춘 자리(pc, 값 스택)를
+# 돌려주고, 기다린 값이 오면 그 자리부터 이어 간다. 기다리는 작업 하나는 스레드가 아니라 코루틴 하나다.
+# asyncio 는 async 기능을 처음 쓸 때 (async_loop) 불러온다: async 를 안 쓰는 스크립트는 비용이 없다
+async_state = threading.local()
+
+def async_loop():
+    # 지금 스레드의 이벤트 루프. async 기능을 처음 쓸 때 만든다
+    import asyncio
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    loop = getattr(async_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = async_state.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop
+
+def close_async_loop():
+    # 지금 스레드의 이벤트 루프를 닫는다 (다음에 async 기능을 쓰면 async_loop 가 새로 만든다)
+    loop = getattr(async_state, "loop", None)
+    if loop is not None and not loop.is_closed() and not loop.is_running():
+        import asyncio
+        async_state.loop = None
+        asyncio.set_event_loop(None)
+        loop.close()
+
+class Awaiting:
+    # run_code 가 await 에서 멈추며 돌려주는 값: 기다릴 대상과 다시 시작할 자리
+    __slots__ = ("target", "pc", "stack")
+
+    def __init__(self, target, pc, stack):
+        self.target = target
+        self.pc = pc
+        self.stack = stack
+
+def start_async(func, argvals):
+    closure = func.closure
+    frame = Frame(func.nslots, closure, closure.globals)
+    slots = frame.slots
+    i = 0
+    for (pt, pn), av in zip(func.params, argvals):
+        slots[i] = coerce_value(pt, av)
+        i += 1
+    return watch_task(async_loop().create_task(run_async_body(func, frame), name=func.name))
+
+def watch_task(fut):
+    # 작업이 오류로 끝나면 (누가 await 하고 있든 아니든) 프로그램을 멈춘다
+    fut.add_done_callback(task_done)
+    return fut
+
+def task_done(fut):
+    if fut.cancelled() or fut.exception() is None:
+        return
+    if getattr(async_state, "error", None) is None:
+        async_state.error = fut.exception()
+        fut.get_loop().stop()
+
+async def run_async_body(func, frame):
+    import asyncio
+    co = func_code(func)
+    resume = None
+    while True:
+        with current().scheduler.hold():
+            r = run_code(co, frame, resume)
+        if r.__class__ is not Awaiting:
+            return r
+        target = r.target
+        if not (isinstance(target, asyncio.Future) or asyncio.iscoroutine(target)):
+            raise Exception("await 할 수 없는 값: "+repr(target))
+        resume = (r.pc, r.stack, await target)
+
+def run_async_tasks():
+    # 이 스레드의 이벤트 루프에 남은 작업이 모두 끝날 때까지 돌린다 (async 를 안 썼으면 아무것도 안 함)
+    loop = getattr(async_state, "loop", None)
+    if loop is None or loop.is_running():
+        return
+    import asyncio
+    async def drain():
+        while True:
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks)
+    # 루프가 타이머/입출력을 기다리는 동안에는 always 블록이 돌 수 있다
+    with current().scheduler.released():
+        try:
+            loop.run_until_complete(drain())
+        except RuntimeError:
+            # task_done 이 루프를 멈췄다
+            if getattr(async_state, "error", None) is None:
+                raise
+        err = getattr(async_state, "error", None)
+        if err is not None:
+            # 남은 작업을 취소하고 첫 오류로 멈춘다
+            rest = asyncio.all_tasks(loop)
+            for t in rest:
+                t.cancel()
+            loop.run_until_complete(asyncio.gather(*rest, return_exceptions=True))
+            async_state.error = None
+            raise err
+
+# 파일/표준 입력 작업은 블로킹 호출이라 작은 스레드 풀에서 돌리고, 작업은 그 결과를 기다린다.
+# 풀마다 스레드 하나: 같은 파일(과 stdin)에 대한 요청은 요청한 순서대로 처리된다
+IO_POOLS = {}
+io_pools_lock = threading.Lock()
+
+def run_io(kind, fn, *args):
+    pool = IO_POOLS.get(kind)
+    if pool is None:
+        import concurrent.futures
+        with io_pools_lock:
+            pool = IO_POOLS.get(kind)
+            if pool is None:
+                pool = IO_POOLS[kind] = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="starscript-"+kind)
+    interp = current()
+    def call():
+        # 풀 스레드는 인터프리터들이 같이 쓰므로 요청마다 부른 쪽 인터프리터로 실행한다
+        with interp.activate():
+            return fn(*args)
+    return watch_task(async_loop().run_in_executor(pool, call))
+
+def async_sleep(sec):
+    if sec<0:
+        raise Exception("sleep 시간은 0 이상이어야 함")
+    import asyncio
+    return watch_task(async_loop().create_task(asyncio.sleep(sec)))
+
+def async_gather(tasks):
+    # 작업 리스트를 동시에 기다려 결과 리스트를 돌려주는 작업
+    if not isinstance(tasks, list):
+        raise Exception("gather 인자는 작업의 리스트여야 함")
+    import asyncio
+    for t in tasks:
+        if not isinstance(t, asyncio.Future):
+            raise Exception("gather 할 수 없는 값: "+repr(t))
+    loop = async_loop()
+    if not tasks:
+        fut = loop.create_future()
+        fut.set_result([])
+        return fut
+    return watch_task(asyncio.gather(*tasks))
+
+def input_token():
+    tok = current().stdin.token()
+    if tok is None:
+        raise Exception("입력중단")
+    return tok
+
+register_function("sleep", ["fl"], async_sleep)
+register_function("gather", ["li"], async_gather)
+register_function("inputAsync", [], lambda: run_io("stdin", input_token))
+register_function("readLinesAsync", [], lambda: run_io("stdin", read_lines))
+register_function("readNumbersAsync", [], lambda: run_io("stdin", read_numbers))
+
+# --- parallelMap: 함수를 리스트의 각 원소에 워커 프로세스들에서 나눠 적용한다 ---
+# 함수와 그 함수가 닿는 값(클로저 프레임, 모듈 전역, 다른 함수, 레코드 타입)을 통째로 pickle 해서
+# 보낸다. 워커는 받은 사본으로 실행하므로 워커 안에서 바꾼 전역은 부른 쪽에 보이지 않는다.
+# 내장 네이티브 모듈/호스트 함수는 이름으로 보내서 워커의 것을 쓰고, 파일/always 핸들/작업 같은
+# 값은 보내지 않는다(워커에서 쓰면 오류). 워커 수는 STARSCRIPT_WORKERS (기본: 쓸 수 있는 CPU 수).
+# 워커가 하나 이하이거나 원소가 PARALLEL_MIN 개보다 적으면 워커 없이 이 프로세스에서 차례로 실행한다
+# (워커를 띄우고 값을 보내는 비용이 더 크다). pickle/multiprocessing 은 워커를 쓸 때 불러온다
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+PARALLEL_WORKERS = int(os.environ.get("STARSCRIPT_WORKERS", str(CPU_COUNT)))
+PARALLEL_MIN = int(os.environ.get("STARSCRIPT_PARALLEL_MIN", "16"))
+process_pool = None
+ship_classes = None
+
+class Unshipped:
+    # 워커로 보내지 못한 값 자리에 들어가는 표시
+    __slots__ = ("desc",)
+
+    def __init__(self, desc):
+        self.desc = desc
+
+    def __repr__(self):
+        return "<워커로 보내지 않은 값 "+self.desc+">"
+
+def native_ref(func):
+    # NativeFunction 을 워커에서 다시 찾을 이름
+    if HOST_FUNCTIONS.get(func.name) is func:
+        return ("host", func.name)
+    for key, ent in list(current().modules.items()):
+        if key.startswith("<native ") and ent.scope is not None and ent.scope.vars.get(func.name) is func:
+            return ("native", ent.name, func.name)
+    return ("unshipped", repr(func))
+
+def shippers():
+    # (ShipPickler, ShipUnpickler). 처음 워커로 값을 보낼 때 pickle 을 불러와 만든다
+    global ship_classes
+    if ship_classes is not None:
+        return ship_classes
+    import pickle
+
+    class ShipPickler(pickle.Pickler):
+        def persistent_id(self, obj):
+            cls = obj.__class__
+            if obj is UNSET:
+                return ("unset",)
+            if cls is NativeFunction:
+                return native_ref(obj)
+            if cls is MemoCache:
+                # 캐시 내용은 보내지 않는다. 워커는 빈 캐시로 시작한다
+                return ("memo", obj.maxsize)
+            if cls is ExecProgram:
+                # code 레코드의 exec 결과. 워커에서 처음 exec 할 때 다시 만든다
+                return ("exec",)
+            if cls is CodeObject:
+                # 함수의 컴파일 결과. 워커에서 처음 부를 때 다시 만든다
+                return ("code",)
+            # asyncio 를 아직 안 불러왔으면 작업 값도 없다
+            aio = sys.modules.get("asyncio")
+            if cls in (StarFile, AlwaysTask, Unshipped) or (aio is not None and isinstance(obj, aio.Future)):
+                return ("unshipped", repr(obj))
+            return None
+
+    class ShipUnpickler(pickle.Unpickler):
+        def persistent_load(self, pid):
+            kind = pid[0]
+            if kind=="unset":
+                return UNSET
+            if kind=="memo":
+                return MemoCache(pid[1])
+            if kind in ("exec", "code"):
+                return None
+            if kind=="host" and pid[1] in HOST_FUNCTIONS:
+                return HOST_FUNCTIONS[pid[1]]
+            if kind=="native":
+                return load_native_module(pid[1]).scope.vars[pid[2]]
+            return Unshipped(pid[-1])
+
+    ship_classes = (ShipPickler, ShipUnpickler)
+    return ship_classes
+
+def ship(obj):
+    import pickle
+    pickler = shippers()[0]
+    buf = io.BytesIO()
+    try:
+        pickler(buf, pickle.HIGHEST_PROTOCOL).dump(obj)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise Exception("parallelMap: 워커로 보낼 수 없는 값: "+str(e))
+    return buf.getvalue()
+
+def unship(data):
+    return shippers()[1](io.BytesIO(data)).load()
+
+def apply_value(func, args):
+    # 함수 값 하나를 부른다 (워커와 STARSCRIPT_WORKERS=0 에서 같이 쓴다)
+    if func.__class__ is NativeFunction:
+        return call_native(func, args)
+    return call_function(func, args, run_body_vm if (current().engine or ENGINE)=="vm" else run_body_tree)
+
+# 워커 쪽: 같은 호출의 여러 덩어리가 한 워커에 오면 함수는 한 번만 푼다
+shipped_funcs = OrderedDict()
+
+def parallel_chunk(key, payload, engine, items):
+    global ENGINE
+    ENGINE = engine
+    ent = shipped_funcs.get(key)
+    if ent is None:
+        ent = shipped_funcs[key] = unship(payload)
+        while len(shipped_funcs)>4:
+            shipped_funcs.popitem(last=False)
+    func, types = ent
+    # 레코드 선언(Pt p = {...})이 부른 쪽과 같은 타입을 찾도록 타입 표도 함께 받는다
+    interp = current()
+    interp.user_types.clear()
+    interp.user_types.update(types)
+    try:
+        results = run_deep(lambda: [apply_value(func, [x]) for x in unship(items)])
+    finally:
+        # 워커의 output() 은 덩어리마다 내보낸다 (부른 쪽 출력과의 순서는 정해지지 않는다)
+        interp.output.flush()
+    return ship(results)
+
+def parallel_map(func, items):
+    if func.__class__ is not NativeFunction:
+        if not isinstance(func, Function) or func.method_of is not None:
+            raise Exception("parallelMap 첫 인자는 함수여야 함: "+repr(func))
+        if func.is_async:
+            raise Exception("parallelMap 에는 async func 를 쓸 수 없음: "+func.name)
+    if len(func.params)!=1:
+        raise Exception("parallelMap 함수는 인자 1개여야 함: "+func.name)
+    if isinstance(items, NumArray):
+        items = items.tolist()
+    if not isinstance(items, list):
+        raise Exception("parallelMap 둘째 인자는 리스트여야 함")
+    if PARALLEL_WORKERS<=1 or len(items)<max(PARALLEL_MIN, 2):
+        return [apply_value(func, [x]) for x in items]
+    import concurrent.futures.process
+    interp = current()
+    payload = ship((func, interp.user_types))
+    key = hashlib.sha1(payload).hexdigest()
+    pool = parallel_pool()
+    # 워커마다 덩어리 몇 개씩: 느린 원소가 한쪽에 몰려도 다른 워커가 남은 덩어리를 가져간다
+    size = max(1, -(-len(items)//(PARALLEL_WORKERS*4)))
+    futs = [pool.submit(parallel_chunk, key, payload, interp.engine or ENGINE, ship(items[i:i+size]))
+            for i in range(0, len(items), size)]
+    out = []
+    try:
+        for f in futs:
+            out.extend(unship(f.result()))
+    except concurrent.futures.process.BrokenProcessPool:
+        shutdown_parallel_pool()
+        raise Exception("parallelMap: 워커 프로세스가 비정상 종료됨")
+    finally:
+        for f in futs:
+            f.cancel()
+    return out
+
+def parallel_pool():
+    # 워커는 호출마다 새로 만들지 않고 다시 쓴다. fork 는 실행 중인 스레드의 lock 까지 복사하므로 spawn
+    global process_pool
+    if process_pool is None:
+        import concurrent.futures, multiprocessing
+        process_pool = concurrent.futures.ProcessPoolExecutor(
+            PARALLEL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return process_pool
+
+def shutdown_parallel_pool():
+    global process_pool
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+        process_pool = None
+
+atexit.register(shutdown_parallel_pool)
+register_function("parallelMap", ["func", "li"], parallel_map)
+
+class OutputBuffer:
+    # output() 이 쓰는 버퍼. always 블록 스레드도 같은 버퍼에 쓰므로 lock 으로 순서를 지킨다.
+    # 모인 글자 수가 limit 이상이면 stream(없으면 sys.stdout)에 한 번에 쓰고 flush 한다 (limit 0 은 매번).
+    # 터미널에 쓸 때는 줄마다 내보낸다 (파이프나 파일이면 그대로 모아서)
+    def __init__(self, limit, stream=None):
+        self.parts = []
+        self.size = 0
+        self.limit = limit
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.checked = None     # tty 를 확인한 스트림
+        self.tty = False
+
+    def write(self, text):
+        with self.lock:
+            self.parts.append(text)
+            self.size += len(text)
+            if self.size>=self.limit or self.line_mode():
+                self.drain()
+
+    def line_mode(self):
+        # lock 을 잡은 채로 부른다. isatty 는 스트림이 바뀔 때만 다시 묻는다
+        out = self.stream or sys.stdout
+        if out is not self.checked:
+            self.checked = out
+            try:
+                self.tty = out.isatty()
+            except (AttributeError, ValueError, OSError):
+                self.tty = False
+        return self.tty
+
+    def flush(self):
+        with self.lock:
+            self.drain()
+
+    def drain(self):
+        # lock 을 잡은 채로 부른다
+        out = self.stream or sys.stdout
+        if self.parts:
+            data = "".join(self.parts)
+            self.parts.clear()
+            self.size = 0
+            out.write(data)
+        out.flush()
+
+# 버퍼 크기(글자 수)는 STARSCRIPT_OUTPUT_BUFFER 나 --output-buffer 로 바꾼다
+OUTPUT_BUFFER = int(os.environ.get("STARSCRIPT_OUTPUT_BUFFER", "65536"))
+
+def builtin_output(vals):
+    interp_state.interp.output.write(" ".join(str(v) for v in vals)+"\n")
+
+def builtin_flush():
+    current().output.flush()
+
+class TokenReader:
+    # stdin 을 큰 바이트 덩어리로 읽어 두고 덩어리째 공백으로 나눈 토큰을 하나씩 내준다.
+    # 한 줄에 남은 토큰은 다음 input() 이 이어서 쓴다
+    CHUNK = 1<<16
+    TOKEN = re.compile(rb"\S+")
+
+    def __init__(self, stream=None):
+        self.fixed = stream     # 텍스트나 바이트 스트림. None 이면 그때그때의 sys.stdin
+        self.stream = None
+        self.reset()
+
+    def reset(self):
+        self.data = b""     # toks 를 나눠 낸 원래 바이트 (tail 포함)
+        self.toks = []
+        self.pos = 0
+        self.tail = b""     # 덩어리 끝에서 잘렸을 수 있는 마지막 토큰
+        self.eof = False
+        self.used = False   # 토큰을 하나라도 내줬는가
+
+    def target(self):
+        return sys.stdin if self.fixed is None else self.fixed
+
+    def source(self):
+        # sys.stdin 이 바뀌었으면(호스트가 바꿔 끼운 경우) 처음부터 다시 읽는다
+        src = self.target()
+        if self.stream is not src:
+            self.stream = src
+            self.reset()
+        if isinstance(self.stream, (io.BufferedIOBase, io.RawIOBase)):
+            # 바이트 스트림 (Interpreter(stdin=io.BytesIO(...)) 등)
+            return self.stream
+        return getattr(self.stream, "buffer", None)
+
+    def read(self):
+        # 덩어리 하나. 터미널/파이프에서는 지금 있는 만큼만 받는다
+        raw = self.source()
+        if raw is None:
+            return self.stream.readline().encode("utf-8")
+        if hasattr(raw, "read1"):
+            return raw.read1(self.CHUNK)
+        return raw.read(self.CHUNK)
+
+    def pending(self, n=1):
+        # 기다리지 않고 토큰 n 개를 내줄 수 있는가
+        return self.stream is self.target() and self.pos+n<=len(self.toks)
+
+    def token(self):
+        # 다음 토큰(str), 입력이 끝났으면 None
+        if self.pending():
+            tok = self.toks[self.pos]
+            self.pos += 1
+            return tok.decode("utf-8")
+        self.source()
+        self.used = True
+        while not self.eof:
+            chunk = self.read()
+            if not chunk:
+                self.eof = True
+                data = self.tail
+            else:
+                data = self.tail+chunk
+            toks = data.split()
+            self.data = data
+            self.tail = b""
+            if not self.eof and toks and not data[-1:].isspace():
+                self.tail = toks.pop()
+            if toks:
+                self.toks = toks
+                self.pos = 1
+                return toks[0].decode("utf-8")
+        return None
+
+    def rest(self):
+        # 남은 입력 전체 (바이트). 이미 내준 토큰 바로 뒤부터 원래 모양 그대로
+        self.source()
+        end = 0
+        if self.pos:
+            for i, m in enumerate(self.TOKEN.finditer(self.data)):
+                if i+1==self.pos:
+                    end = m.end()
+                    break
+        parts = [self.data[end:]]
+        while not self.eof:
+            chunk = self.read()
+            if not chunk:
+                self.eof = True
+            parts.append(chunk)
+        self.data = b""
+        self.toks = []
+        self.pos = 0
+        self.tail = b""
+        return b"".join(parts)
+
+# --- 인터프리터: 실행 상태(전역, 레코드 타입, 모듈 표, 호스트 함수, 입출력, always 스케줄러)를 한데 묶는다 ---
+# 인스턴스끼리는 아무것도 나누지 않으므로 한 프로세스에서 여러 스크립트를 (스레드마다 하나씩 동시에도)
+# 섞이지 않게 돌릴 수 있다. 런타임 함수들은 current() 로 지금 스레드의 인터프리터를 찾는다.
+# 모듈 파일을 파싱/컴파일한 결과는 shared_program 이 모든 인스턴스에 나눠 준다
+class InterpState(threading.local):
+    interp = None     # 어느 스레드에서나 처음에는 기본 인터프리터 (아래에서 채운다)
+    depth = 0         # 트리 워커가 파이썬 스택에 쌓은 함수 호출 수 (run_body_tree)
+
+interp_state = InterpState()
+INTERPRETERS = weakref.WeakSet()
+
+class Interpreter:
+    #   it = Interpreter(engine="vm", stdout=buf)
+    #   it.register_function("hypot", ["fl", "fl"], math.hypot)
+    #   it.run("fl d = hypot(3, 4); output(d);")
+    def __init__(self, engine=None, stdin=None, stdout=None, output_buffer=None):
+        # engine 이 None 이면 ENGINE 을, stdin/stdout 이 None 이면 그때그때의 sys.stdin/sys.stdout 을 쓴다
+        if engine not in (None, "tree", "vm"):
+            raise Exception("실행 엔진은 tree 나 vm 이어야 함: "+repr(engine))
+        self.engine = engine
+        self.environment = Scope()
+        self.user_types = {}
+        self.host_functions = {}   # 이 인터프리터에만 보이는 호스트 함수 (HOST_FUNCTIONS 보다 먼저)
+        self.modules = {}          # 모듈 파일 절대 경로 -> ModuleEntry
+        self.loading_stack = []    # 지금 불러오는 중인 ModuleEntry (순환 검사, 시간 계산용)
+        self.module_waits = {}     # 스레드 -> 그 스레드가 다 불러오기를 기다리는 ModuleEntry
+        self.module_lock = threading.RLock()
+        self.output = OutputBuffer(OUTPUT_BUFFER if output_buffer is None else output_buffer, stdout)
+        self.stdin = TokenReader(stdin)
+        self.scheduler = Scheduler(self)
+        INTERPRETERS.add(self)
+
+    @property
+    def globals(self):
+        return self.environment.vars
+
+    def register_function(self, name, params, fn=None):
+        return register_function(name, params, fn, self.host_functions)
+
+    def unregister_function(self, name):
+        self.host_functions.pop(name, None)
+
+    @contextmanager
+    def activate(self):
+        # 이 스레드의 현재 인터프리터를 잠시 이것으로 바꾼다
+        prev = interp_state.interp
+        interp_state.interp = self
+        try:
+            yield self
+        finally:
+            interp_state.interp = prev
+
+    def run(self, code):
+        # 소스 문자열을 이 인터프리터의 전역에서 실행한다. 앞선 run 이 만든 이름도 보인다
+        with self.activate():
+            self.execute(parse_source(code, self.globals.keys()))
+
+    def run_file(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        with self.activate():
+            self.execute(load_program(path, code))
+
+    def execute(self, statements):
+        try:
+            run_deep(lambda: run_statements(statements))
+        finally:
+            self.output.flush()
+
+    def close(self):
+        # always 블록을 모두 멈추고 (스케줄러 스레드도 끝낸다) 남은 출력을 내보낸다.
+        # 부른 스레드의 이벤트 루프도 닫는다
+        self.scheduler.stop()
+        close_async_loop()
+        self.output.flush()
+
+def current():
+    return interp_state.interp
+
+def flush_interpreters():
+    for interp in list(INTERPRETERS):
+        interp.output.flush()
+
+# CLI 와 Interpreter 를 따로 만들지 않는 호스트 프로그램은 기본 인터프리터를 쓴다.
+# 아래 이름들은 기본 인터프리터의 상태를 가리킨다
+DEFAULT_INTERPRETER = InterpState.interp = Interpreter()
+environment = DEFAULT_INTERPRETER.environment
+user_types = DEFAULT_INTERPRETER.user_types
+modules = DEFAULT_INTERPRETER.modules
+OUTPUT = DEFAULT_INTERPRETER.output
+STDIN = DEFAULT_INTERPRETER.stdin
+SCHEDULER = DEFAULT_INTERPRETER.scheduler
+# 파이썬이 끝날 때 남은 출력을 내보낸다 (호스트 프로그램에서 쓸 때도)
+atexit.register(flush_interpreters)
+
+def parse_number(tok):
+    try:
+        return int(tok)
+    except ValueError:
+        try:
+            return float(tok)
+        except ValueError:
+            raise Exception("readNumbers: 숫자가 아님: "+tok.decode("utf-8", "replace"))
+
+def read_numbers():
+    # 남은 입력의 모든 수를 리스트로 (정수가 아니면 실수)
+    interp = current()
+    interp.output.flush()
+    with interp.scheduler.released():
+        toks = interp.stdin.rest().split()
+    try:
+        return list(map(int, toks))
+    except ValueError:
+        return [parse_number(t) for t in toks]
+
+def read_lines():
+    # 남은 입력의 모든 줄을 리스트로. input() 이 읽다 만 줄의 나머지가 공백뿐이면 건너뛴다
+    interp = current()
+    interp.output.flush()
+    stdin = interp.stdin
+    stdin.source()
+    used = stdin.used
+    with interp.scheduler.released():
+        data = stdin.rest()
+    lines = data.decode("utf-8").splitlines()
+    if used and lines and not lines[0].strip():
+        lines.pop(0)
+    return lines
+
+register_function("readNumbers", [], read_numbers)
+register_function("readLines", [], read_lines)
+
+def builtin_input(argl, env):
+    # input 인자는 값이 아니라 (리졸브된) 식별자 목록
+    ac=len(argl)
+    if ac<1:
+        raise Exception("input에 식별자 최소 1개 필요")
+    for texpr in argl:
+        if texpr[0] not in REF_KINDS:
+            raise Exception("input 인자는 식별자여야함")
+    # 입력을 기다려야 하면 그 전에 안내 문구 등 앞선 출력을 내보내고,
+    # 기다리는 동안에는 always 블록이 돌 수 있게 한다
+    interp = current()
+    stdin = interp.stdin
+    if stdin.pending(ac):
+        raws = [stdin.token() for ref in argl]
+    else:
+        interp.output.flush()
+        with interp.scheduler.released():
+            raws = [stdin.token() for ref in argl]
+    for ref, rawv in zip(argl, raws):
+        if rawv is None:
+            raise Exception("입력중단")
+        oldv = peek_ref(ref, env)
+        if isinstance(oldv,int):
+            newv = int(rawv)
+        elif isinstance(oldv,float):
+            newv = float(rawv)
+        elif isinstance(oldv,bool):
+            newv = (rawv.lower() in ["true","1"])
+        else:
+            newv = rawv
+        store_ref(ref, env, newv)
+
+def builtin_error(vals):
+    current().output.flush()
+    msg = " ".join(str(v) for v in vals)
+    raise Exception("Error: "+msg)
+
+def builtin_exec(code_val, env, layout=None):
+    # 코드는 호출한 곳의 모듈 전역에서 실행된다. 함수 안이면 (layout: 부른 곳의 스코프 배치)
+    # 부른 프레임에서 실행되어 그 함수의 지역 변수와 바깥 함수 변수도 보인다
+    if not(isinstance(code_val,Record) and "source" in code_val.type.field_index):
+        raise Exception("exec 인자는 {source:'...'} 형태여야 함")
+    code_str = code_val.values[code_val.type.field_index["source"]]
+    if not isinstance(code_str,str):
+        raise Exception("code 자료형의 source 필드는 문자열이어야함")
+    globs = env.globals
+    prog = exec_program(code_val, code_str, globs, layout)
+    missing = [where for nm, where in prog.free if nm not in globs and host_function(nm) is UNSET]
+    if missing:
+        raise Exception("정의되지 않은 식별자: "+", ".join(missing))
+    run_statements(prog.statements, Frame(0, None, globs) if layout is None else env, prog)
+
+# --- exec 코드 캐시: 같은 source 를 다시 exec 하면 토큰화/파싱/리졸브(VM 은 컴파일까지)를 건너뛴다 ---
+# source 문자열(함수 안의 exec 는 (source, 스코프 배치))을 키로 하는 LRU 에 EXEC_CACHE_SIZE 개까지 (STARSCRIPT_EXEC_CACHE, --exec-cache, 0이면 안 씀).
+# 한 번 exec 한 code 레코드는 자기 결과를 들고 있어서 표를 찾지도 않는다. 모든 인터프리터가 같이 쓴다
+EXEC_CACHE_SIZE = int(os.environ.get("STARSCRIPT_EXEC_CACHE", "256"))
+
+class ExecProgram:
+    # 리졸브는 그때의 전역에 따라 달라질 수 있으므로 (함수 안에서 대입한 이름이 전역인지 지역인지)
+    # probes 가 지금 전역과 맞을 때만 다시 쓴다. free 는 exec 할 때마다 있는지 확인한다
+    __slots__ = ("source", "layout", "statements", "free", "probes", "code")
+
+    def __init__(self, source, layout, statements, free, probes):
+        self.source = source
+        self.layout = layout
+        self.statements = statements
+        self.free = free
+        self.probes = probes
+        self.code = None
+
+    def matches(self, globs):
+        for nm, known in self.probes.items():
+            if (nm in globs)!=known:
+                return False
+        return True
+
+    def vm_code(self):
+        if self.code is None:
+            self.code = compile_program(self.statements, "<exec>")
+        return self.code
+
+exec_cache = MemoCache(EXEC_CACHE_SIZE, False)
+exec_lock = threading.Lock()
+
+def compile_exec(source, globs, layout=None):
+    r = Resolver(globs.keys(), exec_cache.maxsize>0, layout)
+    statements = r.resolve_program(Parser(iter_tokens(source)).parse_program())
+    return ExecProgram(source, layout, statements, r.free, r.probes)
+
+def exec_program(code_val, source, globs, layout=None):
+    prog = getattr(code_val, "compiled", None)
+    key = source if layout is None else (source, layout)
+    with exec_lock:
+        if prog is not None and prog.source==source and prog.layout==layout and prog.matches(globs):
+            exec_cache.hits += 1
+            return prog
+        table = exec_cache.table
+        prog = table.get(key)
+        if prog is not None and prog.matches(globs):
+            exec_cache.hits += 1
+            table.move_to_end(key)
+            code_val.compiled = prog
+            return prog
+        exec_cache.misses += 1
+    # 파싱은 lock 밖에서 (문법 오류면 여기서 멈춘다)
+    prog = compile_exec(source, globs, layout)
+    if exec_cache.maxsize>0:
+        with exec_lock:
+            table[key] = prog
+            table.move_to_end(key)
+            if len(table)>exec_cache.maxsize:
+                table.popitem(last=False)
+        code_val.compiled = prog
+    return prog
+
+def exec_cache_info():
+    # execCacheInfo() 의 값: CacheInfo{hits, misses, size, maxsize} 레코드
+    with exec_lock:
+        return Record(CACHE_INFO_TYPE, [exec_cache.hits, exec_cache.misses, len(exec_cache.table), exec_cache.maxsize])
+
+register_function("execCacheInfo", [], exec_cache_info)
+
+def call_function(func, argvals, run_body, memo=True):
+    # 사용자 함수 호출. run_body(fbody, frame)는 엔진별 본문 실행기
+    # 새 프레임에는 매개변수와 지역 변수 슬롯만 있고, 바깥 이름은 클로저를 따라간다
+    # (memo=False 는 call_memoized 가 캐시에 없는 호출을 실제로 실행할 때)
+    if memo and func.memo is not None:
+        return call_memoized(func, argvals, run_body)
+    while True:
+        if func.is_async:
+            return start_async(func, argvals)
+        closure = func.closure
+        frame = Frame(func.nslots, closure, closure.globals)
+        slots = frame.slots
+        i = 0
+        for (pt,pn), av in zip(func.params,argvals):
+            slots[i] = coerce_value(pt, av)
+            i += 1
+        result = run_body(func.body, frame)
+        if result.__class__ is not TailCall:
+            return result
+        # 트리 워커의 return f(...): 파이썬 스택을 더 쌓지 않고 여기서 이어 부른다
+        func, argvals = result.func, result.args
+        if func.memo is not None:
+            return call_memoized(func, argvals, run_body)
+
+class TailCall:
+    # 트리 워커에서 함수 본문의 return f(...) 가 돌려주는 값. 받는 쪽은 call_function 뿐이다
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+def call_member(objval, mname, argvals, run_body):
+    if isinstance(objval, Record):
+        func = objval.type.methods.get(mname)
+        if func is None:
+            if mname in objval.type.field_index:
+                raise Exception(f"멤버 '{mname}'는 함수가 아님")
+            raise Exception(f"멤버 '{mname}'가 존재하지 않습니다.")
+
+        if len(func.params)!=len(argvals):
+            raise Exception("멤버함수 호출: 매개변수 수 불일치")
+
+        # 받는 객체를 0번 슬롯에 묶는다. 필드 읽기/쓰기는 객체에 바로 간다
+        closure = func.closure
+        frame = Frame(func.nslots, closure, closure.globals)
+        slots = frame.slots
+        slots[0] = objval
+        i = 1
+        for (ptype,pname), aval in zip(func.params, argvals):
+            slots[i] = coerce_value(ptype, aval)
+            i += 1
+        return run_body(func.body, frame)
+
+    if isinstance(objval, Scope):
+        # 모듈: 모듈 함수는 모듈 최상위 프레임을 클로저로 갖고 있다
+        if mname not in objval.vars:
+            raise Exception(f"멤버 '{mname}'가 존재하지 않습니다.")
+        func = objval.vars[mname]
+        if isinstance(func, NativeFunction):
+            return call_native(func, argvals)
+        if not isinstance(func, Function):
+            raise Exception(f"멤버 '{mname}'는 함수가 아님")
+        if len(func.params)!=len(argvals):
+            raise Exception("멤버함수 호출: 매개변수 수 불일치")
+        return call_function(func, argvals, run_body)
+
+    # 문자열, 리스트 등 다른 타입 가능성 처리
+    if isinstance(objval, str):
+        if mname=="size":
+            if len(argvals)>0:
+                raise Exception("문자열 size()는 인자 없어야 함")
+            return len(objval)
+        raise Exception("문자열에 없는 메서드: "+mname)
+
+    if isinstance(objval, list):
+        return call_table_method("리스트", LIST_METHODS, objval, mname, argvals)
+
+    if isinstance(objval, NumArray):
+        return call_table_method("arr", ARR_METHODS, objval, mname, argvals)
+
+    if isinstance(objval, StarFile):
+        return call_table_method("파일", FILE_METHODS, objval, mname, argvals)
+
+    if isinstance(objval, AlwaysTask):
+        return call_table_method("always", ALWAYS_METHODS, objval, mname, argvals)
+
+    if isinstance(objval, Unshipped):
+        raise Exception("parallelMap 워커에서는 쓸 수 없는 값: "+objval.desc)
+
+    if isinstance(objval, Function):
+        if objval.memo is not None and mname in ("cache_info", "cache_clear"):
+            # pure func 캐시: f.cache_info(), f.cache_clear()
+            if argvals:
+                raise Exception(mname+"()는 인자 없어야 함")
+            if mname=="cache_info":
+                return memo_info(objval)
+            objval.memo.clear()
+            return None
+        # 함수객체 호출
+        if len(objval.params)!=len(argvals):
+            raise Exception("함수 호출 오류: 매개변수수 불일치")
+        return call_function(objval, argvals, run_body)
+
+    raise Exception("멤버 호출 오류: 해당 객체 타입에서 메서드를 지원하지 않습니다.")
+
+def call_table_method(tname, table, objval, mname, argvals):
+    # 파이썬 함수로 구현한 내장 타입 메서드 (LIST_METHODS, ARR_METHODS)
+    ent = table.get(mname)
+    if ent is None:
+        raise Exception(tname+"에 없는 메서드: "+mname)
+    lo, hi, fn = ent
+    if not lo <= len(argvals) <= hi:
+        if hi==0:
+            raise Exception(tname+" "+mname+"()는 인자 없어야 함")
+        raise Exception(tname+" "+mname+"()는 인자 "+(str(lo) if lo==hi else f"{lo}~{hi}")+"개 필요")
+    try:
+        return fn(objval, *argvals)
+    except (IndexError, TypeError) as ee:
+        raise Exception("인덱스 오류: "+str(ee))
+
+# --- 리스트 메서드: 모두 제자리에서 바꾼다 (push 는 분할상환 O(1)) ---
+
+def list_push(lst, v):
+    lst.append(v)
+
+def list_pop(lst, i=-1):
+    if not lst:
+        raise Exception("리스트 pop: 빈 리스트")
+    return lst.pop(i)
+
+def list_insert(lst, i, v):
+    lst.insert(i, v)
+
+def list_set(lst, i, v):
+    lst[i] = v
+    return v
+
+def list_slice(lst, start, end=None):
+    # 새 리스트를 돌려준다 (원래 리스트는 그대로)
+    return lst[start:end]
+
+# 이름 -> (최소 인자 수, 최대 인자 수, 함수)
+LIST_METHODS = {
+    "size": (0, 0, len),
+    "push": (1, 1, list_push),
+    "pop": (0, 1, list_pop),
+    "insert": (2, 2, list_insert),
+    "set": (2, 2, list_set),
+    "slice": (1, 2, list_slice),
+}
+
+# --- 숫자 배열 arr ---
+# num(64비트 정수) 이나 fl(실수) 만 담는 연속 메모리 배열. 산술/비교 연산은 원소별로,
+# sum/min/max/dot 은 원소마다 인터프리터를 거치지 않고 한 번에 네이티브 루프로 돈다.
+# numpy 가 있으면 ndarray 에, 없으면 array 모듈 배열에 담는다 (STARSCRIPT_NUMPY=0 이면 항상 array 모듈).
+# 어느 쪽인지는 처음 arr 를 만들 때 고른다: arr 를 안 쓰는 스크립트는 numpy 를 불러오지 않는다
+numpy = None
+numpy_checked = False
+
+def load_numpy():
+    global numpy, numpy_checked
+    if not numpy_checked:
+        if os.environ.get("STARSCRIPT_NUMPY", "1")!="0":
+            try:
+                import numpy as np
+                numpy = np
+            except ImportError:
+                pass
+        numpy_checked = True
+    return numpy
+
+class NumArray:
+    __slots__ = ("data", "kind")
+
+    def __init__(self, data, kind):
+        self.data = data
+        self.kind = kind    # "num" 또는 "fl"
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        v = self.data[i]
+        return v.item() if numpy is not None else v
+
+    def __setitem__(self, i, v):
+        self.data[i] = coerce_value(self.kind, v)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __bool__(self):
+        return len(self.data)>0
+
+    def __repr__(self):
+        return "arr"+repr(self.tolist())
+
+    def __reduce__(self):
+        # parallelMap 워커는 자기 쪽 방식(numpy/array)으로 다시 만든다
+        return (make_array, (self.tolist(), self.kind))
+
+    def tolist(self):
+        return self.data.tolist()
+
+    def __neg__(self):
+        if numpy is not None and (self.kind!="num" or int_bound(self.data)<INT64_LIMIT):
+            return NumArray(-self.data, self.kind)
+        return make_array(map(operator.neg, self.data.tolist()), self.kind)
+
+    def __pos__(self):
+        return self
+
+    # 원소별 연산. 반대쪽 피연산자는 같은 길이의 arr 이나 num/fl 스칼라
+    def __add__(self, o): return array_binary(operator.add, self, o)
+    def __radd__(self, o): return array_binary(operator.add, o, self)
+    def __sub__(self, o): return array_binary(operator.sub, self, o)
+    def __rsub__(self, o): return array_binary(operator.sub, o, self)
+    def __mul__(self, o): return array_binary(operator.mul, self, o)
+    def __rmul__(self, o): return array_binary(operator.mul, o, self)
+    def __truediv__(self, o): return array_binary(binop_div, self, o)
+    def __rtruediv__(self, o): return array_binary(binop_div, o, self)
+    def __mod__(self, o): return array_binary(operator.mod, self, o)
+    def __rmod__(self, o): return array_binary(operator.mod, o, self)
+    def __lt__(self, o): return array_binary(operator.lt, self, o)
+    def __le__(self, o): return array_binary(operator.le, self, o)
+    def __gt__(self, o): return array_binary(operator.gt, self, o)
+    def __ge__(self, o): return array_binary(operator.ge, self, o)
+    def __eq__(self, o): return array_binary(operator.eq, self, o)
+    def __ne__(self, o): return array_binary(operator.ne, self, o)
+    __hash__ = None
+
+def make_array(vals, kind):
+    # vals: 리스트나 반복자. numpy 쪽은 리스트만 받는다
+    np = numpy if numpy_checked else load_numpy()
+    try:
+        if np is not None:
+            return NumArray(np.array(list(vals), dtype=np.int64 if kind=="num" else np.float64), kind)
+        return NumArray(array.array("q" if kind=="num" else "d", vals), kind)
+    except OverflowError:
+        raise Exception("arr 오류: num 원소는 64비트 정수 범위여야 함")
+
+def to_array(val):
+    # arr 선언/매개변수의 값 변환. 리스트에 fl 이 하나라도 있으면 fl 배열
+    if isinstance(val, NumArray):
+        return val
+    if not isinstance(val, list):
+        raise Exception("arr 초기값은 [ ... ] 배열이어야 합니다.")
+    kind = "num"
+    for v in val:
+        if isinstance(v, float):
+            kind = "fl"
+        elif not isinstance(v, int):
+            raise Exception("arr 에는 num 이나 fl 만 넣을 수 있음: "+repr(v))
+    return make_array(val, kind)
+
+ARR_COMPARE = (operator.lt, operator.le, operator.gt, operator.ge, operator.eq, operator.ne)
+
+# numpy 의 int64 연산은 넘치면 조용히 감긴다. 피연산자 크기로 결과가 범위 안인지 (파이썬 정수로 정확히)
+# 먼저 보고, 넘칠 수 있으면 array 모듈 쪽과 같은 검사하는 길로 계산한다
+INT64_LIMIT = 1<<63
+
+def int_bound(v):
+    # |원소| 의 최댓값 (파이썬 정수)
+    if isinstance(v, int):
+        return abs(v)
+    if not len(v):
+        return 0
+    return max(int(v.max()), -int(v.min()))
+
+def int64_safe(op, x, y):
+    mx, my = int_bound(x), int_bound(y)
+    if mx>=INT64_LIMIT or my>=INT64_LIMIT:
+        return False
+    if op is operator.add or op is operator.sub:
+        return mx+my<INT64_LIMIT
+    if op is operator.mul:
+        return mx*my<INT64_LIMIT
+    # 몫/나머지/비교는 피연산자보다 커지지 않는다
+    return True
+
+def operand_kind(v):
+    if isinstance(v, NumArray):
+        return v.kind
+    if isinstance(v, float):
+        return "fl"
+    if isinstance(v, int):
+        return "num"
+    raise Exception("arr 연산 오류: arr 와 함께 쓸 수 없는 값: "+repr(v))
+
+def array_binary(op, a, b):
+    # a, b 중 적어도 하나는 NumArray. 결과는 새 NumArray
+    ka, kb = operand_kind(a), operand_kind(b)
+    if op is binop_div:
+        # 스칼라와 같이 num / num 은 몫, 하나라도 fl 이면 실수 나눗셈
+        op = operator.floordiv if ka=="num" and kb=="num" else operator.truediv
+    if op in ARR_COMPARE:
+        kind = "num"
+    else:
+        kind = "num" if ka=="num" and kb=="num" and op is not operator.truediv else "fl"
+    if isinstance(a, NumArray) and isinstance(b, NumArray) and len(a.data)!=len(b.data):
+        raise Exception(f"arr 연산 오류: 길이 불일치 {len(a.data)} != {len(b.data)}")
+    x = a.data if isinstance(a, NumArray) else a
+    y = b.data if isinstance(b, NumArray) else b
+    try:
+        if numpy is not None:
+            if ka!="num" or kb!="num" or int64_safe(op, x, y):
+                with numpy.errstate(divide="raise", invalid="raise"):
+                    r = op(x, y)
+                return NumArray(r.astype(numpy.int64 if kind=="num" else numpy.float64, copy=False), kind)
+            # 넘칠 수 있다: 파이썬 정수로 계산해서 범위를 확인한다
+            x = x.tolist() if isinstance(a, NumArray) else x
+            y = y.tolist() if isinstance(b, NumArray) else y
+        xs = x if isinstance(a, NumArray) else itertools.repeat(x)
+        ys = y if isinstance(b, NumArray) else itertools.repeat(y)
+        return make_array(map(op, xs, ys), kind)
+    except (ZeroDivisionError, FloatingPointError):
+        raise Exception("arr 연산 오류: 0으로 나눔")
+
+def arr_sum(a):
+    if numpy is not None:
+        if a.kind=="num" and int_bound(a.data)*len(a.data)>=INT64_LIMIT:
+            # int64 합은 넘치면 감기므로 파이썬 정수로 (array 모듈 쪽과 같은 값)
+            return sum(a.data.tolist())
+        return a.data.sum().item()
+    return sum(a.data)
+
+def arr_min(a):
+    if not len(a.data):
+        raise Exception("arr min: 빈 배열")
+    return a.data.min().item() if numpy is not None else min(a.data)
+
+def arr_max(a):
+    if not len(a.data):
+        raise Exception("arr max: 빈 배열")
+    return a.data.max().item() if numpy is not None else max(a.data)
+
+def arr_dot(a, b):
+    if not isinstance(b, NumArray):
+        raise Exception("arr dot: 인자는 arr 이어야 함")
+    if len(a.data)!=len(b.data):
+        raise Exception(f"arr dot: 길이 불일치 {len(a.data)} != {len(b.data)}")
+    if numpy is not None:
+        if a.kind=="num" and b.kind=="num" and int_bound(a.data)*int_bound(b.data)*len(a.data)>=INT64_LIMIT:
+            return sum(map(operator.mul, a.data.tolist(), b.data.tolist()))
+        return numpy.dot(a.data, b.data).item()
+    return sum(map(operator.mul, a.data, b.data))
+
+# 이름 -> (최소 인자 수, 최대 인자 수, 함수). 모양은 LIST_METHODS 와 같다
+ARR_METHODS = {
+    "size": (0, 0, len),
+    "sum": (0, 0, arr_sum),
+    "min": (0, 0, arr_min),
+    "max": (0, 0, arr_max),
+    "dot": (1, 1, arr_dot),
+    "list": (0, 0, NumArray.tolist),
+}
+
+def member_access(baseval, memb):
+    if isinstance(baseval, Record):
+        # 필드 이름 -> 슬롯 번호는 타입에 한 번 만들어 둔 표에서 찾는다
+        stype = baseval.type
+        i = stype.field_index.get(memb)
+        if i is not None:
+            return baseval.values[i]
+        if memb in stype.methods:
+            return stype.methods[memb]
+        raise Exception("필드 없음: "+memb)
+    if isinstance(baseval, Scope):
+        if memb in baseval.vars:
+            return baseval.vars[memb]
+        raise Exception("필드 없음: "+memb)
+    raise Exception("멤버 접근 오류: 객체가 레코드나 모듈이 아님")
+
+def index_value(base_val, index_val):
+    try:
+        return base_val[index_val]
+    except Exception as ee:
+        raise Exception("인덱스 오류: "+str(ee))
+
+def store_index(base_val, index_val, val):
+    # a[i] = v
+    try:
+        base_val[index_val] = val
+    except Exception as ee:
+        raise Exception("인덱스 오류: "+str(ee))
+
+def check_callable(fv, fx, argc):
+    # 이름(또는 식)으로 호출되는 값이 함수인지, 인자 수가 맞는지 확인
+    if not isinstance(fv, Function):
+        raise Exception("함수 아님: "+(fx[1] if fx[0] in REF_KINDS else str(fv)))
+    if fv.method_of is not None:
+        raise Exception("메서드는 객체.메서드(...) 로 호출해야 합니다: "+fv.name)
+    if len(fv.params)!=argc:
+        raise Exception("함수호출 오류: 매개변수 수 불일치")
+
+# ---------------------------------------------------------------
+# 트리 워커
+# ---------------------------------------------------------------
+
+def run_body_tree(fbody, env):
+    st = interp_state
+    depth = st.depth
+    if depth>=TREE_DEPTH:
+        # 파이썬 스택을 더 쌓지 않도록 여기서부터는 VM 으로 (결과는 두 엔진이 같다)
+        return run_code(function_code(fbody), env)
+    st.depth = depth+1
+    try:
+        ex = EXEC_STMT
+        for stx in fbody:
+            if ex[stx[0]](stx, env):
+                # 리졸버가 반복문 밖 break/continue 를 막으므로 여기서는 RETURN 뿐
+                return env.retval
+        return None
+    finally:
+        st.depth = depth
+
+def exec_block(stmts, env):
+    # 블록을 실행하고 정상 완료가 아니면 그 상태를 돌려준다
+    ex = EXEC_STMT
+    for st in stmts:
+        status = ex[st[0]](st, env)
+        if status:
+            return status
+    return None
+
+def exec_stmt(stmt, env):
+    # 반환값: None(정상), BREAK, CONTINUE, RETURN
+    return EXEC_STMT[stmt[0]](stmt, env)
+
+# --- 문장별 처리 함수. EXEC_STMT[노드 종류] 로 찾는다 ---
+
+def exec_newtype(stmt, env):
+    define_newtype(stmt, env)
+
+def exec_func_decl(stmt, env):
+    store_ref(stmt[5], env, make_function(stmt, env))
+
+def exec_var_decl(stmt, env):
+    # (K_VAR_DECL, vtype, target, init)
+    _, vt, target, init = stmt
+    val = declare_value(vt, eval_expr(init, env))
+    if target[0]==K_LOCAL:
+        env.slots[target[2]] = val
+    else:
+        store_ref(target, env, val)
+
+def exec_use(stmt, env):
+    load_module(stmt[1], stmt[2], env)
+
+def exec_expr_stmt(stmt, env):
+    eval_expr(stmt[1], env)
+
+def exec_return(stmt, env):
+    env.retval = eval_expr(stmt[1], env)
+    return RETURN
+
+def exec_if(stmt, env):
+    _, ifc, ifb, elifs, elseb = stmt
+    if eval_expr(ifc, env):
+        ex = EXEC_STMT
+        for s1 in ifb:
+            status = ex[s1[0]](s1, env)
+            if status:
+                return status
+        return None
+    for ccond,cblk in elifs:
+        if eval_expr(ccond, env):
+            return exec_block(cblk, env)
+    if elseb is not None:
+        return exec_block(elseb, env)
+    return None
+
+def exec_while(stmt, env):
+    _, cexpr, wblk = stmt
+    ex = EXEC_STMT
+    sched = current().scheduler
+    while True:
+        if sched.waiting:
+            # 반복마다 기다리는 always 블록에 차례를 넘긴다
+            sched.pause()
+        if not eval_expr(cexpr, env):
+            break
+        status = None
+        for s4 in wblk:
+            status = ex[s4[0]](s4, env)
+            if status:
+                break
+        if status:
+            if status==BREAK:
+                break
+            if status==RETURN:
+                return RETURN
+            # CONTINUE 는 다음 반복으로
+    return None
+
+def exec_always(stmt, env):
+    _, intex, b1, modex, target = stmt
+    ival = eval_expr(intex, env)
+    mode = "rate" if modex is None else eval_expr(modex, env)
+    task = start_always(ival, mode, lambda: interpret(b1, env))
+    if target is not None:
+        store_ref(target, env, task)
+
+def exec_break(stmt, env):
+    return BREAK
+
+def exec_continue(stmt, env):
+    return CONTINUE
+
+def eval_expr(expr, env):
+    # 가장 흔한 종류는 여기서 바로 처리하고, 나머지는 EVAL_EXPR 표로 넘긴다
+    kind = expr[0]
+
+    if kind==K_LOCAL:
+        v = env.slots[expr[2]]
+        if v is UNSET:
+            raise Exception("정의되지 않은 식별자: "+expr[1])
+        return v
+
+    if kind==K_CONST:
+        return expr[1]
+
+    if kind==K_BINARY:
+        _, op, le, re = expr
+        lv = eval_expr(le, env)
+        rv = eval_expr(re, env)
+        fn = BINOPS.get(op)
+        if fn is None:
+            raise Exception("미지원연산자: "+op)
+        return fn(lv, rv)
+
+    if kind==K_GLOBAL:
+        g = env.globals
+        nm = expr[1]
+        if nm in g:
+            return g[nm]
+        v = host_function(nm)
+        if v is not UNSET:
+            return v
+        raise Exception("정의되지 않은 식별자: "+nm)
+
+    if kind==K_FIELD and expr[2]==0:
+        return env.slots[0].values[expr[3]]
+
+    return EVAL_EXPR[kind](expr, env)
+
+# --- 식 처리 함수. EVAL_EXPR[노드 종류] 로 찾는다 ---
+
+def eval_upval(expr, env):
+    return load_ref(expr, env)
+
+def eval_field(expr, env):
+    # (K_FIELD, name, depth, index). depth 0 은 eval_expr 에서 바로 처리한다
+    return load_ref(expr, env)
+
+def eval_assign(expr, env):
+    _, lhs, rhs = expr
+    if lhs[0] not in REF_KINDS:
+        if lhs[0]==K_INDEX:
+            # 대상 리스트, 인덱스, 값 순서로 평가한다
+            base_val = eval_expr(lhs[1], env)
+            index_val = eval_expr(lhs[2], env)
+            v2 = eval_expr(rhs, env)
+            store_index(base_val, index_val, v2)
+            return v2
+        raise Exception("할당 왼쪽은 식별자나 인덱스여야 합니다.")
+    v2 = eval_expr(rhs, env)
+    if lhs[0]==K_LOCAL:
+        env.slots[lhs[2]] = v2
+    elif lhs[0]==K_FIELD and lhs[2]==0:
+        env.slots[0].values[lhs[3]] = v2
+    else:
+        store_ref(lhs, env, v2)
+    return v2
+
+def eval_unary(expr, env):
+    _, op, inr = expr
+    rv = eval_expr(inr, env)
+    fn = UNOPS.get(op)
+    if fn is None:
+        raise Exception("알수없는 단항연산자: "+op)
+    return fn(rv)
+
+def eval_call(expr, env):
+    # (K_CALL, fx, argl) 사용자함수
+    _, fx, argl = expr
+    fv = eval_expr(fx, env)
+    if fv.__class__ is NativeFunction:
+        return call_native(fv, [eval_expr(a, env) for a in argl])
+    check_callable(fv, fx, len(argl))
+    return call_function(fv, [eval_expr(a, env) for a in argl], run_body_tree)
+
+def eval_tail_call(expr, env):
+    # (K_TAIL_CALL, fx, argl): 함수 본문의 return f(...). 실제 호출은 call_function 이 한다
+    _, fx, argl = expr
+    fv = eval_expr(fx, env)
+    if fv.__class__ is NativeFunction:
+        # 호스트 함수는 파이썬 스택을 쌓지 않으므로 바로 부른다
+        return call_native(fv, [eval_expr(a, env) for a in argl])
+    check_callable(fv, fx, len(argl))
+    return TailCall(fv, [eval_expr(a, env) for a in argl])
+
+def eval_builtin_call(expr, env):
+    # (K_BUILTIN_CALL, name, argl) (exec 는 뒤에 부른 곳의 스코프 배치가 붙는다)
+    fn, argl = expr[1], expr[2]
+    if fn=="output":
+        builtin_output([eval_expr(a, env) for a in argl])
+        return None
+    if fn=="input":
+        builtin_input(argl, env)
+        return None
+    if fn=="error":
+        builtin_error([eval_expr(a, env) for a in argl])
+    if fn=="exec":
+        if len(argl)!=1:
+            raise Exception("exec는 code 하나 필요")
+        builtin_exec(eval_expr(argl[0], env), env, expr[3])
+        return None
+    if fn=="flush":
+        if argl:
+            raise Exception("flush()는 인자 없어야 함")
+        builtin_flush()
+        return None
+    raise Exception("함수정의안됨: "+fn)
+
+def eval_member_call(expr, env):
+    # (K_MEMBER_CALL, obj_expr, method_name, arg_exprs)
+    _, objexpr, mname, argexprs = expr
+    objval = eval_expr(objexpr, env)
+    argvals = [eval_expr(a, env) for a in argexprs]
+    return call_member(objval, mname, argvals, run_body_tree)
+
+def eval_member_access(expr, env):
+    # (K_MEMBER_ACCESS, base_expr, memb)
+    _, base, memb = expr
+    return member_access(eval_expr(base, env), memb)
+
+def eval_index(expr, env):
+    # (K_INDEX, base_expr, index_expr)
+    _, base_expr, idx_expr = expr
+    base_val = eval_expr(base_expr, env)
+    index_val = eval_expr(idx_expr, env)
+    return index_value(base_val, index_val)
+
+def eval_list(expr, env):
+    # (K_LIST 또는 K_RECORD, [exprs...])
+    return [eval_expr(e, env) for e in expr[1]]
+
+def eval_unknown(expr, env):
+    raise Exception("알수없는 expr 타입: "+KINDNAMES[expr[0]])
+
+EXEC_STMT = [None]*len(KINDNAMES)
+EXEC_STMT[K_EXPR_STMT] = exec_expr_stmt
+EXEC_STMT[K_VAR_DECL] = exec_var_decl
+EXEC_STMT[K_FUNC_DECL] = exec_func_decl
+EXEC_STMT[K_NEWTYPE] = exec_newtype
+EXEC_STMT[K_USE] = exec_use
+EXEC_STMT[K_RETURN] = exec_return
+EXEC_STMT[K_IF] = exec_if
+EXEC_STMT[K_WHILE] = exec_while
+EXEC_STMT[K_ALWAYS] = exec_always
+EXEC_STMT[K_BREAK] = exec_break
+EXEC_STMT[K_CONTINUE] = exec_continue
+
+EVAL_EXPR = [eval_unknown]*len(KINDNAMES)
+EVAL_EXPR[K_UPVAL] = eval_upval
+EVAL_EXPR[K_FIELD] = eval_field
+EVAL_EXPR[K_ASSIGN] = eval_assign
+EVAL_EXPR[K_UNARY] = eval_unary
+EVAL_EXPR[K_CALL] = eval_call
+EVAL_EXPR[K_TAIL_CALL] = eval_tail_call
+EVAL_EXPR[K_BUILTIN_CALL] = eval_builtin_call
+EVAL_EXPR[K_MEMBER_CALL] = eval_member_call
+EVAL_EXPR[K_MEMBER_ACCESS] = eval_member_access
+EVAL_EXPR[K_INDEX] = eval_index
+EVAL_EXPR[K_LIST] = eval_list
+EVAL_EXPR[K_RECORD] = eval_list
+
+# ---------------------------------------------------------------
+# 바이트코드 컴파일러 + 스택 VM
+#   compile_program() 이 리졸브된 문장 목록을 평탄한 명령열로 바꾸고
+#   run_code() 가 스택 머신 루프로 실행한다.
+#   명령은 (op, arg) 튜플이며 arg 는 지역 슬롯 번호, 상수표/이름표
+#   인덱스, 점프할 명령 번호, 또는 개수다.
+# ---------------------------------------------------------------
+
+(OP_LOAD_LOCAL, OP_LOAD_CONST, OP_STORE_LOCAL, OP_BINARY, OP_BINARY_CONST,
+ OP_BINARY_LOCAL, OP_JUMP_IF_FALSE, OP_JUMP, OP_POP, OP_DUP, OP_LOAD_GLOBAL,
+ OP_STORE_GLOBAL, OP_LOAD_UPVAL, OP_STORE_UPVAL, OP_CALL, OP_MEMBER_CALL,
+ OP_MEMBER_ACCESS, OP_INDEX, OP_UNARY, OP_BUILD_LIST, OP_DECLARE, OP_RETURN,
+ OP_OUTPUT, OP_INPUT, OP_ERROR, OP_EXEC, OP_FUNC_DECL, OP_NEWTYPE, OP_USE,
+ OP_ALWAYS, OP_FAIL, OP_LOAD_FIELD, OP_STORE_FIELD, OP_STORE_INDEX, OP_TAIL_CALL, OP_FLUSH,
+ OP_LOOP, OP_AWAIT) = range(38)
+
+OPNAMES = ["LOAD_LOCAL", "LOAD_CONST", "STORE_LOCAL", "BINARY", "BINARY_CONST",
+           "BINARY_LOCAL", "JUMP_IF_FALSE", "JUMP", "POP", "DUP", "LOAD_GLOBAL",
+           "STORE_GLOBAL", "LOAD_UPVAL", "STORE_UPVAL", "CALL", "MEMBER_CALL",
+           "MEMBER_ACCESS", "INDEX", "UNARY", "BUILD_LIST", "DECLARE", "RETURN",
+           "OUTPUT", "INPUT", "ERROR", "EXEC", "FUNC_DECL", "NEWTYPE", "USE",
+           "ALWAYS", "FAIL", "LOAD_FIELD", "STORE_FIELD", "STORE_INDEX", "TAIL_CALL", "FLUSH",
+           "LOOP", "AWAIT"]
+
+def binop_div(lv, rv):
+    if isinstance(lv,int) and isinstance(rv,int):
+        return lv//rv
+    return lv/rv
+
+# or/and 는 트리 워커와 같이 양쪽을 모두 평가한 뒤 결합한다
+BINOPS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': binop_div,
+          '%': operator.mod, '>': operator.gt, '<': operator.lt, '>=': operator.ge,
+          '<=': operator.le, '==': operator.eq, '!=': operator.ne,
+          "or": lambda a, b: a or b, "and": lambda a, b: a and b}
+UNOPS = {'-': operator.neg, '+': operator.pos, "not": operator.not_}
+
+class CodeObject:
+    def __init__(self, name):
+        self.name = name
+        self.code = []
+        self.consts = []
+        self.names = []
+        # 지역 슬롯 번호 -> 이름 (오류 메시지와 dis 용)
+        self.varnames = {}
+        # 필드 번호 -> 이름 (dis 용)
+        self.fieldnames = {}
+
+    def dis(self):
+        lines = ["== "+self.name+" =="]
+        nested = []
+        for pc, (op, arg) in enumerate(self.code):
+            note = ""
+            if op in (OP_LOAD_GLOBAL, OP_STORE_GLOBAL, OP_MEMBER_ACCESS):
+                note = self.names[arg]
+            elif op in (OP_LOAD_LOCAL, OP_STORE_LOCAL):
+                note = self.varnames.get(arg, "")
+            elif op in (OP_LOAD_FIELD, OP_STORE_FIELD):
+                note = self.fieldnames.get(arg, "")
+            elif op in (OP_BINARY, OP_UNARY):
+                note = arg.__name__
+            elif op in (OP_BINARY_CONST, OP_BINARY_LOCAL):
+                note = arg[0].__name__+" "+repr(arg[1])
+            elif op in (OP_LOAD_CONST, OP_LOAD_UPVAL, OP_STORE_UPVAL, OP_MEMBER_CALL,
+                        OP_DECLARE, OP_FAIL):
+                note = repr(self.consts[arg])
+            elif op in (OP_FUNC_DECL, OP_NEWTYPE, OP_USE):
+                note = self.consts[arg][1]
+            elif op==OP_ALWAYS:
+                nested.append(self.consts[arg])
+            if not isinstance(arg, int):
+                arg = 0
+            lines.append(f"{pc:5d} {OPNAMES[op]:<15} {arg:<5} {note}")
+        for co in nested:
+            lines.append(co.dis())
+        return "\n".join(lines)
+
+class Compiler:
+    def __init__(self, name="<main>"):
+        self.co = CodeObject(name)
+        self.const_index = {}
+        self.name_index = {}
+        # 반복문마다 (continue 목적지, break 패치 위치 목록)
+        self.loops = []
+
+    def emit(self, op, arg=0):
+        self.co.code.append((op, arg))
+        return len(self.co.code)-1
+
+    def here(self):
+        return len(self.co.code)
+
+    def patch(self, pos, target):
+        self.co.code[pos] = (self.co.code[pos][0], target)
+
+    def const(self, v):
+        try:
+            key = (type(v), v)
+            if key in self.const_index:
+                return self.const_index[key]
+        except TypeError:
+            # 리스트 등 해시 불가능한 상수는 중복 제거 없이 추가
+            self.co.consts.append(v)
+            return len(self.co.consts)-1
+        self.co.consts.append(v)
+        self.const_index[key] = len(self.co.consts)-1
+        return self.const_index[key]
+
+    def name(self, n):
+        if n not in self.name_index:
+            self.co.names.append(n)
+            self.name_index[n] = len(self.co.names)-1
+        return self.name_index[n]
+
+    def compile_body(self, stmts):
+        for st in stmts:
+            self.compile_stmt(st)
+        self.emit(OP_LOAD_CONST, self.const(None))
+        self.emit(OP_RETURN)
+        return self.co
+
+    def compile_block(self, stmts):
+        for st in stmts:
+            self.compile_stmt(st)
+
+    def compile_load(self, ref):
+        kind = ref[0]
+        if kind==K_LOCAL:
+            self.co.varnames[ref[2]] = ref[1]
+            self.emit(OP_LOAD_LOCAL, ref[2])
+        elif kind==K_GLOBAL:
+            self.emit(OP_LOAD_GLOBAL, self.name(ref[1]))
+        elif kind==K_FIELD and ref[2]==0:
+            self.co.fieldnames[ref[3]] = ref[1]
+            self.emit(OP_LOAD_FIELD, ref[3])
+        else:
+            # 바깥 프레임의 지역 변수/필드
+            self.emit(OP_LOAD_UPVAL, self.const(ref))
+
+    def compile_store(self, ref):
+        # 스택 맨 위 값을 꺼내 저장
+        kind = ref[0]
+        if kind==K_LOCAL:
+            self.co.varnames[ref[2]] = ref[1]
+            self.emit(OP_STORE_LOCAL, ref[2])
+        elif kind==K_GLOBAL:
+            self.emit(OP_STORE_GLOBAL, self.name(ref[1]))
+        elif kind==K_FIELD and ref[2]==0:
+            self.co.fieldnames[ref[3]] = ref[1]
+            self.emit(OP_STORE_FIELD, ref[3])
+        else:
+            self.emit(OP_STORE_UPVAL, self.const(ref))
+
+    def compile_stmt(self, stmt):
+        stype = stmt[0]
+        if stype==K_EXPR_STMT:
+            e = stmt[1]
+            if e[0]==K_ASSIGN and e[1][0] in REF_KINDS:
+                # 문장 위치의 할당은 값을 스택에 남길 필요가 없다
+                self.compile_expr(e[2])
+                self.compile_store(e[1])
+                return
+            self.compile_expr(e)
+            self.emit(OP_POP)
+        elif stype==K_VAR_DECL:
+            _, vt, target, init = stmt
+            self.compile_expr(init)
+            self.emit(OP_DECLARE, self.const(vt))
+            self.compile_store(target)
+        elif stype==K_IF:
+            _, ifc, ifb, elifs, elseb = stmt
+            end_jumps = []
+            branches = [(ifc, ifb)] + list(elifs)
+            for cond, blk in branches:
+                self.compile_expr(cond)
+                jf = self.emit(OP_JUMP_IF_FALSE)
+                self.compile_block(blk)
+                end_jumps.append(self.emit(OP_JUMP))
+                self.patch(jf, self.here())
+            if elseb is not None:
+                self.compile_block(elseb)
+            for j in end_jumps:
+                self.patch(j, self.here())
+        elif stype==K_WHILE:
+            _, cexpr, wblk = stmt
+            start = self.here()
+            self.compile_expr(cexpr)
+            jf = self.emit(OP_JUMP_IF_FALSE)
+            self.loops.append((start, []))
+            self.compile_block(wblk)
+            # 뒤로 가는 점프: 반복마다 기다리는 always 블록에 차례를 넘긴다
+            self.emit(OP_LOOP, start)
+            _, breaks = self.loops.pop()
+            self.patch(jf, self.here())
+            for b in breaks:
+                self.patch(b, self.here())
+        elif stype==K_RETURN:
+            self.compile_expr(stmt[1])
+            self.emit(OP_RETURN)
+        elif stype==K_BREAK:
+            if not self.loops:
+                raise Exception("break는 반복문 안에서만 사용할 수 있습니다")
+            self.loops[-1][1].append(self.emit(OP_JUMP))
+        elif stype==K_CONTINUE:
+            if not self.loops:
+                raise Exception("continue는 반복문 안에서만 사용할 수 있습니다")
+            self.emit(OP_LOOP, self.loops[-1][0])
+        elif stype==K_FUNC_DECL:
+            self.emit(OP_FUNC_DECL, self.const(stmt))
+            self.compile_store(stmt[5])
+        elif stype==K_NEWTYPE:
+            self.emit(OP_NEWTYPE, self.const(stmt))
+        elif stype==K_USE:
+            self.emit(OP_USE, self.const(stmt))
+        elif stype==K_ALWAYS:
+            _, intex, b1, modex, target = stmt
+            self.compile_expr(intex)
+            if modex is None:
+                self.emit(OP_LOAD_CONST, self.const("rate"))
+            else:
+                self.compile_expr(modex)
+            body = Compiler("<always>").compile_body(b1)
+            self.emit(OP_ALWAYS, self.const(body))
+            if target is None:
+                self.emit(OP_POP)
+            else:
+                self.compile_store(target)
+
+    def compile_expr(self, expr):
+        etype = expr[0]
+        if etype in REF_KINDS:
+            self.compile_load(expr)
+        elif etype==K_CONST:
+            self.emit(OP_LOAD_CONST, self.const(expr[1]))
+        elif etype==K_BINARY:
+            _, op, le, re = expr
+            self.compile_expr(le)
+            if op not in BINOPS:
+                self.compile_expr(re)
+                self.emit(OP_FAIL, self.const("미지원연산자: "+op))
+            elif re[0]==K_CONST:
+                # 오른쪽이 상수/지역 변수면 한 명령으로 합친다
+                self.emit(OP_BINARY_CONST, (BINOPS[op], re[1]))
+            elif re[0]==K_LOCAL:
+                self.co.varnames[re[2]] = re[1]
+                self.emit(OP_BINARY_LOCAL, (BINOPS[op], re[2]))
+            else:
+                self.compile_expr(re)
+                self.emit(OP_BINARY, BINOPS[op])
+        elif etype==K_ASSIGN:
+            _, lhs, rhs = expr
+            if lhs[0]==K_INDEX:
+                # 스택: 리스트, 인덱스, 값 -> STORE_INDEX 후 값
+                self.compile_expr(lhs[1])
+                self.compile_expr(lhs[2])
+                self.compile_expr(rhs)
+                self.emit(OP_STORE_INDEX)
+                return
+            if lhs[0] not in REF_KINDS:
+                self.emit(OP_FAIL, self.const("할당 왼쪽은 식별자나 인덱스여야 합니다."))
+                return
+            self.compile_expr(rhs)
+            self.emit(OP_DUP)
+            self.compile_store(lhs)
+        elif etype==K_AWAIT:
+            self.compile_expr(expr[1])
+            self.emit(OP_AWAIT)
+        elif etype==K_UNARY:
+            _, op, inr = expr
+            self.compile_expr(inr)
+            if op not in UNOPS:
+                self.emit(OP_FAIL, self.const("알수없는 단항연산자: "+op))
+            else:
+                self.emit(OP_UNARY, UNOPS[op])
+        elif etype==K_CALL:
+            # 사용자함수: 함수 값, 인자 순으로 스택에 올린다
+            _, fx, argl = expr
+            self.compile_expr(fx)
+            for a in argl:
+                self.compile_expr(a)
+            self.emit(OP_CALL, self.const((fx, len(argl))))
+        elif etype==K_TAIL_CALL:
+            # 뒤따르는 RETURN 은 TAIL_CALL 이 프레임을 바꾸지 못했을 때(pure func)만 실행된다
+            _, fx, argl = expr
+            self.compile_expr(fx)
+            for a in argl:
+                self.compile_expr(a)
+            self.emit(OP_TAIL_CALL, self.const((fx, len(argl))))
+        elif etype==K_BUILTIN_CALL:
+            fn, argl = expr[1], expr[2]
+            if fn=="input":
+                self.emit(OP_INPUT, self.const(argl))
+                return
+            if fn=="exec" and len(argl)!=1:
+                self.emit(OP_FAIL, self.const("exec는 code 하나 필요"))
+                return
+            if fn=="flush":
+                if argl:
+                    self.emit(OP_FAIL, self.const("flush()는 인자 없어야 함"))
+                else:
+                    self.emit(OP_FLUSH)
+                return
+            if fn not in BUILTIN_NAMES:
+                self.emit(OP_FAIL, self.const("함수정의안됨: "+fn))
+                return
+            for a in argl:
+                self.compile_expr(a)
+            if fn=="output":
+                self.emit(OP_OUTPUT, len(argl))
+            elif fn=="error":
+                self.emit(OP_ERROR, len(argl))
+            else:
+                self.emit(OP_EXEC, self.const(expr[3]))
+        elif etype==K_MEMBER_CALL:
+            _, objexpr, mname, argexprs = expr
+            self.compile_expr(objexpr)
+            for a in argexprs:
+                self.compile_expr(a)
+            self.emit(OP_MEMBER_CALL, self.const((mname, len(argexprs))))
+        elif etype==K_MEMBER_ACCESS:
+            self.compile_expr(expr[1])
+            self.emit(OP_MEMBER_ACCESS, self.name(expr[2]))
+        elif etype==K_INDEX:
+            self.compile_expr(expr[1])
+            self.compile_expr(expr[2])
+            self.emit(OP_INDEX)
+        elif etype in (K_LIST, K_RECORD):
+            for e in expr[1]:
+                self.compile_expr(e)
+            self.emit(OP_BUILD_LIST, len(expr[1]))
+        else:
+            raise Exception("알수없는 expr 타입: "+KINDNAMES[etype])
+
+def compile_program(statements, name="<main>"):
+    return Compiler(name).compile_body(statements)
+
+# 함수 본문은 처음 호출될 때 컴파일해서 재사용한다 (id(본문) -> (본문, 코드)).
+# 본문을 같이 들고 있으므로 id 가 다른 본문에 다시 쓰일 수 없다. exec 로 본문이
+# 계속 새로 생겨도 커지지 않도록 오래 안 쓴 것부터 버린다
+BODY_CODE_CACHE_SIZE = 4096
+body_code_cache = OrderedDict()
+body_code_lock = threading.Lock()
+
+def function_code(fbody):
+    key = id(fbody)
+    with body_code_lock:
+        ent = body_code_cache.get(key)
+        if ent is not None and ent[0] is fbody:
+            body_code_cache.move_to_end(key)
+            return ent[1]
+    co = compile_program(fbody, "<function>")
+    with body_code_lock:
+        body_code_cache[key] = (fbody, co)
+        if len(body_code_cache)>BODY_CODE_CACHE_SIZE:
+            body_code_cache.popitem(last=False)
+    return co
+
+def func_code(fv):
+    # 함수 값에 붙여 둔 코드. 같은 선언에서 나온 함수 값들은 function_code 로 코드를 나눠 쓴다
+    co = fv.code
+    if co is None:
+        co = fv.code = function_code(fv.body)
+    return co
+
+def program_code(statements):
+    # 여러 인터프리터가 같이 쓰는 모듈 프로그램은 한 번만 컴파일한다
+    ent = shared_code.get(id(statements))
+    if ent is None or ent[0] is not statements:
+        return compile_program(statements)
+    if ent[1] is None:
+        ent[1] = compile_program(statements)
+    return ent[1]
+
+def run_body_vm(fbody, env):
+    return run_code(function_code(fbody), env)
+
+# VM 호출 스택의 최대 깊이 (꼬리 호출은 세지 않는다). 넘으면 오류로 멈춘다
+MAX_CALL_DEPTH = int(os.environ.get("STARSCRIPT_MAX_DEPTH", "2000000"))
+
+def run_code(co, env, resume=None):
+    # resume: await 에서 멈췄던 async func 본문을 이어 갈 때 (pc, 값 스택, 기다린 결과)
+    # 전역 조회를 피하려고 opcode 를 지역 변수로 묶어 둔다
+    LOAD_LOCAL, LOAD_CONST, STORE_LOCAL, BINARY = OP_LOAD_LOCAL, OP_LOAD_CONST, OP_STORE_LOCAL, OP_BINARY
+    BINARY_CONST, BINARY_LOCAL, JUMP_IF_FALSE, JUMP = OP_BINARY_CONST, OP_BINARY_LOCAL, OP_JUMP_IF_FALSE, OP_JUMP
+    LOOP = OP_LOOP
+    sched = current().scheduler
+    POP, DUP, LOAD_GLOBAL, STORE_GLOBAL = OP_POP, OP_DUP, OP_LOAD_GLOBAL, OP_STORE_GLOBAL
+    CALL, MEMBER_CALL, TAIL_CALL, RETURN = OP_CALL, OP_MEMBER_CALL, OP_TAIL_CALL, OP_RETURN
+    unset = UNSET
+    slots = env.slots
+    globs = env.globals
+    code = co.code
+    consts = co.consts
+    names = co.names
+    # 값 스택은 모든 프레임이 함께 쓴다. base 는 현재 프레임이 쓰기 시작한 위치
+    stack = [] if resume is None else resume[1]
+    push = stack.append
+    pop = stack.pop
+    base = 0
+    # 사용자 함수 호출은 파이썬 재귀 대신 이 목록에 부른 쪽 상태를 쌓는다
+    # 항목: (code object, pc, env, base, pure func 캐시, 캐시 키)
+    calls = []
+    pc = 0
+    if resume is not None:
+        pc = resume[0]
+        push(resume[2])
+    while True:
+        op, arg = code[pc]
+        pc += 1
+        if op==LOAD_LOCAL:
+            v = slots[arg]
+            if v is unset:
+                raise Exception("정의되지 않은 식별자: "+co.varnames.get(arg, "?"))
+            push(v)
+        elif op==BINARY_CONST:
+            stack[-1] = arg[0](stack[-1], arg[1])
+        elif op==JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+        elif op==STORE_LOCAL:
+            slots[arg] = pop()
+        elif op==BINARY_LOCAL:
+            v = slots[arg[1]]
+            if v is unset:
+                raise Exception("정의되지 않은 식별자: "+co.varnames.get(arg[1], "?"))
+            stack[-1] = arg[0](stack[-1], v)
+        elif op==LOOP:
+            pc = arg
+            if sched.waiting:
+                sched.pause()
+        elif op==JUMP:
+            pc = arg
+        elif op==LOAD_CONST:
+            push(consts[arg])
+        elif op==BINARY:
+            rv = pop()
+            stack[-1] = arg(stack[-1], rv)
+        elif op==LOAD_GLOBAL:
+            nm = names[arg]
+            if nm in globs:
+                push(globs[nm])
+            else:
+                v = host_function(nm)
+                if v is UNSET:
+                    raise Exception("정의되지 않은 식별자: "+nm)
+                push(v)
+        elif op==STORE_GLOBAL:
+            globs[names[arg]] = pop()
+        elif op==POP:
+            pop()
+        elif op==DUP:
+            push(stack[-1])
+        elif op==CALL or op==TAIL_CALL:
+            fx, argc = consts[arg]
+            if argc:
+                argvals = stack[-argc:]
+                del stack[-argc:]
+            else:
+                argvals = []
+            fv = stack[-1]
+            if fv.__class__ is NativeFunction:
+                # 호스트 함수. TAIL_CALL 이면 뒤따르는 RETURN 이 이 값을 돌려준다
+                stack[-1] = call_native(fv, argvals)
+                continue
+            check_callable(fv, fx, argc)
+            if fv.is_async:
+                stack[-1] = start_async(fv, argvals)
+                continue
+            memo = fv.memo
+            mkey = None
+            if memo is not None:
+                mkey = memo_key(argvals)
+                if mkey is not None:
+                    v = memo_get(memo, mkey)
+                    if v is not MEMO_MISS:
+                        stack[-1] = v
+                        continue
+                else:
+                    memo = None
+            if op==TAIL_CALL and memo is None:
+                # 현재 프레임을 호출될 함수의 프레임으로 바꾼다 (calls 는 그대로)
+                pop()
+            else:
+                if len(calls)>=MAX_CALL_DEPTH:
+                    raise Exception("재귀 깊이 초과: "+fv.name)
+                calls.append((co, pc, env, base, memo, mkey))
+                base = len(stack)
+            co = func_code(fv)
+            code = co.code
+            consts = co.consts
+            names = co.names
+            closure = fv.closure
+            env = Frame(fv.nslots, closure, closure.globals)
+            slots = env.slots
+            globs = env.globals
+            i = 0
+            for (pt, pn), av in zip(fv.params, argvals):
+                slots[i] = coerce_value(pt, av)
+                i += 1
+            pc = 0
+        elif op==MEMBER_CALL:
+            mname, argc = consts[arg]
+            if argc:
+                argvals = stack[-argc:]
+                del stack[-argc:]
+            else:
+                argvals = []
+            obj = stack[-1]
+            if obj.__class__ is Record:
+                fv = obj.type.methods.get(mname)
+                if fv is not None and len(fv.params)==len(argvals):
+                    # 레코드 메서드도 함수처럼 calls 에 쌓는다 (오류 경우는 call_member 가 알린다)
+                    if len(calls)>=MAX_CALL_DEPTH:
+                        raise Exception("재귀 깊이 초과: "+fv.name)
+                    calls.append((co, pc, env, base, None, None))
+                    base = len(stack)
+                    co = func_code(fv)
+                    code = co.code
+                    consts = co.consts
+                    names = co.names
+                    closure = fv.closure
+                    env = Frame(fv.nslots, closure, closure.globals)
+                    slots = env.slots
+                    globs = env.globals
+                    slots[0] = obj
+                    i = 1
+                    for (pt, pn), av in zip(fv.params, argvals):
+                        slots[i] = coerce_value(pt, av)
+                        i += 1
+                    pc = 0
+                    continue
+            stack[-1] = call_member(obj, mname, argvals, run_body_vm)
+        elif op==OP_LOAD_FIELD:
+            push(slots[0].values[arg])
+        elif op==OP_STORE_FIELD:
+            slots[0].values[arg] = pop()
+        elif op==OP_LOAD_UPVAL:
+            push(load_ref(consts[arg], env))
+        elif op==OP_STORE_UPVAL:
+            store_ref(consts[arg], env, pop())
+        elif op==OP_MEMBER_ACCESS:
+            stack[-1] = member_access(stack[-1], names[arg])
+        elif op==OP_INDEX:
+            idx = pop()
+            stack[-1] = index_value(stack[-1], idx)
+        elif op==OP_STORE_INDEX:
+            v = pop()
+            idx = pop()
+            store_index(stack[-1], idx, v)
+            stack[-1] = v
+        elif op==OP_UNARY:
+            stack[-1] = arg(stack[-1])
+        elif op==OP_BUILD_LIST:
+            if arg:
+                vals = stack[-arg:]
+                del stack[-arg:]
+            else:
+                vals = []
+            push(vals)
+        elif op==OP_DECLARE:
+            stack[-1] = declare_value(consts[arg], stack[-1])
+        elif op==RETURN:
+            v = pop()
+            if not calls:
+                return v
+            del stack[base:]
+            co, pc, env, base, memo, mkey = calls.pop()
+            if memo is not None:
+                memo_put(memo, mkey, v)
+            code = co.code
+            consts = co.consts
+            names = co.names
+            slots = env.slots
+            globs = env.globals
+            stack[-1] = v
+        elif op==OP_OUTPUT:
+            if arg:
+                vals = stack[-arg:]
+                del stack[-arg:]
+            else:
+                vals = []
+            builtin_output(vals)
+            push(None)
+        elif op==OP_INPUT:
+            builtin_input(consts[arg], env)
+            push(None)
+        elif op==OP_ERROR:
+            builtin_error(stack[-arg:] if arg else [])
+        elif op==OP_EXEC:
+            builtin_exec(pop(), env, consts[arg])
+            push(None)
+        elif op==OP_FLUSH:
+            builtin_flush()
+            push(None)
+        elif op==OP_FUNC_DECL:
+            push(make_function(consts[arg], env))
+        elif op==OP_NEWTYPE:
+            define_newtype(consts[arg], env)
+        elif op==OP_USE:
+            st = consts[arg]
+            load_module(st[1], st[2], env)
+        elif op==OP_ALWAYS:
+            # env 는 프레임이 바뀔 때마다 다시 묶이므로 지금 값을 잡아 둔다
+            mode = pop()
+            stack[-1] = start_always(stack[-1], mode, lambda body=consts[arg], env=env: run_code(body, env))
+        elif op==OP_AWAIT:
+            # await 는 async func 본문에만 있고, 본문이 부른 함수 안에는 없다 (calls 는 비어 있다)
+            return Awaiting(pop(), pc, stack)
+        elif op==OP_FAIL:
+            raise Exception(consts[arg])
+        else:
+            raise Exception("알수없는 opcode: "+str(op))
+
+def main(argv=None):
+    global ENGINE, USE_CACHE, IMPORT_TIME, MEMO_SIZE, USE_NATIVE
+    ap = argparse.ArgumentParser(description="starscript 인터프리터")
+    ap.add_argument("file", nargs="?", default="main.sst")
+    ap.add_argument("--engine", choices=["tree","vm"],
+                    default=os.environ.get("STARSCRIPT_ENGINE", "tree"),
+                    help="실행 엔진: tree(트리 워커) 또는 vm(바이트코드)")
+    ap.add_argument("--dis", action="store_true",
+                    help="프로그램의 바이트코드를 출력하고 종료")
+    ap.add_argument("--no-cache", action="store_true",
+                    help=".sstc 컴파일 캐시를 읽지도 쓰지도 않음")
+    ap.add_argument("--path", action="append", default=[], metavar="DIR",
+                    help="use 가 모듈을 찾을 디렉터리 추가 (여러 번 가능)")
+    ap.add_argument("--no-native", action="store_true",
+                    help="내장 네이티브 모듈(math) 대신 .sst 모듈 파일을 불러옴")
+    ap.add_argument("--import-time", action="store_true",
+                    help="모듈마다 불러오는 데 걸린 시간을 stderr 로 출력")
+    ap.add_argument("--output-buffer", type=int, default=OUTPUT.limit, metavar="N",
+                    help="output() 버퍼 크기(글자 수, 기본 65536, 0이면 output 마다 내보냄)")
+    ap.add_argument("--memo-size", type=int, default=MEMO_SIZE, metavar="N",
+                    help="pure func 하나가 캐시하는 결과 수 (기본 1024, 0이면 캐시 안 함)")
+    ap.add_argument("--exec-cache", type=int, default=exec_cache.maxsize, metavar="N",
+                    help="exec 가 파싱 결과를 캐시하는 코드 수 (기본 256, 0이면 캐시 안 함)")
+    args = ap.parse_args(argv)
+    ENGINE = args.engine
+    if args.no_cache:
+        USE_CACHE = False
+    MODULE_PATH[:0] = args.path
+    if args.no_native:
+        USE_NATIVE = False
+    IMPORT_TIME = args.import_time
+    MEMO_SIZE = args.memo_size
+    exec_cache.maxsize = args.exec_cache
+    OUTPUT.limit = args.output_buffer
+    with open(args.file,"r",encoding="utf-8") as f:
+        code = f.read()
+    statements = load_program(args.file, code)
+    if args.dis:
+        print(compile_program(statements).dis())
+        return
+    try:
+        run_deep(lambda: run_statements(statements))
+    finally:
+        # 오류로 끝나도 그때까지의 출력은 오류 메시지보다 먼저 나온다
+        OUTPUT.flush()
+
+if __name__=="__main__":
+    main()
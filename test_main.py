@@ -0,0 +1,594 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+try:
+    import numpy  # noqa: F401
+    BACKENDS = ["numpy", "array"]
+except ImportError:
+    BACKENDS = ["array"]
+
+ENGINES = ["tree", "vm"]
+
+
+@pytest.fixture(scope="module")
+def main():
+    # 호스트 프로그램처럼 main.py 를 모듈로 불러온다
+    sys.path.insert(0, HERE)
+    import main
+    return main
+
+
+def run_script(tmp_path, src, env=None):
+    # 스크립트를 파일로 써서 main.py 로 실행하고 (종료 코드, stdout, stderr) 를 돌려준다
+    path = tmp_path / "t.sst"
+    path.write_text(src, encoding="utf-8")
+    penv = dict(os.environ, STARSCRIPT_CACHE="0", **(env or {}))
+    r = subprocess.run([sys.executable, os.path.join(HERE, "main.py"), str(path)], cwd=str(tmp_path),
+                       capture_output=True, text=True, timeout=60, env=penv)
+    return r.returncode, r.stdout, r.stderr
+
+
+def run_arr(tmp_path, src, backend):
+    return run_script(tmp_path, src, {"STARSCRIPT_NUMPY": "1" if backend=="numpy" else "0"})
+
+
+def run_in(main, src, engine):
+    # Interpreter 하나로 src 를 실행하고 출력을 돌려준다
+    out = io.StringIO()
+    it = main.Interpreter(engine=engine, stdout=out)
+    try:
+        it.run(src)
+    finally:
+        it.close()
+    return out.getvalue()
+
+
+def fresh_modules(src, names, env=None):
+    # 새 파이썬 프로세스에서 src 를 실행한 뒤 names 중 불러온 모듈
+    check = ("import sys; sys.path.insert(0, %r); import main, io; "
+             "main.Interpreter(stdout=io.StringIO()).run(%r); print([m for m in %r if m in sys.modules])"
+             % (HERE, src, tuple(names)))
+    r = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, timeout=60,
+                       env=dict(os.environ, **(env or {})))
+    assert r.returncode==0, r.stderr
+    return r.stdout
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("expr", ["a * a * a", "a + 9223372036854775000", "-(a * 0 - 9223372036854775807 - 1)"])
+def test_arr_overflow_is_an_error(tmp_path, backend, expr):
+    code, out, err = run_arr(tmp_path, "arr a = [3000000, 3, 5];\noutput(" + expr + ");\n", backend)
+    assert code!=0
+    assert "64비트 정수 범위" in err
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_arr_sum_and_dot_do_not_wrap(tmp_path, backend):
+    src = ("arr a = [3000000000, 3000000000];\n"
+           "arr b = [4611686018427387904, 4611686018427387904];\n"
+           "output(a.dot(a), b.sum(), (a * 2).sum());\n")
+    code, out, err = run_arr(tmp_path, src, backend)
+    assert code==0, err
+    assert out=="18000000000000000000 9223372036854775808 12000000000\n"
+
+
+def test_arr_backends_agree(tmp_path):
+    src = ("arr a = [2000000, -3, 5];\n"
+           "output(a * a * a, a / 2, a % 7, -a, a.sum(), a.dot(a));\n")
+    outs = {run_arr(tmp_path, src, b) for b in BACKENDS}
+    assert len(outs)==1
+    code, out, err = outs.pop()
+    assert code==0, err
+
+
+@pytest.mark.parametrize("mmap_min", ["0", "1"])
+def test_file_read_small_n_multibyte(tmp_path, mmap_min):
+    # read(n) 의 n 이 한 글자보다 작아도 글자 하나씩 앞으로 간다 (mmap 으로 읽을 때도)
+    (tmp_path / "k.txt").write_bytes("가나a다".encode("utf-8"))
+    src = ('file f = open("k.txt", "r");\n'
+           'str s = "";\n'
+           'while (not f.eof()) :\n'
+           '    s = s + f.read(1) + "|";\n'
+           'end;\n'
+           'output(s);\n')
+    code, out, err = run_script(tmp_path, src, {"STARSCRIPT_MMAP_MIN": mmap_min})
+    assert code==0, err
+    assert out=="가|나|a|다|\n"
+
+
+def test_file_read_invalid_utf8_is_an_error(tmp_path):
+    (tmp_path / "bad.txt").write_bytes(b"ab\xea\xb0")
+    src = 'file f = open("bad.txt", "r");\noutput(f.read(2));\noutput(f.read(1));\n'
+    code, out, err = run_script(tmp_path, src)
+    assert code!=0
+    assert out=="ab\n"
+    assert "올바른 UTF-8 이 아님" in err
+
+
+def test_clear_memo_caches_keeps_exec_cache(main):
+    # exec 코드 캐시는 pure func 캐시가 아니므로 clear_memo_caches 가 비우지 않는다
+    assert main.exec_cache not in main.memo_caches
+    main.exec_cache.table["x"] = None
+    try:
+        main.clear_memo_caches()
+        assert "x" in main.exec_cache.table
+    finally:
+        main.exec_cache.table.pop("x", None)
+
+
+def test_body_code_cache_is_bounded(main, monkeypatch):
+    # 함수 본문 코드 캐시는 크기가 정해진 LRU 이고, 같은 본문이면 같은 코드를 준다
+    monkeypatch.setattr(main, "BODY_CODE_CACHE_SIZE", 8)
+    monkeypatch.setattr(main, "body_code_cache", main.OrderedDict())
+    bodies = [[] for _ in range(20)]
+    for b in bodies:
+        main.function_code(b)
+    assert len(main.body_code_cache)==8
+    assert main.function_code(bodies[-1]) is main.function_code(bodies[-1])
+
+
+class FakeStream(io.StringIO):
+    def __init__(self, tty):
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+@pytest.mark.parametrize("tty", [True, False])
+def test_output_buffer_line_mode_on_tty(main, tty):
+    # 터미널이면 줄마다 내보내고, 파이프나 파일이면 limit 까지 모은다
+    stream = FakeStream(tty)
+    buf = main.OutputBuffer(65536, stream)
+    buf.write("hello\n")
+    assert stream.getvalue()==("hello\n" if tty else "")
+    buf.flush()
+    assert stream.getvalue()=="hello\n"
+
+
+def test_use_while_another_thread_loads_the_module(tmp_path):
+    # 메인이 slow 를 불러오는 도중 always 블록이 같은 모듈을 use 하면 다 불러올 때까지 기다린다
+    (tmp_path / "slow.sst").write_text("num i = 0;\nwhile (i < 200000):\n    i = i + 1;\nend;\nnum v = i;\n",
+                                       encoding="utf-8")
+    src = ('num runs = 0;\n'
+           'always (0.01) as t :\n'
+           '    runs = runs + 1;\n'
+           '    if (runs == 2) :\n'
+           '        use {slow};\n'
+           '        output("always", slow.v);\n'
+           '        t.cancel();\n'
+           '    end;\n'
+           'end;\n'
+           'use {slow};\n'
+           'output("main", slow.v);\n')
+    code, out, err = run_script(tmp_path, src)
+    assert code==0, err
+    assert "main 200000\n" in out
+
+
+def test_circular_use_is_an_error(tmp_path):
+    (tmp_path / "ca.sst").write_text("use {cb};\nnum x = 1;\n", encoding="utf-8")
+    (tmp_path / "cb.sst").write_text("use {ca};\nnum y = 2;\n", encoding="utf-8")
+    code, out, err = run_script(tmp_path, "use {ca};\n")
+    assert code!=0
+    assert "순환 use 오류: ca -> cb -> ca" in err
+
+
+TAIL_COUNT = """
+func count(num n, num acc):
+    if (n == 0):
+        return acc;
+    end;
+    return count(n - 1, acc + 1);
+end;
+output(count(1000000, 0));
+"""
+
+TAIL_EVEN_ODD = """
+func even(num n):
+    if (n == 0):
+        return true;
+    end;
+    return odd(n - 1);
+end;
+func odd(num n):
+    if (n == 0):
+        return false;
+    end;
+    return even(n - 1);
+end;
+output(even(1000000), odd(1000001), even(999999));
+"""
+
+DEEP_SUM = """
+func sum(num n):
+    if (n == 0):
+        return 0;
+    end;
+    return n + sum(n - 1);
+end;
+output(sum(200000));
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("src, expected", [(TAIL_COUNT, "1000000\n"),
+                                           (TAIL_EVEN_ODD, "True True False\n"),
+                                           (DEEP_SUM, "20000100000\n")],
+                         ids=["tail_count_1m", "tail_even_odd_1m", "deep_sum_200k"])
+def test_deep_recursion(tmp_path, engine, src, expected):
+    # 꼬리 호출은 깊이와 상관없이 돌고, 꼬리가 아닌 깊은 재귀도 두 엔진 모두 끝까지 간다
+    code, out, err = run_script(tmp_path, src, {"STARSCRIPT_ENGINE": engine})
+    assert code==0, err
+    assert out==expected
+
+
+def test_interpreter_close_ends_scheduler_thread(main):
+    # close() 는 always 스케줄러 스레드를 끝내고, 닫은 인터프리터는 남지 않는다
+    import gc
+    import threading
+    gc.collect()
+    before = threading.active_count(), len(main.INTERPRETERS)
+    for _ in range(5):
+        it = main.Interpreter(stdout=io.StringIO())
+        it.run("num n = 0;\nalways (0.01) :\n    n = n + 1;\nend;\n"
+               "async func f() :\n    await sleep(0.001);\n    return 1;\nend;\nf();\n")
+        it.close()
+        del it
+    gc.collect()
+    assert (threading.active_count(), len(main.INTERPRETERS))==before
+
+
+@pytest.mark.parametrize("use_numpy, src", [("1", 'output("hi");'), ("0", "arr a = [1, 2];\noutput(a.sum());")])
+def test_numpy_is_not_imported_unless_needed(use_numpy, src):
+    # arr 를 안 쓰거나 STARSCRIPT_NUMPY=0 이면 numpy 를 불러오지 않는다
+    assert fresh_modules(src, ["numpy"], {"STARSCRIPT_NUMPY": use_numpy})=="[]\n"
+
+
+def test_asyncio_is_not_imported_without_async():
+    # async 기능을 안 쓰는 스크립트는 asyncio 를 불러오지 않는다
+    assert fresh_modules("output(1);", ["asyncio"])=="[]\n"
+
+
+PARALLEL_SRC = """
+func sq(num n):
+    return n * n;
+end;
+output(parallelMap(sq, [1, 2, 3, 4, 5]));
+"""
+
+
+@pytest.mark.parametrize("workers, pmin", [("2", "0"), ("1", "0"), ("2", "16")], ids=["pool", "one_worker", "small"])
+def test_parallel_map(tmp_path, workers, pmin):
+    # 워커 풀로 돌든 (워커 하나나 작은 입력이라) 이 프로세스에서 돌든 결과는 같다
+    code, out, err = run_script(tmp_path, PARALLEL_SRC, {"STARSCRIPT_WORKERS": workers, "STARSCRIPT_PARALLEL_MIN": pmin})
+    assert code==0, err
+    assert out=="[1, 4, 9, 16, 25]\n"
+
+
+def test_parallel_modules_are_not_imported_without_parallel_map():
+    assert fresh_modules("output(1);", ["pickle", "multiprocessing", "concurrent.futures"])=="[]\n"
+
+
+RECORD_EQ = """
+newtype P:
+    num x;
+    num y;
+end;
+newtype Q:
+    num x;
+    num y;
+end;
+P a = {1, 2};
+P b = {1, 2};
+P c = {1, 3};
+Q d = {1, 2};
+output(a == b, a != b, a == c, a != c, a == d);
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_record_equality(tmp_path, engine):
+    # 레코드는 같은 타입에 필드 값이 모두 같으면 같다
+    code, out, err = run_script(tmp_path, RECORD_EQ, {"STARSCRIPT_ENGINE": engine})
+    assert code==0, err
+    assert out=="True False False True False\n"
+
+
+EXEC_LOCALS = """
+use {system};
+num g = 10;
+func outer(num k):
+    func f(num a):
+        num b = 2;
+        code c = system.new_code("output(a + b); b = b + k; output(b, g);");
+        exec(c);
+        exec(c);
+        return b;
+    end;
+    return f(1);
+end;
+output(outer(5));
+func other(num b, num a):
+    exec(system.new_code("output(a + b);"));
+end;
+other(30, 4);
+newtype P:
+    num x;
+    func show(num d):
+        exec(system.new_code("output(x + d);"));
+    end;
+end;
+P p = {40};
+p.show(2);
+exec(system.new_code("output(g);"));
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_exec_sees_caller_locals(tmp_path, engine):
+    # 함수 안의 exec 코드는 그 함수의 지역 변수, 바깥 함수 변수, 필드를 본다
+    (tmp_path / "system.sst").write_text(open(os.path.join(HERE, "system.sst"), encoding="utf-8").read(),
+                                         encoding="utf-8")
+    code, out, err = run_script(tmp_path, EXEC_LOCALS, {"STARSCRIPT_ENGINE": engine})
+    assert code==0, err
+    assert out=="3\n7 10\n8\n12 10\n12\n34\n42\n10\n"
+
+
+# --- 예제 스크립트: 트리 워커와 VM 이 같은 출력을 내야 한다 ---
+
+LANG_EXAMPLE = """
+num x = 0;
+fl f = 7 / 2.0;
+str s = "hi\tthere";
+bool b = 1;
+output(x, f, s, b, 7 / 2, -7 % 3, not b);
+func sum_to(num n):
+    num total = 0;
+    num i = 0;
+    while (true):
+        i = i + 1;
+        if (i > n):
+            break;
+        end;
+        if (i % 2 == 0):
+            continue;
+        end;
+        num j = 0;
+        while (j < 3):
+            j = j + 1;
+            if (j == 2):
+                continue;
+            end;
+            total = total + j;
+        end;
+        total = total + i;
+    end;
+    return total;
+end;
+output(sum_to(10));
+func classify(num n):
+    if (n < 0):
+        return "neg";
+    elif (n == 0):
+        return "zero";
+    elif (n < 10):
+        return "small";
+    else:
+        num k = 0;
+        while (k < 100):
+            if (k == n):
+                return "found";
+            end;
+            k = k + 1;
+        end;
+        return "big";
+    end;
+end;
+output(classify(-1), classify(0), classify(5), classify(50), classify(500));
+newtype Person:
+    str name;
+    num age;
+    func greet(str other):
+        return name + " greets " + other;
+    end;
+    func birthday():
+        age = age + 1;
+        return age;
+    end;
+end;
+Person p = {"Alice", 30};
+output(p.name, p.age, p.greet("Bob"));
+p.birthday();
+p.birthday();
+output(p.age);
+li l = [1, 2, 3] + [4];
+output(l, l[2], l.size(), "abc".size(), s.size());
+num y = 3;
+y = y * 2 + 1;
+output(y, y >= 7, y != 7, y == 7 and false, y == 7 or false);
+use {system};
+code c2 = {"num zz = 5; output(zz * 2);"};
+exec(c2);
+func fact(num n):
+    if (n <= 1):
+        return 1;
+    end;
+    return n * fact(n - 1);
+end;
+output(fact(20));
+/* comment */ // comment
+# comment
+output(1.5 + 2, 10 / 4, 10.0 / 4, "a" + "b");
+"""
+
+SCOPE_EXAMPLE = """
+num counter = 0;
+func bump():
+    counter = counter + 1;
+    return counter;
+end;
+bump();
+bump();
+output(counter);
+func make_adder(num n):
+    func add(num x):
+        return x + n;
+    end;
+    return add;
+end;
+func outer():
+    num hidden = 5;
+    func inner():
+        hidden = hidden + 1;
+        return hidden;
+    end;
+    inner();
+    inner();
+    return hidden;
+end;
+output(outer());
+func use_adder():
+    func helper(num q):
+        return make_adder(q);
+    end;
+    return helper(3);
+end;
+func shadow(num counter):
+    counter = counter * 2;
+    return counter;
+end;
+output(shadow(21), counter);
+func rec(num n):
+    if (n == 0):
+        return 0;
+    end;
+    return 1 + rec(n - 1);
+end;
+output(rec(100));
+func add5_maker():
+    return make_adder(5);
+end;
+func apply_it():
+    func add5(num x):
+        return x + 5;
+    end;
+    return add5(10);
+end;
+output(apply_it());
+fn add7 = make_adder(7);
+fn add1 = make_adder(1);
+output(add7(3), add1(3), add7(10));
+"""
+
+FEATURES_EXAMPLE = """
+use {system};
+pure func fib(num n):
+    if (n < 2):
+        return n;
+    end;
+    return fib(n - 1) + fib(n - 2);
+end;
+output(fib(60));
+CacheInfo ci = fib.cache_info();
+output(ci.hits, ci.misses, ci.size);
+fib.cache_clear();
+output(fib.cache_info().size);
+li xs = [3, 1, 2];
+xs.push(4);
+output(xs.pop(), xs.pop(0), xs);
+xs.insert(1, 9);
+xs.set(0, 7);
+output(xs, xs.slice(1), xs.slice(0, 2), xs.size());
+num total = 0;
+code c = system.new_code("total = total + 1;");
+num i = 0;
+while (i < 5):
+    exec(c);
+    i = i + 1;
+end;
+output(total);
+"""
+
+EXAMPLES = {
+    "main": (open(os.path.join(HERE, "main.sst"), encoding="utf-8").read(), "Hello, World!\n"),
+    "lang": (LANG_EXAMPLE, '0 3.5 hi\tthere True 3 2 False\n45\nneg zero small found big\nAlice 30 Alice greets Bob\n32\n[1, 2, 3, 4] 3 4 3 8\n7 True False False True\n10\n2432902008176640000\n3.5 2 2.5 ab\n'),
+    "scope": (SCOPE_EXAMPLE, '2\n7\n42 2\n100\n15\n10 4 17\n'),
+    "features": (FEATURES_EXAMPLE, "1548008755920\n58 61 61\n0\n4 3 [1, 2]\n[7, 9, 2] [9, 2] [7, 9] 3\n5\n"),
+}
+
+
+@pytest.mark.parametrize("name", list(EXAMPLES))
+def test_engines_agree_on_examples(main, monkeypatch, name):
+    # 같은 스크립트를 트리 워커와 바이트코드 VM 으로 돌리면 출력이 같다
+    monkeypatch.chdir(HERE)
+    src, expected = EXAMPLES[name]
+    assert run_in(main, src, "tree")==expected
+    assert run_in(main, src, "vm")==expected
+
+
+@pytest.mark.parametrize("src, message", [
+    ("output(nope);", "정의되지 않은 식별자: nope"),
+    ("func f():\n    return missing + 1;\nend;", "정의되지 않은 식별자: missing \\(함수 f\\)"),
+    ("newtype P:\n    num x;\n    func m():\n        return y;\n    end;\nend;", "y \\(함수 P.m\\)"),
+    ("break;", "break는 반복문 안에서만"),
+    ("func f():\n    continue;\nend;", "continue는 반복문 안에서만"),
+    ("func f():\n    await g();\nend;", "await는 async func 안에서만"),
+])
+def test_resolver_errors(main, src, message):
+    # 이름과 문장 위치는 실행 전에 리졸버가 확인한다
+    with pytest.raises(Exception, match=message):
+        main.parse_source(src)
+
+
+def test_resolver_slots_and_upvalues(main):
+    # 함수 지역 변수는 슬롯, 바깥 함수 변수는 깊이가 붙은 참조, 나머지는 전역으로 확정된다
+    stmts = main.parse_source("num g = 1;\nfunc f(num a):\n    num b = a;\n"
+                              "    func h():\n        return a + b + g;\n    end;\n    return h();\nend;")
+    fdecl = stmts[1]
+    assert fdecl[0]==main.K_FUNC_DECL and fdecl[4]==3
+    hbody = fdecl[3][1][3]
+    ret = hbody[0][1]
+    refs = [ret[2][2], ret[2][3], ret[3]]
+    assert refs==[(main.K_UPVAL, "a", 1, 0), (main.K_UPVAL, "b", 1, 1), (main.K_GLOBAL, "g")]
+
+
+def test_exec_cache_reuses_parsed_code(main, monkeypatch):
+    # 같은 source 를 다시 exec 하면 (code 레코드가 새것이어도) 다시 파싱하지 않는다
+    monkeypatch.chdir(HERE)
+    before = main.exec_cache_info().values
+    out = run_in(main, "use {system};\nnum n = 0;\nnum i = 0;\nwhile (i < 3):\n"
+                       "    exec(system.new_code(\"n = n + 1; num k\" + \"_cache_test = 0;\"));\n"
+                       "    i = i + 1;\nend;\noutput(n);", "tree")
+    after = main.exec_cache_info().values
+    assert out=="3\n"
+    assert (after[0]-before[0], after[1]-before[1])==(2, 1)
+
+
+def test_interpreters_are_isolated(main):
+    # 인터프리터마다 전역, 타입, 호스트 함수가 따로다
+    a = main.Interpreter(stdout=io.StringIO())
+    b = main.Interpreter(stdout=io.StringIO())
+    try:
+        a.register_function("twice", ["num"], lambda n: n * 2)
+        a.run("num x = 1;\nnewtype T:\n    num v;\nend;\noutput(twice(x));")
+        b.run("num x = 10;\noutput(x);")
+        a.run("x = x + 1;\noutput(x);")
+        assert a.globals["x"]==2 and b.globals["x"]==10
+        with pytest.raises(Exception, match="twice"):
+            b.run("output(twice(1));")
+        # b 에는 타입 T 가 없으므로 그냥 리스트가 된다
+        a.run("T t = {1};\noutput(t);")
+        b.run("T t = {1};\noutput(t);")
+    finally:
+        a.close()
+        b.close()
+    assert a.output.stream.getvalue()=="2\n2\nT{'v': 1}\n"
+    assert b.output.stream.getvalue()=="10\n[1]\n"